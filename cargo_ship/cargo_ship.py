@@ -45,7 +45,9 @@ A Python Tk application to view Jamf computer records.
 #     rm -rdf build dist ; /usr/bin/python setup.py py2app -s
 #
 #     pyinstaller:
-#     pyinstaller --onefile -i cargo_ship.ico cargo_ship.py
+#     pyinstaller --onefile --paths .. -i cargo_ship.ico cargo_ship.py
+#
+#     Both builds need the shared scl_jamf package from the top of the repository.
 #
 ################################################################################
 
@@ -57,45 +59,73 @@ A Python Tk application to view Jamf computer records.
 ################################################################################
 
 from __future__ import print_function
-import base64
-import ConfigParser
 import inspect
-import json
 import locale
 import os
-import platform
-import pwd
-import re
 import ScrolledText
-import subprocess
 import sys
-import time
-import tkFont
 import tkMessageBox
 import ttk
-import urllib
-import urllib2
-import multiprocess
 from management_tools import loggers
 from Tkinter import *
 
+#
+# modules shared with Tugboat live in scl_jamf, one level above this application
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from scl_jamf import client
+from scl_jamf import computer_index
+from scl_jamf import computers
+from scl_jamf import local_machine
+from scl_jamf import login
+from scl_jamf import policies
+from scl_jamf import reflection
+from scl_jamf import scope_index
+from scl_jamf import results_window
+from scl_jamf import search
+from scl_jamf import tasks
+
 
 class Summarize(object):
     """
     Store keys, manipulate keys, output script and build the package
     """
 
-    def __init__(self, root, logger, jamf_hostname, jamf_username, jamf_password):
+    def __init__(self, root, logger, session):
         """
         Initialize object and variables
         """
         self.root = root
         self.logger = logger
-        self.jamf_hostname = jamf_hostname
-        self.jamf_username = jamf_username
-        self.jamf_password = jamf_password
+        self.jamf_hostname = session.jamf_hostname
+        self.jamf_username = session.jamf_username
+        self.jamf_password = session.jamf_password
+
+        #
+        # the client that logged in, its connections are already open
+        self.jamf = session.jamf_client
+
+        #
+        # the Jamf ID of this device is saved between runs and looked up in the background
+        #  at startup, see scl_jamf/local_machine.py
+        self.local_machine = local_machine.LocalMachine(self.jamf, logger)
         self.local_jamf_id = None
 
+        #
+        # as-you-type computer search, results share a single window
+        #  use_computer_index: search a local copy of the computer list, refreshed in the background,
+        #   and only ask Jamf when it finds nothing. see scl_jamf/computer_index.py
+        self.use_computer_index = True
+
+        local_index = None
+        if self.use_computer_index:
+            try:
+                local_index = computer_index.ComputerIndex(self.jamf_hostname, logger)
+            except Exception as exception_message:
+                logger.error("__init__: Local computer index unavailable. [%s]" % exception_message)
+        self.live_search = search.LiveSearch(root, self.jamf, logger, self.search_results, self.search_failed, index=local_index,
+                                             on_partial=self.search_partial)
+        self.results_window = results_window.ResultsWindow(root, self.search_selected)
+
         self.computer_name_string = StringVar()
         self.fullname_string = StringVar()
         self.search_string = StringVar()
@@ -106,6 +136,58 @@ class Summarize(object):
 
         self.status_string.set("Ready.")
 
+        #
+        # policy fetching, adjust for your Jamf server
+        #  policy_workers: number of concurrent policy requests, kept below the client's
+        #   connection limit so computer lookups aren't queued behind policy loading
+        #  policy_requests_per_second: cap on requests to this host, 0 for no limit
+        #  policy_timeout: seconds to wait for a single policy
+        #  policy_retries: immediate retries, with exponential backoff, of a failed policy
+        #  policy_retry_delay, policy_retry_limit: background retries of policies that still failed
+        #  policy_cache_max_age: policies saved by an earlier session are refetched once older than this (seconds).
+        #   with background refreshes on, launch shows them all at once and the refreshes revalidate the old ones
+        self.policy_workers = 6
+        self.policy_requests_per_second = 20
+        self.policy_timeout = 30
+        self.policy_retries = 3
+        self.policy_retry_delay = 60
+        self.policy_retry_limit = 5
+        self.policy_cache_max_age = 3600
+
+        #
+        # refreshing policies and profiles while the application is open
+        #  refresh_interval: minutes between background refreshes, 0 to turn them off
+        #  policy_refresh_age: background refreshes refetch policies fetched longer ago than this (seconds).
+        #   the policy list carries no modification date, scope edits are only seen by refetching.
+        #   the Refresh button refetches every policy.
+        #  policy_refresh_limit: most policies a background refresh refetches for age, oldest first
+        #  policy_revalidate_delay: seconds between background refreshes while more stale policies remain
+        self.refresh_interval = 15
+        self.policy_refresh_age = 3600
+        self.policy_refresh_limit = 100
+        self.policy_revalidate_delay = 30
+        self.refreshing = False
+
+        #
+        # ids of the queued periodic refresh and policy retry, at most one of each is pending
+        self.refresh_timer = None
+        self.retry_timer = None
+
+        #
+        # computer record request in flight, see query_jamf_id()
+        self.query_task = None
+
+        #
+        # profile_scope: also load the scope of every profile, so the Profiles pane lists profiles
+        #  scoped to a computer that it hasn't reported installed. one request per profile.
+        self.profile_scope = False
+
+        self.policy_loader = policies.PolicyLoader(self.jamf, self.logger, self.policy_workers, self.policy_requests_per_second,
+                                                   self.policy_timeout, self.policy_retries,
+                                                   cache_max_age=self.policy_cache_max_age)
+        self.failed_policies = []
+        self.policy_retry_count = 0
+
         self.status_warning = ttk.Style()
         self.status_warning.configure('Warning.TLabel', foreground='red')
 
@@ -113,11 +195,16 @@ class Summarize(object):
         self.status_normal.configure('Normal.TLabel', foreground='black')
 
         #
-        # These methods are time intensive based on the number of each in your database
-        self.jamf_policies = self.build_policies()
-        self.jamf_profiles = self.build_profiles()
+        # profiles and policies are time intensive based on the number of each in your database,
+        # they're loaded in the background while the window is usable.
+        # None until loaded, the panes show "Loading..." until then.
+        self.jamf_policies = None
+        self.jamf_profiles = None
+        self.displayed_computer = None
 
         self.build_ui()
+        self.load_data()
+        self.prefetch_local_id()
 
     def build_ui(self):
         """
@@ -332,6 +419,7 @@ class Summarize(object):
         self.search_entry = ttk.Entry(self.mainframe, width=20, textvariable=self.search_string)
         self.search_entry.config(font=('', 12, 'bold'))
         self.search_entry.grid(column=4, row=40, sticky=EW)
+        self.search_entry.bind('<KeyRelease>', self.search_typed)
 
         ttk.Separator(self.mainframe, orient=HORIZONTAL).grid(row=55, columnspan=35, sticky=EW)
 
@@ -386,10 +474,16 @@ class Summarize(object):
         ttk.Separator(self.mainframe, orient=HORIZONTAL).grid(row=290, columnspan=35, sticky=EW)
 
         #
-        # status bar and quit button
+        # status bar, refresh and quit buttons
         self.status_label = ttk.Label(self.mainframe, textvariable=self.status_string)
         self.status_label.grid(column=1, row=300, sticky=W, columnspan=50)
 
+        self.load_progress = ttk.Progressbar(self.mainframe, orient=HORIZONTAL, mode='determinate', length=200)
+        self.load_progress.grid(column=3, row=300, sticky=E)
+        self.load_progress.grid_remove()
+
+        self.refresh_btn = ttk.Button(self.mainframe, text="Refresh", command=self.refresh_data)
+        self.refresh_btn.grid(column=4, row=300)
         ttk.Button(self.mainframe, text="Quit", command=self.root.destroy).grid(column=4, row=300, sticky=E)
 
     def search_string_jamf(self):
@@ -398,21 +492,6 @@ class Summarize(object):
         """
         self.logger.info("%s: activated" % inspect.stack()[0][3])
 
-        def double_click(*event):
-            """
-            handle clicks
-            """
-
-            #
-            # when a click occurs, parse out ID from string and call query method
-            selected = listbox.get(listbox.curselection())
-            trim_select = re.search(r'\((.*)\)', selected).group(1)
-
-            self.id_string.set(trim_select)
-            self.query_jamf_id()
-
-            self.root.lift()
-
         # you need to clear all the fields...
         self.reset_display()
         self.id_string.set("")
@@ -432,402 +511,334 @@ class Summarize(object):
             self.logger.info("%s: searched for string: %r" % (inspect.stack()[0][3], self.search_string.get()))
 
             #
-            # erase previous displayed values
-#             self.reset_data()
-
-            #
-            # encode special characters included in search string
-            url = self.jamf_hostname + '/JSSResource/computers/match/' + urllib.quote('*' + self.search_string.get() + '*')
-            self.logger.info("%s: searched with url: %r" % (inspect.stack()[0][3], url))
-
-            #
-            # communicate with Jamf server
-            try:
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-                response = urllib2.urlopen(request)
-                try:
-                    response_json = json.loads(response.read())
-                except Exception as exception_message:
-                    self.logger.error("issue parsing JSON: %r" % exception_message)
-                    return
-                #
-                # a non-200 response is bad, report and return
-                if response.code != 200:
-                    self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("%i returned." % response.code)
-                    return
-
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 400:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-                elif error.code == 401:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-                elif error.code == 403:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-                elif error.code == 404:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-                elif error.code == 409:
-                    contents = error.read()
-                    error_message = re.findall(r"Error: (.*)<", contents)
-                    print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-                else:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-                return
-            except urllib2.URLError, error:
-                self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error contacting JSS.")
-                return
-            except Exception as exception_message:
-                self.logger.error("%s: Error querying Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error querying Jamf. [%s]" % exception_message)
-                return
-
-            #
-            # begin parsing data returned from Jamf
+            # the search runs in the background, search_results() displays the matches.
+            # see scl_jamf/search.py
             self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("%i matches returned." % len(response_json['computers']))
-            self.logger.info("%s: %r" % (inspect.stack()[0][3], self.status_string.get()))
-
-            search_font = tkFont.Font(font='TkDefaultFont')
-            match_results = []
-            max_length = 0
-            #
-            # parse each returned computer element, retaining Jamf ID and Computer name
-            # properly format value to display
-            # build a version of the computer name used to sort by
-            #  these rules are for our environment and may have no effect in yours.
-            #  if the name is in the format "labmac-1" the integer is expanded to -0001
-            #  if the name is in the format "[lost] labmac-1" the sorting name is stored as
-            #    "labmac-1a" to differentiate it from "labmac-1"
-            # the values are added to a list containing the previously processed values as
-            #   [sorting name, computer name, jamf id]
-            for node in response_json['computers']:
-                match_id = node['id']
-                match_name = node['name']
-                if not match_name:
-                    match_name = "Not named."
-
-                name_trim = match_name
-
-                try:
-                    number_part = re.search(r'(\d+)', name_trim).group(1)
-                    number_free = "".join([i for i in name_trim if not i.isdigit()])
-                    expanded_number = '{:04d}'.format(int(number_part))
-                    expanded_x = number_free + expanded_number
-                    name_trim = expanded_x
-                except:
-                    pass
-
-                if "[" in name_trim:
-                    name_trim = re.search(r']([ -]*)(.*)', name_trim).group(2)
-                    name_trim = str(name_trim) + "a"
-
-                match_results.append([name_trim, match_name, match_id])
-                (string_width, string_height) = (search_font.measure(match_name + " (" + str(match_id) + ")"), search_font.metrics("linespace"))
-                if max_length < string_width:
-                    max_length = string_width
+            self.status_string.set("Searching...")
+            self.live_search.search(self.search_string.get())
 
-            #
-            # if there were returned results, build and display search results window
-            #
-            #
-            # position results window next to the main window, even if it has moved
-            #  from the original location
-            # while sorting the list based on the synthetic string,
-            #  display the computer name and ID
-            # bind clicks to function
-            if match_results:
+    def search_typed(self, *args):
+        """
+        search as the user types, LiveSearch waits for a pause
+        """
+        self.live_search.changed(self.search_string.get())
 
-                search_window = Toplevel()
+    def search_failed(self, term, error):
+        """
+        report a failed search
+        """
+        self.status_label.configure(style='Warning.TLabel')
+        self.status_string.set(client.describe_error(error))
 
-                split_geom = self.root.winfo_geometry().split("+")
-                r_h = int(split_geom[0].split("x")[0])
-                r_pos_x = int(split_geom[1])
-                r_pos_y = int(split_geom[2])
-                string_width = int(max_length + 22)
+    def search_results(self, term, matches):
+        """
+        display search results
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
 
-                search_window_geo = "%ix%i+%i+%i" % (string_width, 400, (r_h + r_pos_x + 10), (r_pos_y))
-                search_window.geometry(search_window_geo)
+        #
+        # sort by a natural version of the computer name, "labmac-2" before "labmac-10",
+        #  "[lost] labmac-1" after "labmac-1". see scl_jamf/search.py
+        # rows hold (label, jamf id), labels are displayed as "computer name (jamf id)"
+        match_results = search.result_rows(matches)
 
-                search_window.title("Search results")
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("%i matches returned for \"%s\"." % (len(match_results), term))
+        self.logger.info("%s: %r" % (inspect.stack()[0][3], self.status_string.get()))
 
-                list_frame = ttk.Frame(search_window, width=string_width, height=400, padding=(4, 0, 0, 0))
+        #
+        # if there were returned results, build and display search results window.
+        #  a single window is reused by every search until the user closes it,
+        #  see scl_jamf/results_window.py
+        if match_results or self.results_window.is_open():
+            self.results_window.show(match_results)
 
-                scrollbar = Scrollbar(list_frame)
-                scrollbar.pack(side=RIGHT, fill=Y)
+    def search_partial(self, term, matches, first):
+        """
+        display matches while a wide search is still arriving, search_results() sorts them when it's done
+        """
+        self.status_string.set("Searching...")
+        if first:
+            self.results_window.show(search.result_rows(matches))
+        else:
+            self.results_window.append(search.result_rows(matches))
 
-                listbox = Listbox(list_frame, bd=0, yscrollcommand=scrollbar.set, selectmode=SINGLE, width=190, height=400)
-                listbox.pack()
+    def search_selected(self, label, jamf_id):
+        """
+        handle clicks
+        """
 
-                scrollbar.config(command=listbox.yview)
+        #
+        # when a click occurs, call query method with the ID of the row
+        self.id_string.set(jamf_id)
+        self.query_jamf_id()
 
-                list_frame.pack()
+        self.root.lift()
 
-                for item in sorted(match_results):
-                    insert_string = item[1] + " (" + str(item[2]) + ")"
-                    listbox.insert(END, insert_string)
+    def load_data(self):
+        """
+        fetch profiles and policies in the background, the panes fill in as each arrives
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+        self.loading = set(['profiles', 'policies'])
+        self.load_errors = []
 
-                listbox.bind("<<ListboxSelect>>", double_click)
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Loading profiles and policies...")
+        self.load_progress.configure(value=0)
+        self.load_progress.grid()
 
-                search_window.mainloop()
+        tasks.BackgroundTask(self.root, self.build_profiles, on_done=self.profiles_loaded,
+                             on_error=lambda error: self.load_failed('profiles', error)).start()
+        tasks.BackgroundTask(self.root, self.build_policies, on_done=self.policies_loaded,
+                             on_error=lambda error: self.load_failed('policies', error),
+                             on_progress=self.policy_progress).start()
 
-    def build_profiles(self):
+    def policy_progress(self, done, total):
         """
-        Fetch and build profile data structures
+        update the progress bar as policies arrive
         """
-        #
-        # communicate with Jamf and grab generic profile list
-        # parse list, building dictionary along the way
-        # this should proceed quickly.
+        if not total:
+            return
+        self.load_progress.configure(maximum=total, value=done)
+        if self.refreshing:
+            self.status_string.set("Refreshing policies, %i of %i..." % (done, total))
+        else:
+            self.status_string.set("Loading policies, %i of %i..." % (done, total))
 
-        #
-        # communicate with Jamf server
-        self.logger.info("%s: activated" % inspect.stack()[0][3])
-        try:
-            url = self.jamf_hostname + '/JSSResource/osxconfigurationprofiles'
-            request = urllib2.Request(url)
-            request.add_header('Accept', 'application/json')
-            request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
+    def profiles_loaded(self, profiles):
+        self.jamf_profiles = profiles
+        if self.displayed_computer:
+            self.display_profiles(self.displayed_computer)
+        self.load_finished('profiles')
 
-            response = urllib2.urlopen(request)
-            response_json = json.loads(response.read())
+    def policies_loaded(self, results):
+        self.jamf_policies, self.failed_policies = results
+        if self.displayed_computer:
+            self.display_policies(self.displayed_computer)
+        self.load_finished('policies')
 
-            #
-            # a non-200 response is bad, report and return
-            if response.code != 200:
-                self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("%i returned." % response.code)
-                return
+    def load_failed(self, name, error):
+        """
+        report a background load that failed, the application stays usable for lookups
+        """
+        message = client.describe_error(error)
+        self.logger.error("%s: %s %s" % (inspect.stack()[0][3], name, message))
+        tkMessageBox.showerror("Error", "Unable to load %s. %s" % (name, message))
 
-        #
-        # handle various communication errors
-        except urllib2.HTTPError, error:
-            if error.code == 400:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Request error.")))
-            elif error.code == 401:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Authorization error.")))
-            elif error.code == 403:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Permissions error.")))
-            elif error.code == 404:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Resource not found.")))
-            elif error.code == 409:
-                contents = error.read()
-                error_message = re.findall(r"Error: (.*)<", contents)
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Resource conflict. " + error_message[0])))
-            else:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Generic error.")))
+        if name == 'profiles':
+            self.jamf_profiles = policies.ProfileResolver(self.jamf, self.logger)
+        else:
+            self.jamf_policies = scope_index.ScopeIndex()
+
+        self.load_errors.append(name)
+        self.load_finished(name)
 
-            sys.exit()
-        except urllib2.URLError, error:
-            self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-            tkMessageBox.showerror("Error", "Error contacting JAMF server.")
-            sys.exit()
-        except Exception as exception_message:
-            self.logger.error("%s: Error querying Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-            tkMessageBox.showerror("Error", ("Error querying Jamf. [%s]" % exception_message))
-            sys.exit()
+    def load_finished(self, name):
+        """
+        hide the progress bar once everything has loaded
+        """
+        self.loading.discard(name)
+        if self.loading:
+            return
 
-        tmp_profiles = {}
+        self.load_progress.grid_remove()
+        if self.load_errors:
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set("Unable to load %s." % " and ".join(self.load_errors))
+        else:
+            self.status_label.configure(style='Normal.TLabel')
+            self.status_string.set("Ready.")
+            self.report_failed_policies()
 
-        for item in response_json['os_x_configuration_profiles']:
-            tmp_profiles[item["id"]] = item["name"]
+        #
+        # stale cached policies were shown as they were, refetch them in the background soon
+        if self.policy_loader.stale_remaining:
+            self.schedule_refresh(self.policy_revalidate_delay)
+        else:
+            self.schedule_refresh()
 
-        self.logger.info("%s: %i profiles" % (inspect.stack()[0][3], len(tmp_profiles)))
-        self.logger.info("%s: complete" % inspect.stack()[0][3])
-        return tmp_profiles
+    def build_profiles(self, task):
+        """
+        Fetch and build profile data structures
+        """
+        #
+        # runs as a background task, errors are reported by load_failed()
+        self.logger.info("build_profiles: activated")
+        return policies.load_profiles(self.jamf, self.logger, self.profile_scope, self.policy_workers,
+                                      self.policy_requests_per_second, self.policy_timeout)
 
-    def build_policies(self):
+    def build_policies(self, task):
         """
         fetch and build policy data structures
         """
         #
-        # communicate with Jamf and grab generic policy list
-        #
-        #             --- this is the slow bit ---
-        # communicate with Jamf and grab each individual policy record
-        #  with each record
-        #   retain name, id and if the policy applies to all computers
-        #   retain IDs of specific computers the policy applies to
-        #   retain ID's and names of computer groups the policy applies to
-        #  add these values as a list to previously processed policies
+        # runs as a background task, errors are reported by load_failed()
         # this will not proceed quickly.
+        self.logger.info("build_policies: activated")
 
         #
-        # There have to be better ways to handle this...
-        #
-        # Split off account info, to limit the number of parameters going into the mapped funtion
-        local_jamf_hostname = self.jamf_hostname
-        local_jamf_password = self.jamf_password
-        local_jamf_username = self.jamf_username
-        local_logger = self.logger
-
-        def fetch_parse_policy(this_policy):
-            """
-            pull policy from jss and parse.
-            does it make more sense to parse outside the function?!? speedwise?
-            """
-            local_logger.info("fetch_parse_policy: fetching policy #%s" % this_policy)
+        # a warm cache is used as it is, background refreshes revalidate stale policies. without them they are refetched now
+        return self.policy_loader.load(task.progress, stale_limit=0 if self.refresh_interval else None)
 
-            #
-            # communicate with Jamf server
-            try:
-                url = local_jamf_hostname + '/JSSResource/policies/id/' + this_policy + '/subset/general&scope'
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(local_jamf_username + ':' + local_jamf_password))
+    def schedule_refresh(self, seconds=None):
+        """
+        queue the next periodic refresh, replacing one already queued. seconds defaults to refresh_interval
+        """
+        if self.refresh_timer:
+            self.root.after_cancel(self.refresh_timer)
+            self.refresh_timer = None
+        if self.refresh_interval:
+            if seconds is None:
+                seconds = self.refresh_interval * 60
+            self.refresh_timer = self.root.after(int(seconds * 1000), self.periodic_refresh)
+
+    def periodic_refresh(self):
+        self.refresh_timer = None
+        self.refresh_data(full=False)
+
+    def refresh_data(self, full=True):
+        """
+        reload profiles and policies in the background
 
-                response = urllib2.urlopen(request)
-                response_json = json.loads(response.read())
+        the current data stays on display until the new data has loaded, then both are replaced at once.
+        full refetches every policy, otherwise only policies that are new, renamed or older than policy_refresh_age,
+        at most policy_refresh_limit of the old ones.
+        """
+        self.logger.info("%s: activated (full=%r)" % (inspect.stack()[0][3], full))
 
-                #
-                # a non-200 response is bad, report and return
-                if response.code != 200:
-                    local_logger.error("fetch_parse_policy: Unexpected response: %i" % response.code)
-                    return None
+        #
+        # load_finished() and refresh_finished() queue the next periodic refresh
+        if self.loading or self.refreshing:
+            return
 
-            #
-            # nowhere near enough error handling...
-            # do we really need to exit? try the policy again? Report the error when the UI is drawn?
-            # add policy to list, how? it's a single function...
-            #
-            #
-            # return the policy with the name and set an error flag in the list?
-            #   return([tmp_name, tmp_id, tmp_all, tmp_cs, tmp_cgroups, error_condition]) ?!?!?
-            # check tmp_policies at the end for error flags?
-            #   pop the bad policy off the list and note the error in the UI?
-            #   quit exit and not the error in the dialog?
-            #   have the ui check for error and color red for every machine?
-            #   parse final list for errors "error-103"?
-            #
-            #
-            #
-            except Exception as exception_message:
-                local_logger.error("fetch_parse_policy: Error querying Jamf. [%s] Exiting." % (exception_message))
-                sys.exit()
+        self.refreshing = True
+        self.refresh_btn.configure(state='disabled')
+        if full:
+            self.status_label.configure(style='Normal.TLabel')
+            self.status_string.set("Refreshing profiles and policies...")
+            self.load_progress.configure(value=0)
+            self.load_progress.grid()
 
+        def reload_data(task):
             #
-            # return the whole response, postpone processing until all data retrieved
-            return response_json
-
-        #
-        # communicate with Jamf server
-        self.logger.info("%s: activated" % inspect.stack()[0][3])
-        try:
-            url = self.jamf_hostname + '/JSSResource/policies'
-            request = urllib2.Request(url)
-            request.add_header('Accept', 'application/json')
-            request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
+            # runs as a background task, errors are reported by refresh_failed()
+            profiles = policies.load_profiles(self.jamf, self.logger, self.profile_scope, self.policy_workers,
+                                              self.policy_requests_per_second, self.policy_timeout)
+            if full:
+                policy_index, failed_policies = self.policy_loader.load(task.progress, 0)
+            else:
+                policy_index, failed_policies = self.policy_loader.load(task.progress, self.policy_refresh_age, self.policy_refresh_limit)
+            return profiles, policy_index, failed_policies
 
-            response = urllib2.urlopen(request)
-            response_json = json.loads(response.read())
+        tasks.BackgroundTask(self.root, reload_data, on_done=self.data_refreshed, on_error=self.refresh_failed,
+                             on_progress=self.policy_progress if full else None).start()
 
-            #
-            # a non-200 response is bad, report and return
-            if response.code != 200:
-                self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                self.status_string.set("%i returned." % response.code)
-                return
+    def data_refreshed(self, results):
+        """
+        swap in refreshed profiles and policies, and redisplay the current computer with them
+        """
+        self.jamf_profiles, self.jamf_policies, self.failed_policies = results
 
         #
-        # handle various communication errors
-        except urllib2.HTTPError, error:
-            if error.code == 400:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Request error.")))
-            elif error.code == 401:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Authorization error.")))
-            elif error.code == 403:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Permissions error.")))
-            elif error.code == 404:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Resource not found.")))
-            elif error.code == 409:
-                contents = error.read()
-                error_message = re.findall(r"Error: (.*)<", contents)
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Resource conflict. " + error_message[0])))
-            else:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                tkMessageBox.showerror("Error", ("HTTP code %i: %s " % (error.code, "Generic error.")))
+        # a retry queued for the old policies is replaced by one for the new policies
+        if self.retry_timer:
+            self.root.after_cancel(self.retry_timer)
+            self.retry_timer = None
+        self.policy_retry_count = 0
+        self.refresh_finished()
+
+        if self.displayed_computer:
+            self.display_profiles(self.displayed_computer)
+            self.display_policies(self.displayed_computer)
+
+        if self.failed_policies:
+            self.report_failed_policies()
+        else:
+            self.status_label.configure(style='Normal.TLabel')
+            self.status_string.set("Profiles and policies refreshed.")
 
-            sys.exit()
-        except urllib2.URLError, error:
-            self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-            tkMessageBox.showerror("Error", "Error contacting JAMF server.")
-            sys.exit()
-        except Exception as exception_message:
-            self.logger.error("%s: Error querying Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-            tkMessageBox.showerror("Error", ("Error querying Jamf. [%s]" % exception_message))
-            sys.exit()
+    def refresh_failed(self, error):
+        """
+        keep the current data if a refresh fails
+        """
+        message = client.describe_error(error)
+        self.logger.error("%s: %s" % (inspect.stack()[0][3], message))
+        self.refresh_finished()
+        self.status_label.configure(style='Warning.TLabel')
+        self.status_string.set("Unable to refresh profiles and policies. %s" % message)
 
-        tmp_policies = []
-        policy_count = len(response_json['policies'])
-        self.logger.info("%s: %i policies" % (inspect.stack()[0][3], policy_count))
+    def refresh_finished(self):
+        self.refreshing = False
+        self.refresh_btn.configure(state='normal')
+        self.load_progress.grid_remove()
 
-        policy_id_list = []
-        for item in response_json['policies']:
-            policy_id_list.append(str(item['id']))
+        #
+        # stale policies are revalidated a slice at a time, come back soon for the next one
+        if self.policy_loader.stale_remaining:
+            self.schedule_refresh(self.policy_revalidate_delay)
+        else:
+            self.schedule_refresh()
 
-        pool = multiprocess.Pool()
+    def retry_failed_policies(self):
+        """
+        refetch policies that failed to load on a background thread
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+        self.retry_timer = None
 
-        start_time = time.time()
+        retry_ids = self.failed_policies
+        policy_index = self.jamf_policies
+        self.failed_policies = []
+        self.policy_retry_count += 1
 
-        tmp_policies = pool.map(fetch_parse_policy, policy_id_list)
+        def merge_results(results):
+            #
+            # a refresh finished meanwhile, its policies are newer than these
+            if policy_index is not self.jamf_policies:
+                return
 
-        elapsed_time = time.time() - start_time
-        self.logger.info("%s: Elapsed time spent fetching and parsing policies: %r" % (inspect.stack()[0][3], elapsed_time))
+            fetched_policies, self.failed_policies = results
+            for item in fetched_policies:
+                policies.add_policy(self.jamf_policies, item)
 
-        #
-        # postponed processing from mapped function
-        # hoping for additional performance increases
-        final_policies = []
-        for item in tmp_policies:
-            tmp_name = item['policy']['general']['name']
-            tmp_id = item['policy']['general']['id']
-            tmp_allcomputers = item['policy']['scope']['all_computers']
+            self.logger.info("retry_failed_policies: %i recovered, %i still failing" % (len(fetched_policies), len(self.failed_policies)))
+            if fetched_policies and self.displayed_computer:
+                self.display_policies(self.displayed_computer)
+            self.report_failed_policies()
 
-            tmp_scopecomputergroups = []
-            for subpolicy in item['policy']['scope']['computer_groups']:
-                tmp_scopecomputergroups.append(subpolicy['name'])
+        def retry_failed(error):
+            self.logger.error("retry_failed_policies: %s" % error)
+            if policy_index is not self.jamf_policies:
+                return
+            self.failed_policies = retry_ids
+            self.report_failed_policies()
 
-            tmp_scopecomputers = []
-            for subpolicy in item['policy']['scope']['computers']:
-                tmp_scopecomputers.append(subpolicy['id'])
+        tasks.BackgroundTask(self.root, lambda task: self.policy_loader.fetch(retry_ids),
+                             on_done=merge_results, on_error=retry_failed).start()
 
-            final_policies.append([tmp_name, tmp_id, tmp_allcomputers, tmp_scopecomputers, tmp_scopecomputergroups])
+    def report_failed_policies(self):
+        """
+        show policies that failed to load in the status bar and schedule a retry
+        """
+        if self.failed_policies:
+            failed_list = ", ".join(str(item) for item in self.failed_policies[:10])
+            if len(self.failed_policies) > 10:
+                failed_list += "..."
 
-        self.logger.info("%s: complete" % inspect.stack()[0][3])
-        return final_policies
+            self.status_label.configure(style='Warning.TLabel')
+            if self.policy_retry_count < self.policy_retry_limit:
+                self.status_string.set("%i policies failed to load (%s), retrying in background." % (len(self.failed_policies), failed_list))
+                if self.retry_timer:
+                    self.root.after_cancel(self.retry_timer)
+                self.retry_timer = self.root.after(self.policy_retry_delay * 1000, self.retry_failed_policies)
+            else:
+                self.status_string.set("%i policies failed to load (%s)." % (len(self.failed_policies), failed_list))
+            self.logger.error("%s: policies failed to load: %r" % (inspect.stack()[0][3], self.failed_policies))
+
+        elif self.policy_retry_count:
+            self.status_label.configure(style='Normal.TLabel')
+            self.status_string.set("All policies loaded.")
 
     def query_jamf_me(self):
         """
@@ -835,180 +846,102 @@ class Summarize(object):
         """
 
         #
-        # this method finds the UUID for the local machine
-        # query's jamf and parses the ID from the record
-        # and then calls the main query method
-        # it's wasteful the first time it's called.
+        # the local Jamf ID is usually known by now, prefetch_local_id() looks it up at startup.
+        # otherwise find the UUID for the local machine and query Jamf for its ID in the background,
+        # then call the main query method
         self.logger.info("%s: activated" % inspect.stack()[0][3])
-        if not self.local_jamf_id:
-
-            if platform.system() == 'Darwin':
-                local_uuid_raw = subprocess.check_output(["system_profiler", "SPHardwareDataType"])
-                local_uuid = re.findall(r'Hardware UUID: (.*)', local_uuid_raw)[0]
-            elif platform.system() == 'Windows':
-                local_uuid_raw = subprocess.check_output("wmic CsProduct Get UUID")
-                local_uuid_raw = local_uuid_raw.split("\r\r\n")[1]
-                local_uuid = local_uuid_raw.split(" ")[0]
-            else:
+        if self.local_jamf_id:
+            self.logger.info("%s: local jamf id %r" % (inspect.stack()[0][3], self.local_jamf_id))
+            self.id_string.set(self.local_jamf_id)
+            self.query_jamf_id(this_device=True)
+            return
+
+        def found_local_id(jamf_id):
+            if jamf_id is None:
                 self.status_label.configure(style='Warning.TLabel')
                 self.status_string.set("Missing native UUID discovery.")
                 return
 
-            #
-            # communicate with Jamf server
-            try:
-                url = self.jamf_hostname + '/JSSResource/computers/udid/' + local_uuid
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-                response = urllib2.urlopen(request)
-                response_json = json.loads(response.read())
+            self.local_jamf_id = jamf_id
+            self.query_jamf_me()
 
-                #
-                # a non-200 response is bad, report and return
-                if response.code != 200:
-                    self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("%i returned." % response.code)
-                    return
+        def lookup_failed(error):
+            message = client.describe_error(error)
+            self.logger.error("query_jamf_me: %s" % message)
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set(message)
 
-                self.local_jamf_id = response_json['computer']['general']['id']
-                self.id_string.set(self.local_jamf_id)
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Looking up this device...")
+        tasks.BackgroundTask(self.root, lambda task: self.local_machine.lookup(), on_done=found_local_id, on_error=lookup_failed).start()
 
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 400:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-                elif error.code == 401:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-                elif error.code == 403:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-                elif error.code == 404:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-                elif error.code == 409:
-                    contents = error.read()
-                    error_message = re.findall(r"Error: (.*)<", contents)
-                    print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-                else:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-                return
-            except urllib2.URLError, error:
-                self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error contacting JSS.")
-                return
-            except Exception as exception_message:
-                self.logger.error("%s: Error querying Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error querying Jamf. [%s]" % exception_message)
-                return
+    def prefetch_local_id(self):
+        """
+        look up the Jamf ID of this device in the background, so This Device doesn't wait for it
+        """
+        def prefetched(jamf_id):
+            self.local_jamf_id = jamf_id
 
-        else:
-            self.logger.info("%s: local jamf id %r" % (inspect.stack()[0][3], self.local_jamf_id))
-            self.id_string.set(self.local_jamf_id)
+        def prefetch_failed(error):
+            self.logger.warn("prefetch_local_id: %s" % client.describe_error(error))
 
-        self.query_jamf_id()
+        tasks.BackgroundTask(self.root, lambda task: self.local_machine.lookup(), on_done=prefetched, on_error=prefetch_failed).start()
 
-    def query_jamf_id(self):
+    def query_jamf_id(self, this_device=False):
         """
-        Query jamf about other machine
+        Query jamf about other machine, this_device if the ID came from the local machine lookup
         """
 
         #
-        # requests full record from Jamf for a specific computer
+        # requests full record from Jamf for a specific computer in the background
         #  call display method and pass record
         self.logger.info("%s: activated" % inspect.stack()[0][3])
         self.reset_display()
 
-        if not self.id_string.get():
+        #
+        # a newer query replaces one still in flight
+        if self.query_task and self.query_task.running:
+            self.query_task.cancel()
+        self.query_task = None
+
+        jamf_id = self.id_string.get()
+        if not jamf_id:
             self.logger.error("%s: No JAMF ID set" % inspect.stack()[0][3])
             self.status_label.configure(style='Warning.TLabel')
             self.status_string.set("No JAMF ID set.")
             return
         else:
-            self.logger.info("%s: Querying Jamf ID %s" % (inspect.stack()[0][3], self.id_string.get()))
+            self.logger.info("%s: Querying Jamf ID %s" % (inspect.stack()[0][3], jamf_id))
             self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("Querying Jamf ID %s." % self.id_string.get())
+            self.status_string.set("Querying Jamf ID %s." % jamf_id)
 
-        #
-        # communicate with Jamf server
-        try:
-            url = self.jamf_hostname + '/JSSResource/computers/id/' + self.id_string.get()
-
-            request = urllib2.Request(url)
-            request.add_header('Accept', 'application/json')
-            request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
+        def fetch_record(task):
+            #
+            # runs as a background task, errors are reported by query_failed()
+            return computers.get_computer(self.jamf, 'id/' + jamf_id, reflection.SECTIONS).json()
 
-            response = urllib2.urlopen(request)
-            response_json = json.loads(response.read())
+        def queried(response_json):
+            self.query_task = None
 
             #
-            # a non-200 response is bad, report and return
-            if response.code != 200:
-                self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("%i returned." % response.code)
+            # a saved ID of this device can belong to another computer after a re-enrollment,
+            #  look it up again by UUID
+            if this_device and not self.local_machine.check(response_json):
+                self.local_jamf_id = None
+                self.query_jamf_me()
                 return
 
-        #
-        # handle various communication errors
-        except urllib2.HTTPError, error:
-            if error.code == 400:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-            elif error.code == 401:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-            elif error.code == 403:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-            elif error.code == 404:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-            elif error.code == 409:
-                contents = error.read()
-                error_message = re.findall(r"Error: (.*)<", contents)
-                print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-            else:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-            return
-        except urllib2.URLError, error:
-            self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error contacting JSS.")
-            return
-        except Exception as exception_message:
-            self.logger.error("%s: Error querying Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
+            self.logger.info("query_jamf_id: Queried Jamf ID %s" % jamf_id)
+            self.display_info(response_json)
+
+        def query_failed(error):
+            self.query_task = None
+            message = client.describe_error(error)
+            self.logger.error("query_jamf_id: %s" % message)
             self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error querying Jamf. [%s]" % exception_message)
-            return
+            self.status_string.set(message)
 
-        self.logger.info("%s: Queried Jamf ID %s" % (inspect.stack()[0][3], self.id_string.get()))
-        self.display_info(response_json)
+        self.query_task = tasks.BackgroundTask(self.root, fetch_record, on_done=queried, on_error=query_failed).start()
 
     def display_info(self, response_json):
         """
@@ -1029,8 +962,6 @@ class Summarize(object):
         self.printer_field.delete('0.0', END)
         self.group_field.delete('0.0', END)
         self.package_field.delete('0.0', END)
-        self.jamf_profiles_field.delete('0.0', END)
-        self.jamf_policies_field.delete('0.0', END)
 
         #
         # set StringVars
@@ -1114,17 +1045,10 @@ class Summarize(object):
         self.ea_field.delete(END+'-2c', END)
 
         #
-        # parse and display profiles
-        # configuration_profiles section only includes ID's, no useable names
-        # with list of ID's
-        #  consult previously generated dictionary for names
-        raw_profiles = response_json['computer']['configuration_profiles']
-        for item in sorted(raw_profiles, reverse=True):
-            try:
-                self.jamf_profiles_field.insert('1.0', self.jamf_profiles[item["id"]] + "\n")
-            except:
-                pass
-        self.jamf_profiles_field.delete(END+'-2c', END)
+        # profiles and policies depend on data loaded in the background,
+        # remember the record so the panes can be filled in when it arrives
+        self.displayed_computer = response_json
+        self.display_profiles(response_json)
 
         #
         # parse and display installed software
@@ -1141,22 +1065,82 @@ class Summarize(object):
             self.package_field.insert('1.0', 'Casper', ('BOLD'))
         self.package_field.delete(END+'-2c', END)
 
+        self.display_policies(response_json)
+
+    def display_profiles(self, response_json):
+        """
+        display profiles of the computer, or a placeholder while they load
+        """
+        self.jamf_profiles_field.delete('0.0', END)
+        if self.jamf_profiles is None:
+            self.jamf_profiles_field.tag_configure("ITAL", font='monoco 12 italic')
+            self.jamf_profiles_field.insert('1.0', "Loading...", ('ITAL'))
+            return
+
+        #
+        # parse and display profiles
+        # configuration_profiles section only includes ID's, no useable names
+        # with list of ID's
+        #  consult the profile resolver for names
+        #  profiles it doesn't know yet are shown by ID and fetched in the background
+        #  with profile scope loaded, profiles scoped to the computer but not installed are listed in italics
+        #
+        # profiles installed outside of Jamf are reported with an ID of -1, skip them
+        profiles = self.jamf_profiles
+        installed_ids = [item['id'] for item in response_json['computer']['configuration_profiles'] if item['id'] > 0]
+
+        fmt_profiles = []
+        unknown_ids = []
+        for item in installed_ids:
+            name = profiles.get(item)
+            if name is None:
+                unknown_ids.append(item)
+                name = "Profile #%s" % item
+            fmt_profiles.append([name.lower(), name, 'NORM'])
+
+        if profiles.scope is not None:
+            raw_groups = response_json['computer']['groups_accounts']['computer_group_memberships']
+            for item in profiles.scope.applicable_ids(response_json['computer']['general']['id'], raw_groups):
+                if item not in installed_ids:
+                    name = profiles.scope.names[item] + " (not installed)"
+                    fmt_profiles.append([name.lower(), name, 'ITAL'])
+
+        self.jamf_profiles_field.tag_configure("NORM", font='monoco 12 normal')
+        self.jamf_profiles_field.tag_configure("ITAL", font='monoco 12 italic')
+        for item in sorted(fmt_profiles, reverse=True):
+            self.jamf_profiles_field.insert('1.0', item[1] + "\n", (item[2]))
+        self.jamf_profiles_field.delete(END+'-2c', END)
+
+        if profiles.unknown(unknown_ids):
+            def resolved(added):
+                if added and profiles is self.jamf_profiles and response_json is self.displayed_computer:
+                    self.display_profiles(response_json)
+
+            tasks.BackgroundTask(self.root, lambda task: profiles.resolve(unknown_ids), on_done=resolved,
+                                 on_error=lambda error: self.logger.error("display_profiles: %s" % client.describe_error(error))).start()
+
+    def display_policies(self, response_json):
+        """
+        display policies scoped to the computer, or a placeholder while they load
+        """
+        self.jamf_policies_field.delete('0.0', END)
+        if self.jamf_policies is None:
+            self.jamf_policies_field.tag_configure("ITAL", font='monoco 12 italic')
+            self.jamf_policies_field.insert('1.0', "Loading...", ('ITAL'))
+            return
+
         #
         # parse and display policies
         #
         # parsing pass
-        #  parse previously generate list of policies
-        #   if the policy applies to all computers add it's name to new list
-        #   if the current jamf ID appears in the list of specific computer the policy applies to, add the name to the list
-        #   if one of the groups the computer belongs to appears in the list of groups the policy applies to, add it to the list
+        #  consult previously generated policy index
+        #   policies that apply to all computers
+        #   policies scoped to the current jamf ID
+        #   policies scoped to one of the groups the computer belongs to
         #
         # sort and display the list.
-        valid_policies = []
-        for item in self.jamf_policies:
-            for subitem in raw_groups:
-                if subitem in item[4]:
-                    if item[0] not in valid_policies:
-                        valid_policies.append(item[0])
+        raw_groups = response_json['computer']['groups_accounts']['computer_group_memberships']
+        valid_policies = self.jamf_policies.applicable(response_json['computer']['general']['id'], raw_groups)
 
         fmt_policies = []
         for item in valid_policies:
@@ -1175,6 +1159,7 @@ class Summarize(object):
         self.fullname_string.set("")
         self.checkin_string.set("")
         self.inventory_string.set("")
+        self.displayed_computer = None
 
         self.ea_field.delete('0.0', END)
         self.printer_field.delete('0.0', END)
@@ -1184,364 +1169,22 @@ class Summarize(object):
         self.jamf_policies_field.delete('0.0', END)
 
 
-def login(logger):
-    """
-    if the user has proper privleges, consider them an authorized user and proceed
-    """
-    def read_create_prefs(logger):
-        """
-        Read specified config file or create default data structure
-        """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-        config_path = ''
-
-        executable_name = os.path.basename(sys.argv[0])
-
-        if executable_name.count('.') > 1:
-            filename = executable_name.split('.')[:-1]
-            filename = '.'.join(filename)
-        else:
-            filename = executable_name.split('.')[0]
-
-        try:
-            if '_' in filename:
-                split_filename = filename.split('_')
-                try:
-                    int(split_filename[-1][0])
-                    del split_filename[-1]
-                except Exception as exception_message:
-                    print(exception_message)
-                config_name = 'edu.scl.utah.' + '_'.join(split_filename) + '.ini'
-            else:
-                config_name = 'edu.scl.utah.' + filename + '.ini'
-
-        except Exception as exception_message:
-            logger.error("Error creating config_name [%s]. %s" % (executable_name, exception_message))
-            return '', ''
-
-        if platform.system() == 'Darwin':
-            if os.path.exists(pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)):
-                config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
-            elif os.path.exists(os.path.join('/', 'Library', 'Preferences', config_name)):
-                config_path = os.path.join('/', 'Library', 'Preferences', config_name)
-            else:
-                config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
-
-        elif platform.system() == 'Windows':
-            config_path = os.path.join(os.environ['APPDATA'], config_name)
-
-        if not os.path.exists(config_path):
-            logger.warn("Configuration file not found, creating structure in memory.")
-            config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-            config_file.add_section('login')
-            config_file.set('login', 'hosts', 'https://new_server:8443')
-            config_file.set('login', 'username', '')
-
-        else:
-            config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-            try:
-                config_file.read(config_path)
-            except Exception as exception_message:
-                logger.error("Error reading pre-exiting configuration file [%s]. %s" % (config_path, exception_message))
-                config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-                config_file.add_section('login')
-                config_file.set('login', 'hosts', 'https://new_server:8443')
-                config_file.set('login', 'username', '')
-
-        logger.info("Configuration path: %s" % config_path)
-        return config_file, config_path
-
-    def injest_prefs(logger, configfile):
-        """
-        Create data structures from config file
-        """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-        config_options = {}
-        config_options["login"] = {}
-
-        for section in ["login"]:
-            for item in configfile.options(section):
-                if "use_" in item:
-                    try:
-                        config_options[section][item] = configfile.getboolean(section, item)
-                    except:
-                        config_options[section][item] = False
-                elif "path" in item:
-                    config_options[section][item] = configfile.get(section, item)
-                else:
-                    config_options[section][item] = configfile.get(section, item)
-
-        logger.info("Configuration file variables:")
-        for key, value in config_options.items():
-            logger.info(key)
-            for sub_key, sub_value in value.items():
-                logger.info("\t%s %r" % (sub_key, sub_value))
-
-        return config_options["login"]["hosts"]
-
-    def modify_prefs(logger, config_file, config_path, hostnames, valid_host):
-        """
-        Convert data structures back into config file and write out changes.
-        """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-
-        hostnames.remove("https://new_server:8443")
-
-        if valid_host not in hostnames:
-            logger.info("%s not in configuration file, adding." % valid_host)
-            hostnames.append(valid_host)
-            config_file.set('login', 'hosts', ",".join(hostnames))
-
-            try:
-                with open(config_path, "wb") as config_write:
-                    config_file.write(config_write)
-                    logger.info("Wrote configuration file at %s." % config_path)
-            except Exception as exception_message:
-                logger.error("Error writing configuration file [%s]. %s" % (config_path, exception_message))
-
-    def try_login():
-        """
-        jamf api call for login test
-        """
-
-        def call_jss(logger, api_call):
-            """
-            consolidate API calls to single function
-            pass in logger and api call.
-            """
-            logger.info("%s: activated" % inspect.stack()[0][3])
-
-            try:
-                url = jamf_hostname.get() + '/JSSResource/' + api_call
-
-                logger.info("%s called with %s" % (inspect.stack()[0][3], api_call))
-
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(jamf_username.get() + ':' + jamf_password.get()))
-
-                response = urllib2.urlopen(request)
-
-                logger.info("Code returned: %s %s" % (response.code, api_call))
-
-                if response.code != 200:
-                    logger.error("login: Invalid response from Jamf (" + api_call + ")")
-                    tkMessageBox.showerror("Jamf login", "Invalid response from Jamf")
-                    root.destroy()  # clean up after yourself!
-                    sys.exit()
-
-                response_json = json.loads(response.read())
-
-                return response_json
-
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 401:
-                    logger.error("%s: Invalid username or password. (%r) (%s)" % (inspect.stack()[0][3], jamf_username.get(), api_call))
-                    tkMessageBox.showerror("Jamf login", "Invalid username or password.")
-                else:
-                    logger.error("%s: Error communicating with JSS. %s %s" % (inspect.stack()[0][3], jamf_hostname.get(), api_call))
-                    tkMessageBox.showerror("Jamf login", "HTTP error from:\n%s" % jamf_hostname.get())
-            except urllib2.URLError:
-                logger.error("%s: Error contacting JSS: %s %s" % (inspect.stack()[0][3], jamf_hostname.get(), api_call))
-                tkMessageBox.showerror("Jamf login", "Unable to contact:\n%s" % jamf_hostname.get())
-            except Exception as exception_message:
-                logger.error("%s: Generic error. (%r) %s" % (inspect.stack()[0][3], exception_message, api_call))
-                tkMessageBox.showerror("Jamf login", "Generic error from %s." % jamf_hostname.get())
-
-            #
-            # handle bad condition exits here...
-            logger.error("%s: Exiting, Error calling %s" % (inspect.stack()[0][3], api_call))
-            sys.exit()
-
-        logger.info("%s: activated" % inspect.stack()[0][3])
-
-        try:
-            # Attempt to verify LDAP users.
-            #   1. Pull JSS acounts for users and groups
-            #   2. Pull LDAP servers
-            #   3. Build list of valid groups, those with appropriate rights
-            #   4. Check each LDAP server for valid groups the user is a member of, login if found
-            #   5. Fall back to jss user login, check account for appropriate rights
-
-            jss_accounts = call_jss(logger, 'accounts')
-
-            raw_ldap = call_jss(logger, 'ldapservers')
-            ldap_servers = raw_ldap['ldap_servers']
-            logger.info("JSS LDAP servers: %r" % ldap_servers)
-
-            #
-            # store list of user and group privileges
-            user_list = jss_accounts['accounts']['users']
-            group_list = jss_accounts['accounts']['groups']
-
-            #
-            # find groups on jss that have required_privileges
-            valid_groups = []
-            for item in group_list:
-                raw_privs = call_jss(logger, 'accounts/groupid/' + str(item['id']))
-                this_group_privs = raw_privs['group']['privileges']['jss_objects']
-
-                count_privileges = len(required_privileges)
-
-                for this_privilege in required_privileges:
-                    if this_privilege in this_group_privs:
-                        count_privileges -= 1
-
-                if count_privileges == 0:
-                    logger.info("%s is valid." % item['name'])
-                    valid_groups.append([item['id'], item['name']])
-
-            #
-            # find servers with valid groups the user is a member of
-            valid_servers = []
-            for server in ldap_servers:
-                for group in valid_groups:
-                    raw_group_membership = call_jss(logger, 'ldapservers/id/' + str(server['id']) + '/group/' + urllib.quote(str(group[1])) + '/user/' + jamf_username.get())
-
-                    if raw_group_membership['ldap_users']:
-                        valid_servers.append(server['name'])
-
-            #
-            # if we found a valid server, proceed to app
-            if valid_servers:
-                logger.info('valid server found, login successful.')
-                root.destroy()  # clean up after yourself!
-                return
-
-            #
-            # check users account privileges for required rights
-            else:
-                raw_privileges = call_jss(logger, 'accounts/username/' + jamf_username.get())
-                user_privileges = raw_privileges['account']['privileges']['jss_objects']
-
-                #
-                # stop number of require privileges
-                count_privileges = len(required_privileges)
-
-                #
-                # for every required privilege
-                #  check if it's in user privileges
-                #   decrement if yes
-                # maintain list of missing require privileges
-                missing_privileges = []
-
-                for item in required_privileges:
-                    if item in user_privileges:
-                        count_privileges -= 1
-                    else:
-                        missing_privileges.append(item)
-
-                #
-                # if all require privileges accounted for, proceed
-                # else alert and fail
-                if count_privileges == 0:
-                    logger.info("login: valid login. (%r)" % jamf_username.get())
-                    root.destroy()  # clean up after yourself!
-                    return
-                else:
-                    logger.error("login: User %r lacks appropriate privileges: %r" % (jamf_username.get(), missing_privileges))
-                    tkMessageBox.showerror("Jamf login", "User lacks appropriate privileges.\n%r" % missing_privileges)
-
-        #
-        # handle various communication errors
-        except urllib2.HTTPError, error:
-
-            logger.info("Code returned: %s" % error.code)
-
-            if error.code == 401:
-                logger.error("%s: Invalid username or password. (%r)" % (inspect.stack()[0][3], jamf_username.get()))
-                tkMessageBox.showerror("Jamf login", "Invalid username or password.")
-            else:
-                logger.error("%s: Error communicating with JSS. %s" % (inspect.stack()[0][3], jamf_hostname.get()))
-                tkMessageBox.showerror("Jamf login", "HTTP error from:\n%s" % jamf_hostname.get())
-        except urllib2.URLError:
-            logger.error("%s: Error contacting JSS: %s" % (inspect.stack()[0][3], jamf_hostname.get()))
-            tkMessageBox.showerror("Jamf login", "Unable to contact:\n%s" % jamf_hostname.get())
-        except Exception as exception_message:
-            logger.error("%s: Generic error. (%r)" % (inspect.stack()[0][3], exception_message))
-            tkMessageBox.showerror("Jamf login", "Generic error from %s." % jamf_hostname.get())
-
-        sys.exit()
-
-    #
-    # This is really important. This list contains the required rights for the fields we need to access.
-    required_privileges = ['Read Accounts', 'Read Buildings', 'Read Computers', 'Update Computers', 'Read Departments', 'Read User', 'Update User']
-
-    # read or create prefs
-    preference_file, preference_path = read_create_prefs(logger)
-    hostnames = injest_prefs(logger, preference_file).split(',')
-
-    if 'new_server' not in hostnames[0]:
-        hostnames.append("https://new_server:8443")
-
-    root = Tk()
-    jamf_username = StringVar()
-    jamf_password = StringVar()
-    jamf_hostname = StringVar()
-
-    #
-    # build and display login screen
-    root.title("Jamf Login")
-    mainframe = ttk.Frame(root)
-    mainframe.grid(column=0, row=0, sticky=NSEW)
-    root.columnconfigure(0, weight=1)
-    root.rowconfigure(0, weight=1)
-    root.geometry('+0+0')
-
-    ttk.Label(mainframe, text="Jamf Server:").grid(column=1, row=10, sticky=E)
-    hostname_combobox = ttk.Combobox(mainframe, width=30, textvariable=jamf_hostname)
-    hostname_combobox['values'] = hostnames
-    hostname_combobox.current(0)
-    hostname_combobox.grid(column=2, row=10, sticky=EW)
-
-    ttk.Label(mainframe, text="Username:").grid(column=1, row=20, sticky=E)
-    uname_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_username)
-    uname_entry.grid(column=2, row=20, sticky=EW)
-
-    ttk.Label(mainframe, text="Password:").grid(column=1, row=30, sticky=E)
-    pword_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_password, show="*")
-    pword_entry.grid(column=2, row=30, sticky=EW)
-
-    ttk.Button(mainframe, text="Quit", command=sys.exit).grid(column=2, row=70, padx=3)
-    ttk.Button(mainframe, text="Login", default='active', command=try_login).grid(column=2, row=70, padx=3, sticky=E)
-
-    if platform.system() == 'Darwin':
-        tmpl = 'tell application "System Events" to set frontmost of every process whose unix id is {} to true'
-        script = tmpl.format(os.getpid())
-        output = subprocess.check_call(['/usr/bin/osascript', '-e', script])
-
-    root.bind('<Return>', lambda event: try_login())
-
-    uname_entry.focus()
-    root.mainloop()
-
-    if preference_path:
-        modify_prefs(logger, preference_file, preference_path, hostnames, jamf_hostname.get())
-    else:
-        logger.error("No path to preferences, no save attempt.")
-
-    return (jamf_hostname.get(), jamf_username.get(), jamf_password.get())
-
-
 def main():
 
-    global local_jamf_hostname
-    global local_jamf_password
-    global local_jamf_username
-    global local_logger
-
     logger = loggers.file_logger(name='cargoship')
     logger.info("Running Cargo Ship")
     logger.info("Level: Method/function: Message")
 
-    jamf_hostname, jamf_username, jamf_password = login(logger)
-    if not jamf_username:
+    #
+    # This is really important. This list contains the required rights for the fields we need to access.
+    required_privileges = ['Read Accounts', 'Read Buildings', 'Read Computers', 'Update Computers', 'Read Departments', 'Read User', 'Update User']
+
+    session = login.login(logger, required_privileges)
+    if not session:
         sys.exit(0)
 
     main_window = Tk()
-    my_app = Summarize(main_window, logger, jamf_hostname, jamf_username, jamf_password)
+    my_app = Summarize(main_window, logger, session)
     main_window.mainloop()
 
 
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Cargo Ship batch mode: reflect many computers at once, without the UI.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# reflect.py ###################################################################
+#
+# Audits whole labs: the policy index and profile list are built once, then
+# computers are fetched concurrently and one record per computer is written
+# to stdout as it arrives, JSON (one object per line) or CSV.
+#
+#   reflect.py -H https://jamf.example.edu:8443 -u user 1234 C02XXXXXXXXX
+#   reflect.py -H ... -u user --search 'LAB-MAC-*' --format csv > lab.csv
+#   reflect.py -H ... -u user --file ids.txt
+#
+# Computers are given as Jamf IDs or serial numbers. The password is read
+# from $JAMF_PASSWORD or prompted for. Progress and errors go to stderr.
+#
+################################################################################
+
+from __future__ import print_function
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+import urllib
+from management_tools import loggers
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from scl_jamf import client
+from scl_jamf import computers
+from scl_jamf import fetcher
+from scl_jamf import policies
+from scl_jamf import reflection
+
+
+def computer_match(identifier):
+    """
+    all digits is a Jamf ID, anything else a serial number
+    """
+    if identifier.isdigit():
+        return 'id/' + identifier
+    return 'serialnumber/' + urllib.quote(identifier)
+
+
+def search_computers(jamf_client, pattern):
+    """
+    Jamf IDs of computers matching a search pattern, * is a wildcard
+    """
+    matches = jamf_client.stream_list('computers/match/' + urllib.quote(pattern), 'computers')
+    return [str(item['id']) for item in matches]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report what Jamf thinks should be on many computers.")
+    parser.add_argument('identifiers', nargs='*', help="Jamf IDs or serial numbers")
+    parser.add_argument('-H', '--hostname', required=True, help="Jamf server, https://jamf.example.edu:8443")
+    parser.add_argument('-u', '--username', required=True)
+    parser.add_argument('-f', '--file', help="file of Jamf IDs or serial numbers, one per line, - for stdin")
+    parser.add_argument('-s', '--search', help="computers matching a Jamf search pattern")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--workers', type=int, default=6, help="concurrent computer requests")
+    parser.add_argument('--rate', type=float, default=20, help="requests per second, 0 for no limit")
+    parser.add_argument('--refresh', action='store_true', help="refetch every policy instead of reusing cached ones")
+    args = parser.parse_args()
+
+    logger = loggers.file_logger(name='cargoship_reflect')
+    logger.info("Running Cargo Ship batch mode")
+
+    password = os.environ.get('JAMF_PASSWORD') or getpass.getpass("Password for %s: " % args.username)
+    jamf_client = client.shared_client(args.hostname, args.username, password, logger)
+
+    identifiers = list(args.identifiers)
+    if args.file:
+        source = sys.stdin if args.file == '-' else open(args.file)
+        identifiers.extend(line.strip() for line in source if line.strip())
+    if args.search:
+        identifiers.extend(search_computers(jamf_client, args.search))
+
+    if not identifiers:
+        parser.error("no computers given")
+
+    #
+    # build the shared data once for every computer
+    print("Loading profiles and policies...", file=sys.stderr)
+    profiles = policies.load_profiles(jamf_client, logger)
+    loader = policies.PolicyLoader(jamf_client, logger, args.workers, args.rate)
+    policy_index, failed_policies = loader.load(max_age=0 if args.refresh else None)
+    if failed_policies:
+        print("Warning: %i policies failed to load and are missing from the results: %s" %
+              (len(failed_policies), ", ".join(str(item) for item in failed_policies)), file=sys.stderr)
+
+    def fetch_computer(jamf_client, identifier):
+        response_json = computers.get_computer(jamf_client, computer_match(identifier), reflection.SECTIONS).json()
+        return reflection.summarize(response_json, policy_index, profiles)
+
+    if args.format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(reflection.CSV_FIELDS)
+
+    computer_fetcher = fetcher.Fetcher(jamf_client, logger, args.workers, args.rate)
+    for identifier, summary, error in computer_fetcher.imap(fetch_computer, identifiers):
+        if error:
+            print("%s: unable to fetch computer. %s" % (identifier, client.describe_error(error)), file=sys.stderr)
+            continue
+
+        if args.format == 'csv':
+            writer.writerow(reflection.csv_row(summary))
+        else:
+            print(json.dumps(summary, sort_keys=True))
+        sys.stdout.flush()
+
+    print("%i computers, %i failed." % (len(identifiers), len(computer_fetcher.failed)), file=sys.stderr)
+    jamf_client.close()
+    sys.exit(1 if computer_fetcher.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,14 @@ Usage:
     python setup.py py2app
 """
 
+import os
+import sys
 from setuptools import setup
 
+#
+# make the shared scl_jamf package at the top of the repository visible to py2app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 APP = ['cargo_ship.py']
 APP_NAME = "Cargo Ship"
 DATA_FILES = []
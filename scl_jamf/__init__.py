@@ -0,0 +1,3 @@
+"""
+Modules shared by the SCL Jamf Tools applications (Tugboat and Cargo Ship).
+"""
@@ -0,0 +1,168 @@
+"""
+Update many computer records from a CSV or JSON file.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# bulk_update.py ###############################################################
+#
+# Input is a CSV file with a header row, or a JSON list of objects. Each row
+# needs the Jamf id of the computer and one or more computer_record field
+# names:
+#
+#   id,building,room
+#   1234,Marriott Library,1705
+#
+# Empty values are skipped, the field is left as it is in Jamf. Every row is
+# sent as its own PUT through a Fetcher, and the outcome of each row is
+# written to a CSV result log as it completes.
+#
+################################################################################
+
+from __future__ import print_function
+import codecs
+import csv
+import json
+import os
+
+from scl_jamf import client
+from scl_jamf import computer_record
+from scl_jamf import fetcher
+
+#
+# other column names people are likely to use
+ALIASES = {
+    'jamf_id': 'id',
+    'computer_name': 'name',
+    'barcode': 'barcode_1',
+    'email': 'email_address',
+    'full_name': 'real_name',
+}
+
+LOG_FIELDS = ['row', 'id', 'result', 'message']
+
+
+def normalize(row):
+    """
+    lower case, aliased column names with empty values removed
+    """
+    values = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower().replace(' ', '_')
+        key = ALIASES.get(key, key)
+        if isinstance(value, str):
+            value = value.decode('utf-8')
+        elif value is not None and not isinstance(value, unicode):
+            value = unicode(value)
+        if value is not None and value.strip():
+            values[key] = value.strip()
+    return values
+
+
+def read_rows(path):
+    """
+    list of normalized rows from a .json or .csv file
+
+    raises ValueError for unknown columns, before anything is sent to Jamf
+    """
+    with open(path, 'rb') as source:
+        if os.path.splitext(path)[1].lower() == '.json':
+            rows = json.load(source)
+            if isinstance(rows, dict):
+                rows = rows.get('computers', [])
+        else:
+            reader = csv.DictReader(source)
+
+            #
+            # Excel saves UTF-8 CSV files with a byte order mark before the first header
+            if reader.fieldnames and reader.fieldnames[0].startswith(codecs.BOM_UTF8):
+                reader.fieldnames[0] = reader.fieldnames[0][len(codecs.BOM_UTF8):]
+            rows = list(reader)
+
+    rows = [normalize(row) for row in rows]
+
+    unknown = set()
+    for row in rows:
+        unknown.update(key for key in row if key != 'id' and key not in computer_record.FIELD_NAMES)
+    if unknown:
+        raise ValueError("Unknown columns: %s" % ", ".join(sorted(unknown)))
+
+    return rows
+
+
+class BulkUpdater(object):
+    """
+    PUT computer_record XML for each row with bounded concurrency
+    """
+    def __init__(self, jamf_client, logger, workers=4, requests_per_second=10):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+
+    def update_computer(self, jamf_client, item):
+        row_number, row = item
+        top = computer_record.build_xml(row)
+        self.logger.info("update_computer: row %i, computer %s" % (row_number, row['id']))
+        return jamf_client.put_xml('computers/id/' + str(row['id']), top)
+
+    def run(self, rows, log_path, progress=None):
+        """
+        update every row, writing the result log
+
+        returns (succeeded, failed) counts, progress(done, total) is called as rows finish
+        """
+        succeeded = 0
+        failed = 0
+        done = 0
+
+        with open(log_path, 'wb') as log_file:
+            log = csv.writer(log_file)
+            log.writerow(LOG_FIELDS)
+
+            def write_result(row_number, row, result, message):
+                log.writerow([row_number, row.get('id', '').encode('utf-8'), result, message])
+                log_file.flush()
+
+            #
+            # rows that can't be sent are logged without contacting Jamf
+            work = []
+            for row_number, row in enumerate(rows, 1):
+                if not row.get('id', '').isdigit():
+                    write_result(row_number, row, 'skipped', "Missing or invalid Jamf ID.")
+                    failed += 1
+                elif len(row) == 1:
+                    write_result(row_number, row, 'skipped', "No fields to update.")
+                    failed += 1
+                else:
+                    work.append((row_number, row))
+
+            total = len(work)
+            update_fetcher = fetcher.Fetcher(self.jamf_client, self.logger, self.workers, self.requests_per_second)
+            for (row_number, row), response, error in update_fetcher.imap(self.update_computer, work):
+                if error:
+                    write_result(row_number, row, 'failed', client.describe_error(error))
+                    failed += 1
+                else:
+                    write_result(row_number, row, 'updated', "%i Submitted." % response.code)
+                    succeeded += 1
+
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        self.logger.info("run: %i updated, %i failed, results in %s" % (succeeded, failed, log_path))
+        return succeeded, failed
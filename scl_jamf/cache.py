@@ -0,0 +1,160 @@
+"""
+Small key/value caches with a time to live.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# cache.py #####################################################################
+#
+# DiskCache keeps string keys and JSON values in a single file under
+# storage.cache_path(), for data that's small, slow to gather and changes
+# rarely. Entries older than max_age seconds are ignored and dropped on save().
+#
+# MemoryCache is an LRU of at most size entries that also expire after
+# max_age seconds, for lookups repeated within a session. Given a DiskCache
+# it writes entries through to it and falls back to it on a miss, so they
+# survive a restart.
+#
+################################################################################
+
+from __future__ import print_function
+import collections
+import json
+import os
+import threading
+import time
+
+
+class DiskCache(object):
+    """
+    JSON file of key -> value, each entry expiring after max_age seconds
+    """
+    def __init__(self, path, max_age, logger=None):
+        self.path = path
+        self.max_age = max_age
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        try:
+            with open(path) as cache_file:
+                self.entries = json.load(cache_file)
+        except (IOError, ValueError) as error:
+            if os.path.exists(path) and logger:
+                logger.warn("DiskCache: ignoring unreadable cache %s [%s]" % (path, error))
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return default
+        return entry[1]
+
+    def get_entry(self, key):
+        """
+        (time saved, value) of an unexpired entry, None if there is none
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return None
+        return entry[0], entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = [time.time(), value]
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+    def save(self):
+        """
+        drop expired entries and write the file, replacing the old one in a single step
+        """
+        now = time.time()
+        with self.lock:
+            self.entries = dict((key, entry) for key, entry in self.entries.items() if now - entry[0] <= self.max_age)
+            contents = json.dumps(self.entries)
+
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as cache_file:
+                cache_file.write(contents)
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as error:
+            if self.logger:
+                self.logger.error("DiskCache: Error writing %s [%s]" % (self.path, error))
+
+
+class MemoryCache(object):
+    """
+    LRU of key -> value, each entry expiring after max_age seconds, optionally backed by a DiskCache
+    """
+    def __init__(self, size=256, max_age=900, disk=None):
+        self.size = size
+        self.max_age = max_age
+        self.disk = disk
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and now - entry[0] <= self.max_age:
+                self.entries[key] = entry
+                return entry[1]
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None and now - entry[0] <= self.max_age:
+                self._remember(key, entry[0], entry[1])
+                return entry[1]
+
+        return default
+
+    def set(self, key, value):
+        self._remember(key, time.time(), value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def _remember(self, key, stamp, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (stamp, value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def save(self):
+        if self.disk is not None:
+            self.disk.save()
@@ -0,0 +1,337 @@
+"""
+Pooled, keep-alive client for the Jamf Pro Classic API.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# client.py ####################################################################
+#
+# Every Jamf call used to build a fresh urllib2.Request, re-encode the Basic
+# auth header and pay for a new TCP + TLS handshake. JamfClient keeps a small
+# pool of persistent HTTP/1.1 connections per Jamf host and hands them out to
+# callers (including worker threads), so the handshake is paid once per
+# connection instead of once per call.
+#
+# stream_list() parses list endpoints (policies, computers/match/...) element
+# by element as the body arrives instead of buffering the whole document.
+#
+# Errors are raised as urllib2.HTTPError and urllib2.URLError so the existing
+# error handling in the applications keeps working unchanged.
+#
+################################################################################
+
+from __future__ import print_function
+import base64
+import errno
+import httplib
+import json
+import os
+import Queue
+import re
+import socket
+import ssl
+import threading
+import urllib2
+import urlparse
+import xml.etree.cElementTree as ET
+from StringIO import StringIO
+
+from scl_jamf import json_stream
+
+
+def _timed_out(error):
+    return isinstance(error, socket.timeout) or (isinstance(error, ssl.SSLError) and 'timed out' in str(error))
+
+
+def _closed_unanswered(error):
+    """
+    True if a sent request's connection closed before any response arrived, the server dropped an idle connection
+    """
+    if isinstance(error, httplib.BadStatusLine):
+        #
+        # an empty status line, older pythons report it as "''"
+        return error.line in ('', "''") or error.line.startswith("No status line received")
+    if _timed_out(error):
+        return False
+    return isinstance(error, socket.error) and error.errno in (errno.ECONNRESET, errno.EPIPE)
+
+
+class JamfResponse(object):
+    """
+    Completed response from Jamf, body already read so the connection can be reused
+    """
+    def __init__(self, url, code, headers, body):
+        self.url = url
+        self.code = code
+        self.headers = headers
+        self.body = body
+        self._json = None
+
+    def json(self):
+        """
+        parsed body, parsed once however often it's asked for
+        """
+        if self._json is None:
+            self._json = json.loads(self.body)
+        return self._json
+
+
+class JamfClient(object):
+    """
+    Persistent, pooled connections to a single Jamf host
+    """
+    def __init__(self, jamf_hostname, jamf_username, jamf_password, logger=None, max_connections=8, timeout=60):
+        """
+        parse host and prepare authorization header once
+        """
+        self.jamf_hostname = jamf_hostname.rstrip('/')
+        self.jamf_username = jamf_username
+        self.jamf_password = jamf_password
+        self.logger = logger
+        self.timeout = timeout
+
+        parsed = urlparse.urlparse(self.jamf_hostname)
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip('/')
+
+        self.auth_header = 'Basic ' + base64.b64encode(jamf_username + ':' + jamf_password)
+
+        self.max_connections = max_connections
+        self.stream_chunk_size = 16384
+        self._reset_pool()
+
+    def _reset_pool(self):
+        #
+        # sockets must never be shared with a forked child process, so the
+        # pool is tied to the process that created it.
+        self._pid = os.getpid()
+        self._idle = Queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            return httplib.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        """
+        returns (connection, reused)
+        """
+        if self._pid != os.getpid():
+            self._reset_pool()
+
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait(), True
+        except Queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, connection, keep):
+        if keep:
+            self._idle.put(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def url(self, api_call):
+        """
+        full url for an api call, either relative to /JSSResource/ or an absolute path
+        """
+        if api_call.startswith('/'):
+            return self.jamf_hostname + api_call
+        return self.jamf_hostname + '/JSSResource/' + api_call
+
+    def _send(self, method, api_call, body, headers, timeout):
+        """
+        send a request over a pooled connection
+
+        returns (url, connection, response) with the body unread, the caller releases the connection
+        """
+        url = self.url(api_call)
+        path = self.base_path + url[len(self.jamf_hostname):]
+
+        all_headers = {'Authorization': self.auth_header, 'Accept': 'application/json'}
+        if headers:
+            all_headers.update(headers)
+
+        #
+        # an idle keep-alive connection may have been closed by the server,
+        # in that case retry on a fresh connection. only if the request couldn't
+        # be sent, or the connection closed without a byte of response: a
+        # timeout may mean Jamf is still running a PUT or POST, it isn't resent.
+        while True:
+            connection, reused = self._acquire()
+            connection.timeout = self.timeout if timeout is None else timeout
+            if connection.sock:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                sent = False
+                connection.request(method, path, body, all_headers)
+                sent = True
+                return url, connection, connection.getresponse()
+            except (httplib.HTTPException, socket.error, ssl.SSLError) as error:
+                self._release(connection, False)
+                if reused and not _timed_out(error) and (not sent or _closed_unanswered(error)):
+                    continue
+                if self.logger:
+                    self.logger.error("request: Error contacting JSS. %s %s [%s]" % (method, url, error))
+                raise urllib2.URLError(error)
+            except:
+                self._release(connection, False)
+                raise
+
+    def _read(self, url, connection, response):
+        """
+        read the whole body and release the connection
+        """
+        try:
+            content = response.read()
+        except (httplib.HTTPException, socket.error, ssl.SSLError) as error:
+            self._release(connection, False)
+            if self.logger:
+                self.logger.error("request: Error reading from JSS. %s [%s]" % (url, error))
+            raise urllib2.URLError(error)
+        except:
+            self._release(connection, False)
+            raise
+
+        self._release(connection, not response.will_close)
+        return content
+
+    def request(self, method, api_call, body=None, headers=None, timeout=None):
+        """
+        issue a request over a pooled connection and return a JamfResponse
+
+        timeout (seconds) overrides the client default for this request only
+        """
+        url, connection, response = self._send(method, api_call, body, headers, timeout)
+        content = self._read(url, connection, response)
+
+        if response.status < 200 or response.status >= 300:
+            raise urllib2.HTTPError(url, response.status, response.reason, response.msg, StringIO(content))
+
+        return JamfResponse(url, response.status, response.msg, content)
+
+    def stream_list(self, api_call, key, timeout=None):
+        """
+        GET a list endpoint and iterate over the elements under key as they arrive
+
+        HTTP errors are raised before this returns, connection errors while iterating
+        """
+        url, connection, response = self._send('GET', api_call, None, None, timeout)
+        if response.status < 200 or response.status >= 300:
+            content = self._read(url, connection, response)
+            raise urllib2.HTTPError(url, response.status, response.reason, response.msg, StringIO(content))
+
+        items = self._stream_items(url, connection, response, key)
+        #
+        # step into the generator so the connection is released even if it's never iterated
+        next(items)
+        return items
+
+    def _stream_items(self, url, connection, response, key):
+        finished = False
+        try:
+            yield None
+            for item in json_stream.iter_items(iter(lambda: response.read(self.stream_chunk_size), ''), key):
+                yield item
+            response.read()
+            finished = True
+        except (httplib.HTTPException, socket.error, ssl.SSLError) as error:
+            if self.logger:
+                self.logger.error("stream_list: Error reading from JSS. %s [%s]" % (url, error))
+            raise urllib2.URLError(error)
+        finally:
+            self._release(connection, finished and not response.will_close)
+
+    def get(self, api_call, timeout=None):
+        return self.request('GET', api_call, timeout=timeout)
+
+    def get_json(self, api_call, timeout=None):
+        """
+        GET an api call and return the parsed JSON
+        """
+        return self.request('GET', api_call, timeout=timeout).json()
+
+    def put_xml(self, api_call, xml_data):
+        """
+        PUT an ElementTree element or XML string
+        """
+        if not isinstance(xml_data, basestring):
+            xml_data = ET.tostring(xml_data)
+        return self.request('PUT', api_call, xml_data, {'Content-Type': 'text/xml'})
+
+    def close(self):
+        """
+        close idle connections
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+
+#
+# one client per host and account, shared by everything in the process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(jamf_hostname, jamf_username, jamf_password, logger=None):
+    """
+    return the process-wide JamfClient for this host and account, creating it if needed
+    """
+    key = (jamf_hostname.rstrip('/'), jamf_username, jamf_password)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = JamfClient(jamf_hostname, jamf_username, jamf_password, logger)
+        elif logger and not _clients[key].logger:
+            _clients[key].logger = logger
+        return _clients[key]
+
+
+def discard_client(jamf_client):
+    """
+    forget a shared client and close its connections, e.g. after its credentials were refused
+    """
+    with _clients_lock:
+        for key, value in _clients.items():
+            if value is jamf_client:
+                del _clients[key]
+    jamf_client.close()
+
+
+def describe_error(error):
+    """
+    short, user facing description of an error raised by JamfClient
+    """
+    if isinstance(error, urllib2.HTTPError):
+        if error.code == 400:
+            return "HTTP code %i: %s" % (error.code, "Request error.")
+        elif error.code == 401:
+            return "HTTP code %i: %s" % (error.code, "Authorization error.")
+        elif error.code == 403:
+            return "HTTP code %i: %s" % (error.code, "Permissions error.")
+        elif error.code == 404:
+            return "HTTP code %i: %s" % (error.code, "Resource not found.")
+        elif error.code == 409:
+            error_message = re.findall(r"Error: (.*)<", error.read())
+            return "HTTP code %i: %s" % (error.code, "Resource conflict. " + (error_message[0] if error_message else ""))
+        return "HTTP code %i: %s" % (error.code, "Generic error.")
+    elif isinstance(error, urllib2.URLError):
+        return "Error contacting JSS."
+    return "Error querying Jamf. [%s]" % error
@@ -0,0 +1,190 @@
+"""
+Local copy of the Jamf computer list for instant searches.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# computer_index.py ############################################################
+#
+# /JSSResource/computers/subset/basic lists every computer with its id,
+# name, serial number, username, MAC address, udid, department, building and
+# last inventory date in a single request. The list is kept in a SQLite
+# database between runs and in memory while the application is open.
+#
+# refresh() reads the list again and only rewrites computers whose record
+# changed, deleting those no longer listed. search() matches a term against
+# the lowercase text fields of every computer, the same way Jamf's match
+# endpoint does, * is a wildcard. Results have the same shape as
+# computers/match elements.
+#
+# Asset tags and bar codes aren't part of subset/basic, they are indexed if
+# a Jamf version reports them, has_tags says whether it did. Without them
+# searches should also be passed on to Jamf, and searches that find nothing
+# locally always should.
+#
+################################################################################
+
+from __future__ import print_function
+import contextlib
+import json
+import re
+import sqlite3
+import time
+
+from scl_jamf import storage
+
+#
+# computers/subset/basic fields matched by search()
+FIELDS = ['name', 'serial_number', 'asset_tag', 'bar_code_1', 'barcode_1', 'username', 'realname',
+          'mac_address', 'alt_mac_address', 'udid', 'department', 'building']
+
+#
+# fields matched by Jamf that only some versions list in subset/basic
+TAG_FIELDS = ['asset_tag', 'bar_code_1', 'barcode_1']
+
+
+def search_text(record):
+    """
+    lowercase text searched for a computer, fields separated by newlines
+    """
+    values = []
+    for field in FIELDS:
+        if record.get(field):
+            values.append(unicode(record[field]).lower())
+    return u"\n".join(values)
+
+
+def has_tags(computers):
+    """
+    True if the listed records carry asset tags and bar codes
+    """
+    for text, record in computers:
+        return 'asset_tag' in record and ('bar_code_1' in record or 'barcode_1' in record)
+    return False
+
+
+class ComputerIndex(object):
+    """
+    searchable list of the computers on one Jamf host
+    """
+    def __init__(self, jamf_hostname, logger, path=None, max_age=900):
+        self.jamf_hostname = jamf_hostname.rstrip('/')
+        self.logger = logger
+        self.max_age = max_age
+        self.refreshed = 0
+        self.loaded = False
+        self.has_tags = False
+
+        #
+        # (search text, record) pairs, replaced as a whole so searches never see a partial list
+        self.computers = []
+
+        if path is None:
+            path = storage.cache_path('computers.sqlite')
+        self.path = path
+
+        #
+        # connections are opened per call so the index can be refreshed from any thread
+        with self._connect() as database:
+            database.execute("""CREATE TABLE IF NOT EXISTS computers (
+                                    host TEXT NOT NULL,
+                                    id INTEGER NOT NULL,
+                                    record TEXT NOT NULL,
+                                    PRIMARY KEY (host, id))""")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        open, commit and close a connection to the index
+        """
+        database = sqlite3.connect(self.path, timeout=30)
+        try:
+            with database:
+                yield database
+        finally:
+            database.close()
+
+    def load(self):
+        """
+        read the computers saved by the last refresh
+        """
+        with self._connect() as database:
+            rows = database.execute("SELECT record FROM computers WHERE host = ?", (self.jamf_hostname,)).fetchall()
+
+        computers = []
+        for (record,) in rows:
+            record = json.loads(record)
+            computers.append((search_text(record), record))
+
+        self.computers = computers
+        self.has_tags = has_tags(computers)
+        self.loaded = True
+        self.logger.info("load: %i computers in local index" % len(computers))
+        return len(computers)
+
+    def refresh(self, jamf_client):
+        """
+        update the index from computers/subset/basic
+
+        returns (computers added or changed, computers deleted)
+        """
+        with self._connect() as database:
+            saved = dict(database.execute("SELECT id, record FROM computers WHERE host = ?", (self.jamf_hostname,)).fetchall())
+
+        computers = []
+        changed = []
+        listed = set()
+        for record in jamf_client.stream_list('computers/subset/basic', 'computers'):
+            computer_id = int(record['id'])
+            listed.add(computer_id)
+            serialized = json.dumps(record, sort_keys=True)
+            if saved.get(computer_id) != serialized:
+                changed.append((self.jamf_hostname, computer_id, serialized))
+            computers.append((search_text(record), record))
+
+        deleted = [(self.jamf_hostname, computer_id) for computer_id in saved if computer_id not in listed]
+
+        with self._connect() as database:
+            if changed:
+                database.executemany("INSERT OR REPLACE INTO computers (host, id, record) VALUES (?, ?, ?)", changed)
+            if deleted:
+                database.executemany("DELETE FROM computers WHERE host = ? AND id = ?", deleted)
+
+        self.computers = computers
+        self.has_tags = has_tags(computers)
+        self.loaded = True
+        self.refreshed = time.time()
+        self.logger.info("refresh: %i computers, %i changed, %i deleted" % (len(computers), len(changed), len(deleted)))
+        return len(changed), len(deleted)
+
+    def stale(self):
+        return time.time() - self.refreshed > self.max_age
+
+    def search(self, term):
+        """
+        computers with a field containing term, * matches anything
+        """
+        term = term.strip().lower()
+        computers = self.computers
+        if '*' not in term:
+            return [record for text, record in computers if term in text]
+
+        pattern = re.compile('.*'.join(re.escape(part) for part in term.split('*')))
+        return [record for text, record in computers if pattern.search(text)]
+
+    def clear(self):
+        with self._connect() as database:
+            database.execute("DELETE FROM computers WHERE host = ?", (self.jamf_hostname,))
+        self.computers = []
+        self.refreshed = 0
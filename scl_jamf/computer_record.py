@@ -0,0 +1,64 @@
+"""
+XML for the computer record fields Tugboat edits.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# computer_record.py ###########################################################
+#
+# Used by Tugboat's Submit button and by bulk updates, so both send the
+# same document. If you add fields to the Tugboat UI, add them here as
+# (field name, section, xml tag). Field names are also the column names
+# accepted in bulk update files.
+#
+################################################################################
+
+from __future__ import print_function
+import xml.etree.cElementTree as ET
+
+FIELDS = [
+    ('name', 'general', 'name'),
+    ('asset_tag', 'general', 'asset_tag'),
+    ('barcode_1', 'general', 'barcode_1'),
+    ('username', 'location', 'username'),
+    ('email_address', 'location', 'email_address'),
+    ('real_name', 'location', 'real_name'),
+    ('phone', 'location', 'phone'),
+    ('building', 'location', 'building'),
+    ('room', 'location', 'room'),
+    ('position', 'location', 'position'),
+    ('department', 'location', 'department'),
+]
+
+FIELD_NAMES = [field for field, _, _ in FIELDS]
+
+
+def build_xml(values):
+    """
+    <computer> element holding the fields present in values, field name -> text
+
+    fields missing from values (or None) are left out, Jamf leaves them unchanged
+    """
+    top = ET.Element('computer')
+    sections = {}
+
+    for field, section, tag in FIELDS:
+        if values.get(field) is None:
+            continue
+        if section not in sections:
+            sections[section] = ET.SubElement(top, section)
+        element = ET.SubElement(sections[section], tag)
+        element.text = values[field]
+
+    return top
@@ -0,0 +1,89 @@
+"""
+Fetch only the sections of a computer record the caller reads.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# computers.py #################################################################
+#
+# A full computers/id/<id> record carries the whole software inventory,
+# applications, certificates and more, megabytes for some lab machines.
+# Callers name the sections they need and get computers/.../subset/A&B:
+#
+#   General, Location, Purchasing, Peripherals, Hardware, Certificates,
+#   Security, Software, ExtensionAttributes, GroupsAccounts, iphones,
+#   ConfigurationProfiles
+#
+# If a subset request is refused, or comes back without a requested
+# section, the full record is fetched instead. A host whose subset endpoint
+# was refused while the full record could be read is given full records
+# from then on. A single record missing a section or unreadable as a subset
+# only falls back for itself.
+#
+################################################################################
+
+from __future__ import print_function
+import re
+import urllib2
+
+#
+# hosts whose subset requests didn't work
+_full_records_only = set()
+
+
+def section_key(section):
+    """
+    key of a subset in the returned JSON, 'GroupsAccounts' -> 'groups_accounts'
+    """
+    return re.sub(r'(?<!^)([A-Z])', r'_\1', section).lower()
+
+
+def get_computer(jamf_client, match, sections=None, timeout=None):
+    """
+    JamfResponse for a computer record holding at least sections
+
+    match is 'id/<id>', 'udid/<uuid>', 'serialnumber/<serial>' or 'name/<name>'
+    sections None fetches the full record
+    """
+    api_call = 'computers/' + match
+    if not sections or jamf_client.jamf_hostname in _full_records_only:
+        return jamf_client.get(api_call, timeout=timeout)
+
+    endpoint_refused = False
+    try:
+        response = jamf_client.get(api_call + '/subset/' + '&'.join(sections), timeout=timeout)
+        computer = response.json()['computer']
+        missing = [section for section in sections if section_key(section) not in computer]
+        if not missing:
+            return response
+        reason = "missing %s" % ", ".join(missing)
+    except urllib2.HTTPError as error:
+        #
+        # authorization errors won't be different for the full record
+        if error.code in (401, 403) or error.code >= 500:
+            raise
+        reason = "HTTP code %i" % error.code
+        endpoint_refused = True
+    except (ValueError, KeyError) as error:
+        reason = "unreadable subset [%s]" % error
+
+    if jamf_client.logger:
+        jamf_client.logger.warn("get_computer: subset of %s failed (%s), fetching full record" % (api_call, reason))
+    response = jamf_client.get(api_call, timeout=timeout)
+
+    #
+    # the full record was there, so the subset endpoint itself is what Jamf refused
+    if endpoint_refused:
+        _full_records_only.add(jamf_client.jamf_hostname)
+    return response
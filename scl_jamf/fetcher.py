@@ -0,0 +1,219 @@
+"""
+Bounded, rate limited thread pool for fetching many Jamf records.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# fetcher.py ###################################################################
+#
+# Policy parsing used multiprocess.Pool(), which forked a full copy of the Tk
+# application per CPU and pickled the credentials into every worker. The work
+# is network bound, so threads sharing the pooled JamfClient do the same job
+# without forking.
+#
+#   workers               number of threads, bounds concurrent requests
+#   requests_per_second   cap shared by every Fetcher talking to the same host,
+#                         so a busy Jamf Tomcat node isn't overloaded. the
+#                         lowest rate asked for applies, 0 adds no cap of its own.
+#   retries, backoff      connection errors and 5xx responses (a 502 from one
+#                         node behind a load balancer) are retried after
+#                         backoff, 2 * backoff, 4 * backoff... seconds.
+#
+# A call that still fails is logged and its item added to Fetcher.failed, the
+# other results are returned as usual.
+#
+################################################################################
+
+from __future__ import print_function
+import Queue
+import random
+import threading
+import time
+import urllib2
+
+
+class RateLimiter(object):
+    """
+    spaces calls evenly so no more than requests_per_second are started
+    """
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.time()
+            start_time = max(self.next_time, now)
+            self.next_time = start_time + self.interval
+
+        if start_time > now:
+            time.sleep(start_time - now)
+
+
+#
+# one limiter per Jamf host
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def host_limiter(jamf_hostname, requests_per_second):
+    """
+    return the shared RateLimiter for a host, the lowest non-zero rate wins
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(jamf_hostname)
+        if limiter is None:
+            limiter = _limiters[jamf_hostname] = RateLimiter(requests_per_second)
+        elif requests_per_second:
+            #
+            # a Fetcher without a cap never lifts the cap of another
+            limiter.interval = max(limiter.interval, 1.0 / requests_per_second)
+        return limiter
+
+
+class Fetcher(object):
+    """
+    run a function over many items on a fixed number of threads
+    """
+    def __init__(self, jamf_client, logger, workers=8, requests_per_second=10, retries=3, backoff=1.0):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.workers = max(1, workers)
+        self.limiter = host_limiter(jamf_client.jamf_hostname, requests_per_second)
+        self.retries = retries
+        self.backoff = backoff
+        self.failed = []
+
+    def call(self, function, item):
+        """
+        function(jamf_client, item), retrying transient errors with exponential backoff
+        """
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            try:
+                return function(self.jamf_client, item)
+            except urllib2.HTTPError as error:
+                if error.code < 500 or attempt >= self.retries:
+                    raise
+                reason = "HTTP code %i" % error.code
+            except urllib2.URLError as error:
+                if attempt >= self.retries:
+                    raise
+                reason = error.reason
+
+            #
+            # a little jitter keeps the workers from retrying in lockstep
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+            attempt += 1
+            self.logger.warn("call: %r failed (%s), retry %i of %i in %.1fs" % (item, reason, attempt, self.retries, delay))
+            time.sleep(delay)
+
+    def map(self, function, items, progress=None):
+        """
+        function(jamf_client, item) for every item, results returned in item order
+
+        an item whose call still fails after retries returns None and is added to self.failed
+        progress(done, total) is called from the worker threads as items finish
+        """
+        items = list(items)
+        results = [None] * len(items)
+        self.failed = []
+        finished = [0]
+        finished_lock = threading.Lock()
+
+        work = Queue.Queue()
+        for index, item in enumerate(items):
+            work.put((index, item))
+
+        def worker():
+            while True:
+                try:
+                    index, item = work.get_nowait()
+                except Queue.Empty:
+                    return
+
+                try:
+                    results[index] = self.call(function, item)
+                except Exception as exception_message:
+                    self.logger.error("map: Error fetching %r. [%s]" % (item, exception_message))
+                    self.failed.append(item)
+
+                if progress:
+                    with finished_lock:
+                        finished[0] += 1
+                        done = finished[0]
+                    progress(done, len(items))
+
+        threads = []
+        for _ in range(min(self.workers, len(items))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def imap(self, function, items):
+        """
+        function(jamf_client, item) for every item, yields (item, result, error) as each call finishes
+
+        an item whose call still fails after retries yields (item, None, exception) and is added to self.failed
+        stopping early (break, or closing the generator) skips the items not yet started
+        """
+        items = list(items)
+        self.failed = []
+
+        work = Queue.Queue()
+        for item in items:
+            work.put(item)
+        finished = Queue.Queue()
+
+        def worker():
+            while True:
+                try:
+                    item = work.get_nowait()
+                except Queue.Empty:
+                    return
+
+                result = error = None
+                try:
+                    result = self.call(function, item)
+                except Exception as exception_message:
+                    self.logger.error("imap: Error fetching %r. [%s]" % (item, exception_message))
+                    self.failed.append(item)
+                    error = exception_message
+                finished.put((item, result, error))
+
+        for _ in range(min(self.workers, len(items))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for _ in range(len(items)):
+                yield finished.get()
+        finally:
+            while True:
+                try:
+                    work.get_nowait()
+                except Queue.Empty:
+                    break
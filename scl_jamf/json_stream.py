@@ -0,0 +1,81 @@
+"""
+Parse the elements of a JSON list as the document arrives.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# json_stream.py ###############################################################
+#
+# Jamf list endpoints return a single list under one key:
+#
+#   {"computers":[{"id":1,"name":"labmac-1",...},{"id":2,...}]}
+#
+# iter_items() finds the list and decodes one element at a time with
+# json.JSONDecoder.raw_decode, keeping only the unparsed tail of the document
+# in memory. The elements are expected to be objects, as they are for every
+# Jamf list.
+#
+################################################################################
+
+from __future__ import print_function
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_separators = re.compile(r'[\s,]*')
+
+
+def iter_items(chunks, key):
+    """
+    yield the elements of the list stored under key from an iterable of document chunks
+
+    nothing is yielded if key isn't found, ValueError is raised if the document ends mid-list
+    """
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    chunks = iter(chunks)
+    buffer = ''
+
+    #
+    # find the start of the list
+    while True:
+        match = start.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        buffer += chunk
+
+    #
+    # decode elements until the closing bracket, reading more whenever an element is incomplete
+    position = 0
+    while True:
+        position = _separators.match(buffer, position).end()
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                pass
+            else:
+                yield item
+                continue
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("JSON list %r ended early" % key)
+        buffer = buffer[position:] + chunk
+        position = 0
@@ -0,0 +1,138 @@
+"""
+Jamf ID of the computer the application is running on.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# local_machine.py #############################################################
+#
+# The This Device buttons need the local Jamf ID. Finding it meant running
+# system_profiler (seconds) for the hardware UUID, then asking Jamf for
+# computers/udid/<uuid>, every session.
+#
+# hardware_uuid() reads the UUID from ioreg, which answers in milliseconds,
+# falling back to system_profiler. LocalMachine keeps the Jamf ID in a
+# DiskCache (local_machine.json) keyed by host and UUID, so later sessions
+# skip the Jamf request.
+#
+# A computer re-enrolled in Jamf gets a new ID, so a saved ID can go stale.
+# Whoever displays the record fetched with it passes it to check(), which
+# compares the record's udid with the local UUID and forgets a saved ID
+# that no longer matches. The next lookup() asks Jamf again.
+#
+################################################################################
+
+from __future__ import print_function
+import platform
+import re
+import subprocess
+import threading
+
+from scl_jamf import cache
+from scl_jamf import computers
+from scl_jamf import storage
+
+_ioreg_uuid = re.compile(r'"IOPlatformUUID" = "([^"]+)"')
+
+
+def hardware_uuid():
+    """
+    hardware UUID of this computer, the udid Jamf records for it. None if it can't be read on this platform
+    """
+    if platform.system() == 'Darwin':
+        try:
+            match = _ioreg_uuid.search(subprocess.check_output(['ioreg', '-rd1', '-c', 'IOPlatformExpertDevice']))
+            if match:
+                return match.group(1)
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+        local_uuid_raw = subprocess.check_output(["system_profiler", "SPHardwareDataType"])
+        return re.findall(r'Hardware UUID: (.*)', local_uuid_raw)[0].strip()
+
+    elif platform.system() == 'Windows':
+        local_uuid_raw = subprocess.check_output("wmic CsProduct Get UUID")
+        local_uuid_raw = local_uuid_raw.split("\r\r\n")[1]
+        return local_uuid_raw.split(" ")[0]
+
+    return None
+
+
+class LocalMachine(object):
+    """
+    Jamf ID of this computer on one Jamf host, saved between runs
+    """
+    def __init__(self, jamf_client, logger, path=None, max_age=30 * 86400):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.uuid = None
+        self.jamf_id = None
+
+        #
+        # lookup() may be running in the background when This Device is pressed, the second call waits for the first
+        self.lock = threading.Lock()
+
+        if path is None:
+            path = storage.cache_path('local_machine.json')
+        self.store = cache.DiskCache(path, max_age, logger)
+
+    def key(self):
+        return self.jamf_client.jamf_hostname + '|' + self.uuid.lower()
+
+    def lookup(self):
+        """
+        Jamf ID of this computer, None if its UUID can't be read. blocks, so it belongs off the main thread
+
+        raises urllib2.HTTPError 404 if Jamf doesn't know this computer
+        """
+        with self.lock:
+            if self.jamf_id is not None:
+                return self.jamf_id
+
+            if self.uuid is None:
+                self.uuid = hardware_uuid()
+                if self.uuid is None:
+                    return None
+
+            jamf_id = self.store.get(self.key())
+            if jamf_id is None:
+                response = computers.get_computer(self.jamf_client, 'udid/' + self.uuid, ['General'])
+                jamf_id = response.json()['computer']['general']['id']
+                self.store.set(self.key(), jamf_id)
+                self.store.save()
+                self.logger.info("lookup: local jamf id %r from Jamf" % jamf_id)
+            else:
+                self.logger.info("lookup: local jamf id %r saved" % jamf_id)
+
+            self.jamf_id = jamf_id
+            return jamf_id
+
+    def check(self, response_json):
+        """
+        True if a computer record fetched with the local Jamf ID is this computer, the saved ID is forgotten if not
+        """
+        udid = response_json['computer']['general'].get('udid')
+        if not udid or not self.uuid or udid.lower() == self.uuid.lower():
+            return True
+
+        self.logger.warn("check: local jamf id %r belongs to %s, forgetting it" % (self.jamf_id, udid))
+        self.forget()
+        return False
+
+    def forget(self):
+        with self.lock:
+            self.jamf_id = None
+            if self.uuid:
+                self.store.set(self.key(), None)
+                self.store.save()
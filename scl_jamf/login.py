@@ -0,0 +1,312 @@
+"""
+Jamf login window and host preferences shared by Tugboat and Cargo Ship.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# login.py #####################################################################
+#
+# Both applications carried their own copy of the login window and the
+# preference functions. login() returns a Session holding the pooled
+# JamfClient that checked the user's privileges, so the main window starts
+# with warm connections, and the PrivilegeCheck that produced the access
+# level.
+#
+# The preference file is named after the running executable:
+#
+#   tugboat.py, Tugboat 1.7.app -> edu.scl.utah.tugboat.ini
+#
+# and lives in ~/Library/Preferences (or /Library/Preferences) on macOS and
+# %APPDATA% on Windows.
+#
+################################################################################
+
+from __future__ import print_function
+import ConfigParser
+import inspect
+import os
+import platform
+import subprocess
+import sys
+import tkMessageBox
+import ttk
+import urllib2
+from Tkinter import *
+
+from scl_jamf import client
+from scl_jamf import privileges
+
+if platform.system() == 'Darwin':
+    import pwd
+
+NEW_SERVER = "https://new_server:8443"
+
+
+class Session(object):
+    """
+    an authenticated Jamf user
+    """
+    def __init__(self, jamf_client, jamf_password, privilege_check, access_level):
+        self.jamf_client = jamf_client
+        self.jamf_hostname = jamf_client.jamf_hostname
+        self.jamf_username = privilege_check.username
+        self.jamf_password = jamf_password
+        self.privilege_check = privilege_check
+        self.access_level = access_level
+
+
+def read_create_prefs(logger):
+    """
+    Read specified config file or create default data structure
+    """
+    logger.info("%s: activated" % inspect.stack()[0][3])
+    config_path = ''
+
+    executable_name = os.path.basename(sys.argv[0])
+
+    if executable_name.count('.') > 1:
+        filename = executable_name.split('.')[:-1]
+        filename = '.'.join(filename)
+    else:
+        filename = executable_name.split('.')[0]
+
+    try:
+        if '_' in filename:
+            split_filename = filename.split('_')
+            try:
+                int(split_filename[-1][0])
+                del split_filename[-1]
+            except Exception as exception_message:
+                print(exception_message)
+            config_name = 'edu.scl.utah.' + '_'.join(split_filename) + '.ini'
+        else:
+            config_name = 'edu.scl.utah.' + filename + '.ini'
+
+    except Exception as exception_message:
+        logger.error("Error creating config_name [%s]. %s" % (executable_name, exception_message))
+        return '', ''
+
+    if platform.system() == 'Darwin':
+        if os.path.exists(pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)):
+            config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
+        elif os.path.exists(os.path.join('/', 'Library', 'Preferences', config_name)):
+            config_path = os.path.join('/', 'Library', 'Preferences', config_name)
+        else:
+            config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
+
+    elif platform.system() == 'Windows':
+        config_path = os.path.join(os.environ['APPDATA'], config_name)
+
+    if not os.path.exists(config_path):
+        logger.warn("Configuration file not found, creating structure in memory.")
+        config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
+        config_file.add_section('login')
+        config_file.set('login', 'hosts', NEW_SERVER)
+        config_file.set('login', 'username', '')
+
+    else:
+        config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
+        try:
+            config_file.read(config_path)
+        except Exception as exception_message:
+            logger.error("Error reading pre-exiting configuration file [%s]. %s" % (config_path, exception_message))
+            config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
+            config_file.add_section('login')
+            config_file.set('login', 'hosts', NEW_SERVER)
+            config_file.set('login', 'username', '')
+
+    logger.info("Configuration path: %s" % config_path)
+    return config_file, config_path
+
+
+def injest_prefs(logger, configfile):
+    """
+    Create data structures from config file
+    """
+    logger.info("%s: activated" % inspect.stack()[0][3])
+    config_options = {}
+    config_options["login"] = {}
+
+    for section in ["login"]:
+        for item in configfile.options(section):
+            if "use_" in item:
+                try:
+                    config_options[section][item] = configfile.getboolean(section, item)
+                except:
+                    config_options[section][item] = False
+            elif "path" in item:
+                config_options[section][item] = configfile.get(section, item)
+            else:
+                config_options[section][item] = configfile.get(section, item)
+
+    logger.info("Configuration file variables:")
+    for key, value in config_options.items():
+        logger.info(key)
+        for sub_key, sub_value in value.items():
+            logger.info("\t%s %r" % (sub_key, sub_value))
+
+    return config_options["login"]["hosts"]
+
+
+def modify_prefs(logger, config_file, config_path, hostnames, valid_host):
+    """
+    Convert data structures back into config file and write out changes.
+    """
+    logger.info("%s: activated" % inspect.stack()[0][3])
+
+    if NEW_SERVER in hostnames:
+        hostnames.remove(NEW_SERVER)
+
+    if valid_host not in hostnames:
+        logger.info("%s not in configuration file, adding." % valid_host)
+        hostnames.append(valid_host)
+        config_file.set('login', 'hosts', ",".join(hostnames))
+
+        try:
+            with open(config_path, "wb") as config_write:
+                config_file.write(config_write)
+                logger.info("Wrote configuration file at %s." % config_path)
+        except Exception as exception_message:
+            logger.error("Error writing configuration file [%s]. %s" % (config_path, exception_message))
+
+
+def login(logger, read_privileges, update_privileges=()):
+    """
+    if the user has proper privleges, consider them an authorized user and proceed
+
+    returns a Session, or None if the login window was closed
+    """
+    sessions = []
+
+    def try_login():
+        """
+        jamf api call for login test
+        """
+
+        logger.info("%s: activated" % inspect.stack()[0][3])
+
+        jamf_client = None
+        try:
+            #
+            # the login connections stay warm and are reused by the main window
+            jamf_client = client.shared_client(jamf_hostname.get(), jamf_username.get(), jamf_password.get(), logger)
+
+            #
+            # the user's own account is checked first, then JSS groups and LDAP membership concurrently.
+            # see scl_jamf/privileges.py
+            check = privileges.PrivilegeCheck(jamf_client, logger, jamf_username.get(), read_privileges, update_privileges)
+            access_level = check.access_level()
+
+            #
+            # if all require privileges accounted for, proceed
+            # else alert and fail
+            if access_level:
+                logger.info("login: valid %s login. (%r)" % (access_level, jamf_username.get()))
+                sessions.append(Session(jamf_client, jamf_password.get(), check, access_level))
+                root.destroy()  # clean up after yourself!
+                return
+            else:
+                logger.error("login: User %r lacks appropriate privileges: %r" % (jamf_username.get(), check.missing_privileges))
+                tkMessageBox.showerror("Jamf login", "User lacks appropriate privileges.\n%r" % check.missing_privileges)
+
+        #
+        # handle various communication errors
+        except privileges.CheckError, error:
+            logger.error("%s: Unable to check privileges. %s" % (inspect.stack()[0][3], error))
+            tkMessageBox.showerror("Jamf login", "Unable to check privileges with:\n%s\n%s" %
+                                   (jamf_hostname.get(), client.describe_error(error.errors[0])))
+        except urllib2.HTTPError, error:
+
+            logger.info("Code returned: %s" % error.code)
+
+            if error.code == 401:
+                logger.error("%s: Invalid username or password. (%r)" % (inspect.stack()[0][3], jamf_username.get()))
+                tkMessageBox.showerror("Jamf login", "Invalid username or password.")
+            else:
+                logger.error("%s: Error communicating with JSS. %s" % (inspect.stack()[0][3], jamf_hostname.get()))
+                tkMessageBox.showerror("Jamf login", "HTTP error from:\n%s" % jamf_hostname.get())
+        except urllib2.URLError:
+            logger.error("%s: Error contacting JSS: %s" % (inspect.stack()[0][3], jamf_hostname.get()))
+            tkMessageBox.showerror("Jamf login", "Unable to contact:\n%s" % jamf_hostname.get())
+        except Exception as exception_message:
+            logger.error("%s: Generic error. (%r)" % (inspect.stack()[0][3], exception_message))
+            tkMessageBox.showerror("Jamf login", "Generic error from %s." % jamf_hostname.get())
+
+        #
+        # a failed login doesn't leave its client in the shared pool
+        if jamf_client:
+            client.discard_client(jamf_client)
+        sys.exit()
+
+    # read or create prefs
+    preference_file, preference_path = read_create_prefs(logger)
+    hostnames = injest_prefs(logger, preference_file).split(',')
+
+    if 'new_server' not in hostnames[0]:
+        hostnames.append(NEW_SERVER)
+
+    root = Tk()
+    jamf_username = StringVar()
+    jamf_password = StringVar()
+    jamf_hostname = StringVar()
+
+    #
+    # build and display login screen
+    root.title("Jamf Login")
+    mainframe = ttk.Frame(root)
+    mainframe.grid(column=0, row=0, sticky=NSEW)
+    root.columnconfigure(0, weight=1)
+    root.rowconfigure(0, weight=1)
+    root.geometry('+0+0')
+
+    ttk.Label(mainframe, text="Jamf Server:").grid(column=1, row=10, sticky=E)
+    hostname_combobox = ttk.Combobox(mainframe, width=30, textvariable=jamf_hostname)
+    hostname_combobox['values'] = hostnames
+    hostname_combobox.current(0)
+    hostname_combobox.grid(column=2, row=10, sticky=EW)
+
+    ttk.Label(mainframe, text="Username:").grid(column=1, row=20, sticky=E)
+    uname_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_username)
+    uname_entry.grid(column=2, row=20, sticky=EW)
+
+    ttk.Label(mainframe, text="Password:").grid(column=1, row=30, sticky=E)
+    pword_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_password, show="*")
+    pword_entry.grid(column=2, row=30, sticky=EW)
+
+    if platform.system() == 'Darwin':
+        ttk.Button(mainframe, text="Quit", command=sys.exit).grid(column=2, row=70, padx=3)
+    else:
+        ttk.Button(mainframe, text="Quit", command=sys.exit).grid(column=2, row=70, padx=3, sticky=W)
+
+    ttk.Button(mainframe, text="Login", default='active', command=try_login).grid(column=2, row=70, padx=3, sticky=E)
+
+    if platform.system() == 'Darwin':
+        tmpl = 'tell application "System Events" to set frontmost of every process whose unix id is {} to true'
+        script = tmpl.format(os.getpid())
+        output = subprocess.check_call(['/usr/bin/osascript', '-e', script])
+
+    root.bind('<Return>', lambda event: try_login())
+
+    uname_entry.focus()
+    root.mainloop()
+
+    if not sessions:
+        return None
+
+    if preference_path:
+        modify_prefs(logger, preference_file, preference_path, hostnames, sessions[0].jamf_hostname)
+    else:
+        logger.error("No path to preferences, no save attempt.")
+
+    return sessions[0]
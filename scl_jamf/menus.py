@@ -0,0 +1,120 @@
+"""
+Jamf reference lists (departments, buildings, extension attribute choices) kept between runs.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# menus.py #####################################################################
+#
+# Departments, buildings and extension attribute popup choices rarely
+# change, but Tugboat used to fetch them before its window could open.
+# MenuCache keeps each list in a DiskCache (menus.json) keyed by host and
+# api call:
+#
+#   get()       the saved list, however old, None if there is none
+#   stale()     True once a list was last checked more than max_age
+#               seconds ago
+#   fetch()     GET the list again, sending If-None-Match/If-Modified-Since
+#               when Jamf gave an ETag or Last-Modified header last time.
+#               A 304 only marks the saved list as checked.
+#
+# Saved lists are dropped after 30 days without a check.
+#
+################################################################################
+
+from __future__ import print_function
+import time
+import urllib2
+
+from scl_jamf import cache
+from scl_jamf import storage
+
+
+def names(response_json, key):
+    """
+    names of the items in a list endpoint, e.g. departments
+    """
+    return [item.get('name') for item in response_json[key]]
+
+
+def popup_choices(response_json):
+    """
+    popup choices of a computerextensionattributes/id/<id> record
+    """
+    return response_json['computer_extension_attribute']['input_type']['popup_choices']
+
+
+class MenuCache(object):
+    """
+    reference lists of one Jamf host
+    """
+    def __init__(self, jamf_client, logger, max_age=3600, path=None):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.max_age = max_age
+
+        if path is None:
+            path = storage.cache_path('menus.json')
+        self.store = cache.DiskCache(path, 30 * 86400, logger)
+
+    def key(self, api_call):
+        return self.jamf_client.jamf_hostname + '|' + api_call
+
+    def get(self, api_call):
+        entry = self.store.get(self.key(api_call))
+        if entry is None:
+            return None
+        return entry['items']
+
+    def stale(self, api_call):
+        entry = self.store.get(self.key(api_call))
+        return entry is None or time.time() - entry['checked'] > self.max_age
+
+    def fetch(self, api_call, parse):
+        """
+        revalidate a list, parse(response_json) extracts the items
+
+        returns (items, True if they changed)
+        """
+        entry = self.store.get(self.key(api_call))
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = self.jamf_client.request('GET', api_call, headers=headers)
+        except urllib2.HTTPError as error:
+            if error.code == 304 and entry:
+                entry['checked'] = time.time()
+                self.store.set(self.key(api_call), entry)
+                self.logger.info("fetch: %s not modified" % api_call)
+                return entry['items'], False
+            raise
+
+        items = parse(response.json())
+        changed = entry is None or entry['items'] != items
+        self.store.set(self.key(api_call), {
+            'items': items,
+            'checked': time.time(),
+            'etag': response.headers.getheader('ETag'),
+            'last_modified': response.headers.getheader('Last-Modified'),
+        })
+        self.logger.info("fetch: %s %s" % (api_call, "changed" if changed else "unchanged"))
+        return items, changed
+
+    def save(self):
+        self.store.save()
@@ -0,0 +1,264 @@
+"""
+Load the policy scope index and profile names from Jamf.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# policies.py ##################################################################
+#
+# Shared by the Cargo Ship window and its batch mode.
+#
+#   communicate with Jamf and grab generic policy list
+#
+#               --- this is the slow bit ---
+#   communicate with Jamf and grab each individual policy record
+#    with each record
+#     retain name, id and if the policy applies to all computers
+#     retain IDs of specific computers the policy applies to
+#     retain ID's and names of computer groups the policy applies to
+#    add these values to an index keyed by group name and computer id
+#
+# Only policies that are new, renamed or stale in the local PolicyCache are
+# fetched, on a Fetcher thread pool. Each load() builds a new ScopeIndex, so
+# a reload can replace the index in use in a single assignment.
+#
+# Profile names come from the generic profile list. A computer can report a
+# profile created after the list was read, ProfileResolver.resolve() fetches
+# osxconfigurationprofiles/id/<id>/subset/general for ids it doesn't know and
+# keeps the names. Ids Jamf can't return are remembered as missing until the
+# next load, so they aren't requested every time a computer is displayed.
+#
+# With index_scope, load_profiles() also fetches the scope of every profile
+# into a ScopeIndex, so the profiles that should be on a computer can be
+# computed the same way as its policies.
+#
+################################################################################
+
+from __future__ import print_function
+import threading
+import time
+
+from scl_jamf import fetcher
+from scl_jamf import policy_cache
+from scl_jamf import scope_index
+
+
+class PolicyLoader(object):
+    """
+    fetch policy records and build a ScopeIndex of them
+    """
+    def __init__(self, jamf_client, logger, workers=6, requests_per_second=20, timeout=30, retries=3, use_cache=True, cache_max_age=3600):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.retries = retries
+        self.use_cache = use_cache
+        self.cache_max_age = cache_max_age
+        self.local_cache = None
+
+        #
+        # stale policies the last load() kept from the cache, see PolicyCache.plan()
+        self.stale_remaining = 0
+
+    def fetch_policy(self, jamf_client, policy_id):
+        """
+        pull the general and scope subsets of a single policy from jss
+        """
+        #
+        # runs on fetcher worker threads. errors are raised to the fetcher,
+        # which retries transient ones and reports the policy as failed otherwise.
+        self.logger.info("fetch_policy: fetching policy #%s" % policy_id)
+        response = jamf_client.get('policies/id/' + str(policy_id) + '/subset/general&scope', timeout=self.timeout)
+
+        #
+        # return the whole response, postpone processing until all data retrieved
+        return response.json()
+
+    def fetch(self, policy_ids, progress=None):
+        """
+        fetch policies on worker threads and save them in the local cache
+
+        returns (policy records, ids that failed)
+        """
+        if not policy_ids:
+            return [], []
+
+        policy_fetcher = fetcher.Fetcher(self.jamf_client, self.logger, self.workers, self.requests_per_second, self.retries)
+        fetched_policies = [item for item in policy_fetcher.map(self.fetch_policy, policy_ids, progress) if item]
+
+        if self.local_cache:
+            try:
+                self.local_cache.store(fetched_policies)
+            except Exception as exception_message:
+                self.logger.error("fetch: Error updating policy cache. [%s]" % exception_message)
+
+        return fetched_policies, sorted(policy_fetcher.failed)
+
+    def load(self, progress=None, max_age=None, stale_limit=None):
+        """
+        build the policy index
+
+        returns (ScopeIndex, ids that failed), progress(done, total) follows the fetch
+        cached policies older than max_age seconds are refetched, up to stale_limit of them, see PolicyCache.plan()
+        """
+        self.logger.info("load: activated")
+        policy_list = list(self.jamf_client.stream_list('policies', 'policies'))
+        self.logger.info("load: %i policies" % len(policy_list))
+
+        fetch_ids = [item['id'] for item in policy_list]
+        cached_policies = []
+        self.stale_remaining = 0
+        if self.use_cache:
+            try:
+                self.local_cache = policy_cache.PolicyCache(self.jamf_client.jamf_hostname, self.logger, max_age=self.cache_max_age)
+                fetch_ids, cached_policies = self.local_cache.plan(policy_list, max_age, stale_limit)
+                self.stale_remaining = self.local_cache.stale_remaining
+            except Exception as exception_message:
+                self.logger.error("load: Policy cache unavailable, fetching all policies. [%s]" % exception_message)
+                self.local_cache = None
+
+        start_time = time.time()
+        if progress:
+            progress(0, len(fetch_ids))
+        fetched_policies, failed_policies = self.fetch(fetch_ids, progress)
+
+        elapsed_time = time.time() - start_time
+        self.logger.info("load: Elapsed time spent fetching and parsing %i policies: %r" % (len(fetch_ids), elapsed_time))
+
+        #
+        # index each policy by the groups and computers it is scoped to
+        policy_index = scope_index.ScopeIndex()
+        for item in cached_policies + fetched_policies:
+            add_policy(policy_index, item)
+
+        self.logger.info("load: complete")
+        return policy_index, failed_policies
+
+
+def add_policy(policy_index, record):
+    """
+    index a record returned by policies/id/<id>/subset/general&scope
+    """
+    policy_index.add_record(record['policy']['general']['id'], record['policy']['general']['name'], record['policy']['scope'])
+
+
+class ProfileResolver(object):
+    """
+    profile id -> name, ids missing from the profile list are fetched when first seen
+
+    scope is a ScopeIndex of profile scope, or None if it wasn't loaded
+    """
+    def __init__(self, jamf_client, logger, names=None, scope=None, workers=4, requests_per_second=20, timeout=30):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.names = dict(names or {})
+        self.scope = scope
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+
+        #
+        # ids being fetched and ids Jamf couldn't return, guarded by lock
+        self.pending = set()
+        self.missing = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, profile_id):
+        return self.names.get(profile_id)
+
+    def unknown(self, profile_ids):
+        """
+        ids that resolve() would fetch
+        """
+        with self.lock:
+            return [item for item in profile_ids if self._is_unknown(item)]
+
+    def _is_unknown(self, profile_id):
+        return profile_id not in self.names and profile_id not in self.pending and profile_id not in self.missing
+
+    def fetch_profile(self, jamf_client, profile_id):
+        """
+        pull the general subset of a single profile from jss
+        """
+        self.logger.info("fetch_profile: fetching profile #%s" % profile_id)
+        response = jamf_client.get('osxconfigurationprofiles/id/' + str(profile_id) + '/subset/general', timeout=self.timeout)
+        return response.json()['os_x_configuration_profile']['general']
+
+    def resolve(self, profile_ids):
+        """
+        fetch the names of unknown profiles, blocks so it belongs off the main thread
+
+        returns the number of names added
+        """
+        with self.lock:
+            profile_ids = [item for item in set(profile_ids) if self._is_unknown(item)]
+            self.pending.update(profile_ids)
+        if not profile_ids:
+            return 0
+
+        try:
+            profile_fetcher = fetcher.Fetcher(self.jamf_client, self.logger, self.workers, self.requests_per_second)
+            results = profile_fetcher.map(self.fetch_profile, profile_ids)
+        finally:
+            with self.lock:
+                self.pending.difference_update(profile_ids)
+
+        with self.lock:
+            added = 0
+            for general in results:
+                if general:
+                    self.names[general['id']] = general['name']
+                    added += 1
+            self.missing.update(profile_fetcher.failed)
+
+        self.logger.info("resolve: %i of %i unknown profiles resolved" % (added, len(profile_ids)))
+        return added
+
+
+def load_profiles(jamf_client, logger, index_scope=False, workers=4, requests_per_second=20, timeout=30):
+    """
+    ProfileResolver of the profile list, with a ScopeIndex of profile scope if index_scope
+    """
+    #
+    # the generic profile list carries everything needed, this should proceed quickly.
+    profiles = {}
+    for item in jamf_client.stream_list('osxconfigurationprofiles', 'os_x_configuration_profiles'):
+        profiles[item["id"]] = item["name"]
+
+    logger.info("load_profiles: %i profiles" % len(profiles))
+
+    profile_scope = None
+    if index_scope:
+        def fetch_scope(jamf_client, profile_id):
+            response = jamf_client.get('osxconfigurationprofiles/id/' + str(profile_id) + '/subset/general&scope', timeout=timeout)
+            return response.json()['os_x_configuration_profile']
+
+        #
+        # a profile whose scope fails to load is still named, it just isn't computed as applicable
+        profile_scope = scope_index.ScopeIndex()
+        scope_fetcher = fetcher.Fetcher(jamf_client, logger, workers, requests_per_second)
+        for record in scope_fetcher.map(fetch_scope, sorted(profiles)):
+            if record:
+                profile_scope.add_record(record['general']['id'], record['general']['name'], record['scope'])
+
+        if scope_fetcher.failed:
+            logger.error("load_profiles: scope of %i profiles failed to load: %r" % (len(scope_fetcher.failed), scope_fetcher.failed))
+        logger.info("load_profiles: scope of %i profiles indexed" % len(profile_scope))
+
+    return ProfileResolver(jamf_client, logger, profiles, profile_scope, workers, requests_per_second, timeout)
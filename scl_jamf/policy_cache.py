@@ -0,0 +1,163 @@
+"""
+Persistent cache of Jamf policy general/scope records, keyed by policy id.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# policy_cache.py ##############################################################
+#
+# Cargo Ship needs the general and scope subsets of every policy. Fetching
+# them one at a time is the slow part of startup, so the records are kept in
+# a SQLite database between runs.
+#
+# The /JSSResource/policies list endpoint only reports id and name. On each
+# launch the list is compared with the cache:
+#   new ids             are fetched
+#   missing ids         are deleted from the cache
+#   renamed policies    are refetched
+#   entries older than max_age seconds are refetched, this is what catches
+#     scope edits, since the list endpoint carries no modification date.
+#     with stale_limit only that many are, oldest first, the others are
+#     returned from the cache and left for a later plan().
+#
+# store() backdates each entry by a random part of half of max_age, so
+# policies fetched together, on a first launch or by a full refresh, don't
+# all expire together.
+#
+################################################################################
+
+from __future__ import print_function
+import contextlib
+import json
+import random
+import sqlite3
+import time
+
+from scl_jamf import storage
+
+
+class PolicyCache(object):
+    """
+    SQLite backed store of raw policy JSON for one Jamf host
+    """
+    def __init__(self, jamf_hostname, logger, path=None, max_age=3600):
+        self.jamf_hostname = jamf_hostname.rstrip('/')
+        self.logger = logger
+        self.max_age = max_age
+
+        #
+        # stale entries the last plan() returned from the cache instead of refetching
+        self.stale_remaining = 0
+
+        if path is None:
+            path = storage.cache_path('policies.sqlite')
+        self.path = path
+
+        #
+        # connections are opened per call so the cache can be used from any thread
+        with self._connect() as database:
+            database.execute("""CREATE TABLE IF NOT EXISTS policies (
+                                    host TEXT NOT NULL,
+                                    id INTEGER NOT NULL,
+                                    name TEXT,
+                                    fetched REAL NOT NULL,
+                                    record TEXT NOT NULL,
+                                    PRIMARY KEY (host, id))""")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        open, commit and close a connection to the cache
+        """
+        database = sqlite3.connect(self.path, timeout=30)
+        try:
+            with database:
+                yield database
+        finally:
+            database.close()
+
+    def plan(self, policy_list, max_age=None, stale_limit=None):
+        """
+        compare the policy list endpoint with the cache
+
+        removes deleted policies and returns (ids to fetch, cached records)
+        max_age overrides the cache's own for this comparison, 0 refetches everything
+        stale_limit caps the entries refetched for age, None refetches all of them
+        """
+        if max_age is None:
+            max_age = self.max_age
+
+        listed = {}
+        for item in policy_list:
+            listed[int(item['id'])] = item['name']
+
+        now = time.time()
+        to_fetch = []
+        cached = []
+        stale = []
+        seen = set()
+
+        with self._connect() as database:
+            rows = database.execute("SELECT id, name, fetched, record FROM policies WHERE host = ?",
+                                    (self.jamf_hostname,)).fetchall()
+
+            deleted = []
+            for policy_id, name, fetched, record in rows:
+                if policy_id not in listed:
+                    deleted.append((self.jamf_hostname, policy_id))
+                elif listed[policy_id] != name:
+                    to_fetch.append(policy_id)
+                    seen.add(policy_id)
+                elif now - fetched > max_age:
+                    stale.append((fetched, policy_id, record))
+                    seen.add(policy_id)
+                else:
+                    cached.append(json.loads(record))
+                    seen.add(policy_id)
+
+            if deleted:
+                database.executemany("DELETE FROM policies WHERE host = ? AND id = ?", deleted)
+
+        for policy_id in listed:
+            if policy_id not in seen:
+                to_fetch.append(policy_id)
+
+        stale.sort()
+        if stale_limit is None:
+            stale_limit = len(stale)
+        to_fetch.extend(policy_id for fetched, policy_id, record in stale[:stale_limit])
+        cached.extend(json.loads(record) for fetched, policy_id, record in stale[stale_limit:])
+        self.stale_remaining = len(stale[stale_limit:])
+
+        self.logger.info("plan: %i cached, %i to fetch, %i deleted, %i stale left cached" %
+                         (len(cached), len(to_fetch), len(deleted), self.stale_remaining))
+        return sorted(to_fetch), cached
+
+    def store(self, records):
+        """
+        save fetched policy records (the JSON returned by policies/id/<id>/subset/general&scope)
+        """
+        now = time.time()
+        rows = []
+        for record in records:
+            general = record['policy']['general']
+            fetched = now - random.uniform(0, self.max_age / 2.0)
+            rows.append((self.jamf_hostname, int(general['id']), general['name'], fetched, json.dumps(record)))
+
+        with self._connect() as database:
+            database.executemany("INSERT OR REPLACE INTO policies (host, id, name, fetched, record) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def clear(self):
+        with self._connect() as database:
+            database.execute("DELETE FROM policies WHERE host = ?", (self.jamf_hostname,))
@@ -0,0 +1,280 @@
+"""
+Decide what a Jamf user may do, from their account and LDAP group privileges.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# privileges.py ################################################################
+#
+# Login used to read the privileges of every JSS group, then ask every LDAP
+# server about every valid group, one request at a time, before looking at
+# the user's own account. Now:
+#
+#   1. the accounts list is fetched, it also verifies the password.
+#   2. the user's JSS account is checked, if there is one. if it grants full
+#      access nothing else is requested.
+#   3. the privileges of every JSS group are fetched concurrently.
+#   4. LDAP membership of groups granting full access is checked
+#      concurrently, stopping at the first match.
+#   5. only if needed, the same for groups granting read access.
+#
+# Account and group privileges, LDAP servers and memberships are kept in a
+# DiskCache shared by Tugboat and Cargo Ship. Entries are keyed by a hash of
+# the accounts list, so adding, removing or renaming a JSS account or group
+# invalidates them, and expire after cache_max_age seconds. A repeat login
+# by the same user is usually answered by the accounts request alone.
+# Only memberships found are kept, a user just added to an LDAP group is
+# checked again instead of being refused until the entry expires.
+#
+# The result is 'full', 'read-only' or None. Without update_privileges
+# (Cargo Ship) read_privileges alone grant 'full'. If no access was found
+# but a request failed, CheckError is raised instead of None, a timeout
+# isn't a denial.
+#
+################################################################################
+
+from __future__ import print_function
+import hashlib
+import urllib
+import urllib2
+
+from scl_jamf import cache
+from scl_jamf import fetcher
+from scl_jamf import storage
+
+_unknown = object()
+
+
+class CheckError(Exception):
+    """
+    no access was found, but requests that might have granted it failed
+    """
+    def __init__(self, errors):
+        Exception.__init__(self, "%i privilege requests failed. [%s]" % (len(errors), errors[0]))
+        self.errors = errors
+
+
+def _quote(value):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return urllib.quote(value)
+
+
+def missing(privileges, required):
+    """
+    required privileges not in privileges
+    """
+    return [item for item in required if item not in privileges]
+
+
+class PrivilegeCheck(object):
+    """
+    access level of one user
+    """
+    def __init__(self, jamf_client, logger, username, read_privileges, update_privileges=(), workers=8, cache_max_age=14400):
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.username = username
+        self.read_privileges = list(read_privileges)
+        self.update_privileges = list(update_privileges)
+        self.workers = workers
+        self.cache_max_age = cache_max_age
+        self.missing_privileges = self.read_privileges + self.update_privileges
+        self.local_cache = None
+        self.cache_prefix = ''
+
+        #
+        # requests that failed during the check
+        self.errors = []
+
+    def level(self, privileges):
+        """
+        'full', 'read-only' or None for a list of JSS privileges
+        """
+        if missing(privileges, self.read_privileges):
+            return None
+        if missing(privileges, self.update_privileges):
+            return 'read-only'
+        return 'full'
+
+    def user_privileges(self):
+        """
+        JSS privileges of the user's own account, None if there is no JSS account, _unknown if it couldn't be read
+        """
+        try:
+            response_json = self.jamf_client.get_json('accounts/username/' + _quote(self.username))
+        except urllib2.HTTPError as error:
+            if error.code == 404:
+                self.logger.warn("user_privileges: JSS account not found. [%s]" % self.username)
+                return None
+            self.logger.warn("user_privileges: Error checking user account info. (%r)" % error)
+            self.errors.append(error)
+            return _unknown
+        except Exception as exception_message:
+            self.logger.warn("user_privileges: Error checking user account info. (%r)" % exception_message)
+            self.errors.append(exception_message)
+            return _unknown
+        return response_json['account']['privileges']['jss_objects']
+
+    def group_privileges(self, jamf_client, group_id):
+        response_json = jamf_client.get_json('accounts/groupid/' + str(group_id))
+        return response_json['group']['privileges']['jss_objects']
+
+    def is_member(self, jamf_client, server_group):
+        server, group_name = server_group
+        response_json = jamf_client.get_json('ldapservers/id/' + str(server['id']) + '/group/' + _quote(group_name) + '/user/' + _quote(self.username))
+        return bool(response_json['ldap_users'])
+
+    def open_cache(self, accounts_body):
+        """
+        DiskCache of earlier logins, keys are prefixed with the host and a hash of the accounts list
+        """
+        self.cache_prefix = "%s|%s|" % (self.jamf_client.jamf_hostname, hashlib.sha1(accounts_body).hexdigest())
+        if not self.cache_max_age:
+            return None
+        try:
+            return cache.DiskCache(storage.cache_path('privileges.json'), self.cache_max_age, self.logger)
+        except Exception as exception_message:
+            self.logger.error("open_cache: Privilege cache unavailable. [%s]" % exception_message)
+            return None
+
+    def cached(self, key):
+        if not self.local_cache:
+            return _unknown
+        return self.local_cache.get(self.cache_prefix + key, _unknown)
+
+    def remember(self, key, value):
+        if self.local_cache:
+            self.local_cache.set(self.cache_prefix + key, value)
+
+    def access_level(self):
+        """
+        'full', 'read-only' or None, self.missing_privileges holds what the user's account lacks
+
+        raises CheckError instead of returning None if a request that might have granted access failed
+        """
+        self.errors = []
+        response = self.jamf_client.get('accounts')
+        accounts = response.json()['accounts']
+        self.local_cache = self.open_cache(response.body)
+        try:
+            access = self.check_access(accounts)
+        finally:
+            if self.local_cache:
+                self.local_cache.save()
+
+        if access is None and self.errors:
+            self.logger.error("access_level: no access found for %s, %i requests failed" % (self.username, len(self.errors)))
+            raise CheckError(self.errors)
+        if self.errors:
+            self.logger.warn("access_level: %i requests failed, %s access may be incomplete" % (len(self.errors), access))
+        return access
+
+    def check_access(self, accounts):
+        #
+        # the accounts list shows if the user has a JSS account at all, skip the lookup if not
+        user_level = None
+        account_names = set(item['name'].lower() for item in accounts.get('users', []))
+        if self.username.lower() in account_names:
+            user_key = 'user|' + self.username.lower()
+            account_privileges = self.cached(user_key)
+            if account_privileges is _unknown:
+                account_privileges = self.user_privileges()
+                if account_privileges is _unknown:
+                    #
+                    # the account couldn't be read, rely on group privileges like a user without one
+                    account_privileges = None
+                else:
+                    self.remember(user_key, account_privileges)
+
+            if account_privileges is not None:
+                self.missing_privileges = missing(account_privileges, self.read_privileges + self.update_privileges)
+                user_level = self.level(account_privileges)
+                if user_level == 'full':
+                    self.logger.info("access_level: valid full user login. (%r)" % self.username)
+                    return user_level
+                if self.missing_privileges:
+                    self.logger.warn("access_level: %s is missing privileges for full access: %r" % (self.username, self.missing_privileges))
+        else:
+            self.logger.warn("access_level: JSS account not found. [%s]" % self.username)
+
+        group_names = dict((item['id'], item['name']) for item in accounts.get('groups', []))
+        ldap_servers = self.cached('ldapservers')
+        if ldap_servers is _unknown:
+            ldap_servers = self.jamf_client.get_json('ldapservers')['ldap_servers']
+            self.remember('ldapservers', ldap_servers)
+        self.logger.info("access_level: %i JSS groups, LDAP servers: %r" % (len(group_names), ldap_servers))
+
+        #
+        # find groups on jss that have the required privileges, fetching only those not cached
+        check_fetcher = fetcher.Fetcher(self.jamf_client, self.logger, self.workers, 0)
+        privileges_by_group = {}
+        fetch_ids = []
+        for group_id in group_names:
+            group_privileges = self.cached('group|%s' % group_id)
+            if group_privileges is _unknown:
+                fetch_ids.append(group_id)
+            else:
+                privileges_by_group[group_id] = group_privileges
+
+        for group_id, group_privileges, error in check_fetcher.imap(self.group_privileges, fetch_ids):
+            if error:
+                self.errors.append(error)
+                continue
+            privileges_by_group[group_id] = group_privileges
+            self.remember('group|%s' % group_id, group_privileges)
+
+        full_groups = []
+        read_groups = []
+        for group_id, group_privileges in privileges_by_group.items():
+            group_level = self.level(group_privileges)
+            if group_level == 'full':
+                full_groups.append(group_names[group_id])
+            elif group_level == 'read-only':
+                read_groups.append(group_names[group_id])
+            else:
+                self.logger.info("access_level: Group %r lacks appropriate privileges: %r" %
+                                 (group_names[group_id], missing(group_privileges, self.read_privileges + self.update_privileges)))
+
+        #
+        # LDAP groups can only improve on the user's own account
+        candidates = [('full', full_groups)]
+        if user_level is None:
+            candidates.append(('read-only', read_groups))
+
+        for group_level, groups in candidates:
+            pairs = []
+            for server in ldap_servers:
+                for group_name in groups:
+                    member = self.cached(self.member_key(server, group_name))
+                    if member is True:
+                        self.logger.info("access_level: %s is a member of %s group %s on server %s (cached)" % (self.username, group_level, group_name, server['name']))
+                        return group_level
+                    pairs.append((server, group_name))
+
+            for (server, group_name), member, error in check_fetcher.imap(self.is_member, pairs):
+                if error:
+                    self.errors.append(error)
+                    continue
+                if member:
+                    self.remember(self.member_key(server, group_name), member)
+                    self.logger.info("access_level: %s is a member of %s group %s on server %s" % (self.username, group_level, group_name, server['name']))
+                    return group_level
+
+        if user_level:
+            self.logger.info("access_level: valid %s user login. (%r)" % (user_level, self.username))
+        return user_level
+
+    def member_key(self, server, group_name):
+        return u"member|%s|%s|%s" % (server['id'], group_name, self.username.lower())
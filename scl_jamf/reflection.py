@@ -0,0 +1,105 @@
+"""
+What Jamf thinks should be on a computer, as plain data.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# reflection.py ################################################################
+#
+# The same information the Cargo Ship window displays for a computer, built
+# from a computers/id/<id> record, the policy ScopeIndex and the profile
+# ProfileResolver. Used by Cargo Ship's batch mode to audit many computers at
+# once.
+#
+# CSV output holds one row per computer, lists are joined with "; ".
+# Extension attributes and packages vary from computer to computer and are
+# only included in the JSON output.
+#
+################################################################################
+
+from __future__ import print_function
+
+#
+# computer record sections read by summarize() and the Cargo Ship window
+SECTIONS = ['General', 'Location', 'Hardware', 'Software', 'ExtensionAttributes', 'GroupsAccounts', 'ConfigurationProfiles']
+
+CSV_FIELDS = ['id', 'name', 'serial_number', 'real_name', 'last_contact_time', 'report_date',
+              'groups', 'profiles', 'policies', 'printers']
+
+
+def summarize(response_json, policy_index, profiles):
+    """
+    dictionary of a computer's details, groups, profiles, packages and applicable policies
+
+    profiles is a policies.ProfileResolver, unknown profiles are fetched so this blocks
+    """
+    computer = response_json['computer']
+    general = computer['general']
+    groups = computer['groups_accounts']['computer_group_memberships']
+
+    #
+    # configuration_profiles section only includes ID's, names come from the profile resolver.
+    # profiles installed outside of Jamf have an ID of -1.
+    profile_ids = [item['id'] for item in computer['configuration_profiles'] if item['id'] > 0]
+    profiles.resolve(profile_ids)
+    profile_names = []
+    for item in profile_ids:
+        if profiles.get(item) is not None:
+            profile_names.append(profiles.get(item))
+
+    #
+    # with profile scope loaded, profiles that should be installed but aren't reported
+    missing_profiles = []
+    if profiles.scope is not None:
+        for item in profiles.scope.applicable_ids(general['id'], groups):
+            if item not in profile_ids:
+                missing_profiles.append(profiles.scope.names[item])
+
+    extension_attributes = {}
+    for item in computer['extension_attributes']:
+        extension_attributes[item['name']] = item['value']
+
+    return {
+        'id': general['id'],
+        'name': general['name'],
+        'serial_number': general.get('serial_number'),
+        'real_name': computer['location']['real_name'],
+        'last_contact_time': general['last_contact_time'],
+        'report_date': general['report_date'],
+        'groups': sorted(groups, key=lambda item: item.lower()),
+        'printers': [item['name'] for item in computer['hardware']['mapped_printers']],
+        'profiles': sorted(profile_names, key=lambda item: item.lower()),
+        'profiles_not_installed': sorted(missing_profiles, key=lambda item: item.lower()),
+        'policies': sorted(policy_index.applicable(general['id'], groups), key=lambda item: item.lower()),
+        'extension_attributes': extension_attributes,
+        'packages': {
+            'installer': sorted(computer['software']['installed_by_installer_swu']),
+            'casper': sorted(computer['software']['installed_by_casper']),
+        },
+    }
+
+
+def csv_row(summary):
+    """
+    summary as a list of utf-8 strings in CSV_FIELDS order
+    """
+    row = []
+    for field in CSV_FIELDS:
+        value = summary[field]
+        if isinstance(value, list):
+            value = "; ".join(value)
+        elif value is None:
+            value = ""
+        row.append(unicode(value).encode('utf-8'))
+    return row
@@ -0,0 +1,202 @@
+"""
+Search results window shared by Tugboat and Cargo Ship.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# results_window.py ############################################################
+#
+# A Listbox holding every match of a wide search (15k for "mac") is slow to
+# fill and to scroll. ResultsWindow keeps the (label, jamf id) rows in a
+# list and the Listbox only ever holds the rows that fit in the window. The
+# scrollbar and mouse wheel move a window over the list and the visible rows
+# are redrawn.
+#
+# One window is reused by every search until the user closes it. show()
+# replaces the rows, append() adds rows as a search streams in.
+#
+################################################################################
+
+from __future__ import print_function
+import platform
+import tkFont
+import ttk
+from Tkinter import *
+
+from scl_jamf import search
+
+
+class ResultsWindow(object):
+    """
+    virtual list of search results, on_select(label, jamf_id) is called when a row is clicked
+    """
+    def __init__(self, root, on_select, title="Search results", height=400):
+        self.root = root
+        self.on_select = on_select
+        self.title = title
+        self.height = height
+
+        self.window = None
+        self.listbox = None
+        self.scrollbar = None
+        self.font = None
+
+        self.rows = []
+        self.first = 0
+        self.visible = 1
+        self.selected = None
+        self.width = 0
+        self.rendering = False
+
+    def is_open(self):
+        return self.window is not None and self.window.winfo_exists()
+
+    def open(self):
+        """
+        build the window, positioned next to the main window even if it has moved
+        """
+        if self.is_open():
+            return
+
+        self.window = Toplevel(self.root)
+        self.window.title(self.title)
+        self.font = tkFont.Font(font='TkDefaultFont')
+        self.width = 0
+
+        split_geom = self.root.winfo_geometry().split("+")
+        r_h = int(split_geom[0].split("x")[0])
+        r_pos_x = int(split_geom[1])
+        r_pos_y = int(split_geom[2])
+        self.window.geometry("%ix%i+%i+%i" % (200, self.height, (r_h + r_pos_x + 10), r_pos_y))
+
+        list_frame = ttk.Frame(self.window, padding=(4, 0, 0, 0))
+        list_frame.pack(fill=BOTH, expand=True)
+
+        self.scrollbar = Scrollbar(list_frame, command=self.yview)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+
+        self.listbox = Listbox(list_frame, bd=0, selectmode=SINGLE, exportselection=False, font=self.font)
+        self.listbox.pack(side=LEFT, fill=BOTH, expand=True)
+
+        self.listbox.bind("<<ListboxSelect>>", self.clicked)
+        self.listbox.bind("<Configure>", self.resized)
+        self.listbox.bind("<MouseWheel>", self.wheel)
+        self.listbox.bind("<Button-4>", self.wheel)
+        self.listbox.bind("<Button-5>", self.wheel)
+
+    def show(self, rows):
+        """
+        replace the rows, opening the window if needed
+        """
+        self.open()
+        self.rows = list(rows)
+        self.first = 0
+        self.selected = None
+        self.fit(self.rows)
+        self.render()
+
+    def append(self, rows):
+        """
+        add rows to the end of the list
+        """
+        self.open()
+        self.rows.extend(rows)
+        self.fit(rows)
+        self.render()
+
+    def fit(self, rows):
+        """
+        widen the window for the widest label so far
+        """
+        width = int(search.widest([label for label, jamf_id in rows], self.font) + 40)
+        if width > self.width:
+            self.width = width
+            self.window.geometry("%ix%i" % (width, max(self.window.winfo_height(), self.height)))
+
+    def row_height(self):
+        return self.font.metrics("linespace") + 1 + 2 * int(self.listbox.cget('selectborderwidth'))
+
+    def resized(self, event):
+        border = int(self.listbox.cget('highlightthickness')) + int(self.listbox.cget('borderwidth'))
+        self.visible = max(1, (event.height - 2 * border) // self.row_height())
+        self.render()
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.rows) - self.visible))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def yview(self, *args):
+        """
+        scrollbar command
+        """
+        if args[0] == 'moveto':
+            self.scroll_to(int(round(float(args[1]) * len(self.rows))))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible
+            self.scroll_to(self.first + step)
+
+    def wheel(self, event):
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        elif platform.system() == 'Darwin':
+            step = -event.delta
+        else:
+            step = -event.delta // 40
+        self.scroll_to(self.first + step)
+        return 'break'
+
+    def render(self):
+        """
+        fill the listbox with the rows currently in view
+        """
+        if not self.is_open():
+            return
+
+        self.rendering = True
+        try:
+            self.listbox.delete(0, END)
+            shown = self.rows[self.first:self.first + self.visible]
+            if shown:
+                self.listbox.insert(END, *[label for label, jamf_id in shown])
+            if self.selected is not None and self.first <= self.selected < self.first + len(shown):
+                self.listbox.selection_set(self.selected - self.first)
+        finally:
+            self.rendering = False
+
+        if self.rows:
+            self.scrollbar.set(float(self.first) / len(self.rows), float(self.first + len(shown)) / len(self.rows))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def clicked(self, *event):
+        """
+        handle clicks
+        """
+        if self.rendering or not self.listbox.curselection():
+            return
+
+        #
+        # redrawing with a row selected can report the same selection again
+        selected = self.first + int(self.listbox.curselection()[0])
+        if selected == self.selected:
+            return
+        self.selected = selected
+        label, jamf_id = self.rows[selected]
+        self.on_select(label, jamf_id)
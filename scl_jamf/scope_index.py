@@ -0,0 +1,84 @@
+"""
+Inverted index of Jamf scope: which items apply to a computer.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# scope_index.py ###############################################################
+#
+# Rather than walking every policy for every group a computer belongs to,
+# scope is indexed once when it is loaded:
+#
+#   all_computers       set of ids scoped to all computers
+#   by_group            computer group name -> set of ids
+#   by_computer         computer jamf id -> set of ids
+#
+# Finding what applies to a computer is then a union of a few sets.
+#
+################################################################################
+
+from __future__ import print_function
+
+
+class ScopeIndex(object):
+    """
+    group name / computer id -> scoped item ids
+    """
+    def __init__(self):
+        self.names = {}
+        self.all_computers = set()
+        self.by_group = {}
+        self.by_computer = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, item_id, name, all_computers, computer_ids, group_names):
+        """
+        index a single scoped item (policy, profile)
+        """
+        self.names[item_id] = name
+
+        if all_computers:
+            self.all_computers.add(item_id)
+
+        for computer_id in computer_ids:
+            self.by_computer.setdefault(computer_id, set()).add(item_id)
+
+        for group_name in group_names:
+            self.by_group.setdefault(group_name, set()).add(item_id)
+
+    def add_record(self, item_id, name, scope):
+        """
+        index a scope dictionary as returned by the Jamf API
+        """
+        computer_ids = [computer['id'] for computer in scope.get('computers', [])]
+        group_names = [group['name'] for group in scope.get('computer_groups', [])]
+        self.add(item_id, name, scope.get('all_computers'), computer_ids, group_names)
+
+    def applicable_ids(self, computer_id, group_names):
+        """
+        ids of every item scoped to this computer
+        """
+        matched = set(self.all_computers)
+        matched.update(self.by_computer.get(computer_id, ()))
+        for group_name in group_names:
+            matched.update(self.by_group.get(group_name, ()))
+        return matched
+
+    def applicable(self, computer_id, group_names):
+        """
+        names of every item scoped to this computer
+        """
+        return set(self.names[item_id] for item_id in self.applicable_ids(computer_id, group_names))
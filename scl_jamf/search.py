@@ -0,0 +1,336 @@
+"""
+Search Jamf for computers as the user types.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# search.py ####################################################################
+#
+# LiveSearch runs computers/match/*term* on a BackgroundTask once typing
+# pauses for delay milliseconds. Starting a new search cancels the one in
+# flight, its connection is closed and its results are dropped.
+#
+# Results are kept in a ResultCache, an LRU of search term -> matches. Jamf
+# matches are case insensitive substrings of a computer's MATCH_FIELDS, so
+# the matches for "labmac" are the matches for "lab" with "labmac" in one of
+# those fields. A
+# term containing a cached term is answered by filtering the cached matches
+# locally, no request is made. Terms with * wildcards are only answered by
+# an exact hit. Cached results expire after max_age seconds.
+#
+# With a ComputerIndex, matches from the local computer list are shown
+# without waiting for typing to pause. Jamf is only asked when the index
+# finds nothing, hasn't loaded yet, or lacks asset tags and bar codes, which
+# only Jamf can match then. Its matches are merged with the local ones. The
+# index is loaded and refreshed in the background when the LiveSearch is
+# created, and again whenever a search finds it older than its max_age.
+#
+# Matches from Jamf are also handed to on_partial in batches of batch_size
+# as they stream in, so a wide search can be displayed before it finishes.
+#
+# result_rows() turns matches into sorted (label, id) pairs for display.
+# Computer names sort naturally, "labmac-2" before "labmac-10", every run of
+# digits compared as a number. A "[lost] labmac-1" sorts right after
+# "labmac-1".
+#
+################################################################################
+
+from __future__ import print_function
+import collections
+import re
+import time
+import urllib
+
+from scl_jamf import tasks
+
+#
+# computers/match element fields Jamf compares a search term with
+MATCH_FIELDS = ['name', 'serial_number', 'asset_tag', 'bar_code_1', 'bar_code_2', 'username', 'realname',
+                'email', 'email_address', 'mac_address', 'alt_mac_address']
+
+_digits = re.compile(r'(\d+)')
+_bracket_prefix = re.compile(r'\[[^\]]*\][ -]*')
+
+
+def sort_key(name):
+    """
+    natural sort key for a computer name
+    """
+    prefix = _bracket_prefix.match(name)
+    if prefix:
+        name = name[prefix.end():]
+
+    #
+    # split() alternates text and digits, starting with text, so keys compare part by part
+    parts = _digits.split(name.lower())
+    for index in range(1, len(parts), 2):
+        parts[index] = int(parts[index])
+    return parts, bool(prefix)
+
+
+def result_rows(matches):
+    """
+    sorted (label, id) pairs for computers/match elements, labels look like "labmac-1 (123)"
+    """
+    rows = []
+    for node in matches:
+        name = node['name'] or "Not named."
+        rows.append((sort_key(name), u"%s (%s)" % (name, node['id']), node['id']))
+    rows.sort()
+    return [(label, match_id) for key, label, match_id in rows]
+
+
+def widest(labels, font, sample=50):
+    """
+    pixel width of the widest label, only the longest labels by character count are measured
+    """
+    longest = sorted(labels, key=len, reverse=True)[:sample]
+    if not longest:
+        return 0
+    return max(font.measure(label) for label in longest)
+
+
+def matches_term(computer, term):
+    """
+    True if a MATCH_FIELDS field of a computers/match element contains the lowercase term
+    """
+    for field in MATCH_FIELDS:
+        value = computer.get(field)
+        if isinstance(value, basestring) and term in value.lower():
+            return True
+    return False
+
+
+def merge_matches(local, remote):
+    """
+    Jamf matches followed by local matches Jamf didn't return
+    """
+    if not local:
+        return remote
+    remote_ids = set(str(node['id']) for node in remote)
+    return remote + [node for node in local if str(node['id']) not in remote_ids]
+
+
+class ResultCache(object):
+    """
+    LRU of lowercase search term -> list of computers/match elements
+    """
+    def __init__(self, size=32, max_age=300):
+        self.size = size
+        self.max_age = max_age
+        self.entries = collections.OrderedDict()
+
+    def get(self, term):
+        """
+        matches for term, from an exact hit or by filtering a shorter cached term, None if neither
+        """
+        term = term.lower()
+        now = time.time()
+        for key, (stamp, results) in self.entries.items():
+            if now - stamp > self.max_age:
+                del self.entries[key]
+
+        if term in self.entries:
+            stamp, results = self.entries.pop(term)
+            self.entries[term] = (stamp, results)
+            return results
+
+        if '*' in term:
+            return None
+
+        parents = [key for key in self.entries if key in term and '*' not in key]
+        if not parents:
+            return None
+
+        parent = max(parents, key=len)
+        stamp, results = self.entries[parent]
+        results = [item for item in results if matches_term(item, term)]
+
+        #
+        # the filtered list expires with the results it came from
+        self.put(term, results, stamp)
+        return results
+
+    def put(self, term, results, stamp=None):
+        term = term.lower()
+        self.entries.pop(term, None)
+        self.entries[term] = (stamp or time.time(), results)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class LiveSearch(object):
+    """
+    debounced computer search, on_results(term, matches) and on_error(term, error) run on the main loop
+
+    on_partial(term, matches, first) is called with each batch of matches as a Jamf search streams in
+    """
+    def __init__(self, root, jamf_client, logger, on_results, on_error=None, delay=400, min_length=3, cache_size=32, max_age=300, index=None,
+                 on_partial=None, batch_size=500):
+        self.root = root
+        self.jamf_client = jamf_client
+        self.logger = logger
+        self.on_results = on_results
+        self.on_error = on_error
+        self.on_partial = on_partial
+        self.batch_size = batch_size
+        self.delay = delay
+        self.min_length = min_length
+        self.cache = ResultCache(cache_size, max_age)
+        self.index = index
+
+        self.pending = None
+        self.task = None
+        self.term = None
+        self.index_task = None
+
+        if self.index:
+            self.refresh_index()
+
+    def changed(self, term):
+        """
+        the search entry changed, search once typing pauses
+        """
+        term = term.strip()
+        if term == self.term:
+            return
+        self.cancel()
+        self.term = term
+        if len(term) >= self.min_length:
+            local = self.search_index(term)
+            if local and self.index.has_tags:
+                return
+            self.pending = self.root.after(self.delay, self.search_jamf, term, local)
+
+    def search(self, term):
+        """
+        search now, from the index or cache if possible
+        """
+        self.cancel()
+        term = term.strip()
+        self.term = term
+
+        local = self.search_index(term)
+        if local and self.index.has_tags:
+            return
+        self.search_jamf(term, local)
+
+    def search_index(self, term):
+        """
+        matches from the local index, displayed at once. None if there is no loaded index
+        """
+        if not self.index or not self.index.loaded:
+            return None
+        if self.index.stale():
+            self.refresh_index()
+        results = self.index.search(term)
+        if results:
+            self.logger.info("search: %i local matches for %r" % (len(results), term))
+            self.on_results(term, results)
+        return results
+
+    def search_jamf(self, term, local=None):
+        """
+        matches from the cache or Jamf, merged with the local matches already displayed
+        """
+        self.pending = None
+
+        cached = self.cache.get(term)
+        if cached is not None:
+            self.logger.info("search: %i cached matches for %r" % (len(cached), term))
+            self.on_results(term, merge_matches(local, cached))
+            return
+
+        batches = []
+
+        def partial(matches):
+            #
+            # local matches are on display already, they aren't replaced by a first batch
+            if self.on_partial and not local:
+                self.on_partial(term, matches, not batches)
+            batches.append(len(matches))
+
+        self.task = tasks.BackgroundTask(self.root, self.fetch, (term,),
+                                         on_done=lambda results: self.fetched(term, results, local),
+                                         on_error=lambda error: self.failed(term, error),
+                                         on_progress=partial).start()
+
+    def refresh_index(self):
+        """
+        load the saved index if needed and update it from Jamf in the background
+        """
+        if self.index_task and self.index_task.running:
+            return
+        self.index_task = tasks.BackgroundTask(self.root, self.update_index, on_error=self.index_failed).start()
+
+    def update_index(self, task):
+        if not self.index.loaded:
+            try:
+                self.index.load()
+            except Exception as exception_message:
+                self.logger.error("update_index: Error reading local computer index. [%s]" % exception_message)
+        return self.index.refresh(self.jamf_client)
+
+    def index_failed(self, error):
+        self.logger.error("refresh_index: Error refreshing local computer index. [%s]" % error)
+
+    def cancel(self):
+        """
+        forget any scheduled search and drop the one in flight
+        """
+        if self.pending:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+        if self.task and self.task.running:
+            self.task.cancel()
+        self.task = None
+
+    def fetch(self, task, term):
+        """
+        runs on the task's thread, stops reading as soon as the task is cancelled
+        """
+        if isinstance(term, unicode):
+            term = term.encode('utf-8')
+
+        #
+        # matches are parsed as they arrive, see scl_jamf/json_stream.py
+        matches = self.jamf_client.stream_list('computers/match/' + urllib.quote('*' + term + '*'), 'computers')
+        results = []
+        batch_start = 0
+        try:
+            for node in matches:
+                if task.cancelled:
+                    return None
+                results.append(node)
+                if len(results) - batch_start >= self.batch_size:
+                    task.progress(results[batch_start:])
+                    batch_start = len(results)
+        finally:
+            matches.close()
+        return results
+
+    def fetched(self, term, results, local=None):
+        self.task = None
+        self.cache.put(term, results)
+        self.logger.info("search: %i matches for %r" % (len(results), term))
+        self.on_results(term, merge_matches(local, results))
+
+    def failed(self, term, error):
+        self.task = None
+        self.logger.error("search: Error searching for %r. [%s]" % (term, error))
+        if self.on_error:
+            self.on_error(term, error)
@@ -0,0 +1,42 @@
+"""
+Locations for files the applications keep between runs.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+from __future__ import print_function
+import os
+import platform
+
+
+def cache_path(filename):
+    """
+    path to a cache file, creating the enclosing directory if needed
+
+    macOS:   ~/Library/Caches/edu.scl.utah.jamf_tools/
+    Windows: %APPDATA%\\edu.scl.utah.jamf_tools\\
+    other:   $XDG_CACHE_HOME/edu.scl.utah.jamf_tools/ (~/.cache by default)
+    """
+    if platform.system() == 'Darwin':
+        cache_dir = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    elif platform.system() == 'Windows':
+        cache_dir = os.environ['APPDATA']
+    else:
+        cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    cache_dir = os.path.join(cache_dir, 'edu.scl.utah.jamf_tools')
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    return os.path.join(cache_dir, filename)
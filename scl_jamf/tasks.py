@@ -0,0 +1,199 @@
+"""
+Run slow work off the Tk main loop and hand the results back to it.
+"""
+# Copyright (c) 2018 University of Utah Student Computing Labs. ################
+# All Rights Reserved.
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+# tasks.py #####################################################################
+#
+# Tk widgets may only be touched from the thread running mainloop(). A
+# BackgroundTask runs function(task, *args) on a worker thread, the worker
+# posts messages to a queue and the queue is drained on the main loop with
+# root.after():
+#
+#   task.progress(*args)    from the worker, on_progress(*args) is called on
+#                           the main loop
+#   on_done(result)         function returned
+#   on_error(error)         function raised, the exception is handed over
+#
+# cancel() stops the callbacks, the worker should check task.cancelled and
+# return early when it can.
+#
+# A TaskRunner starts BackgroundTasks by name for UI actions. Starting a
+# task cancels the running task of the same name, so a second click replaces
+# the first request instead of racing it. The button that started a task
+# shows it is busy: its text changes and clicking it cancels the task, or it
+# is disabled for work that can't be taken back, like a submit. The button
+# is restored when the task finishes or is cancelled.
+#
+################################################################################
+
+from __future__ import print_function
+import Queue
+import threading
+
+
+class BackgroundTask(object):
+    """
+    run function(task, *args) on a thread, callbacks run on the Tk main loop
+    """
+    def __init__(self, root, function, args=(), on_done=None, on_error=None, on_progress=None, poll_interval=100):
+        self.root = root
+        self.function = function
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.poll_interval = poll_interval
+
+        self.messages = Queue.Queue()
+        self.running = False
+        self.cancelled = False
+
+    def start(self):
+        self.running = True
+        worker = threading.Thread(target=self._run)
+        worker.daemon = True
+        worker.start()
+        self.root.after(self.poll_interval, self._poll)
+        return self
+
+    def cancel(self):
+        """
+        drop any further callbacks, the worker finishes on its own
+        """
+        self.cancelled = True
+        self.running = False
+
+    def progress(self, *args):
+        """
+        called from the worker, report progress to the main loop
+        """
+        self.messages.put(('progress', args))
+
+    def _run(self):
+        try:
+            result = self.function(self, *self.args)
+        except Exception as error:
+            self.messages.put(('error', error))
+        else:
+            self.messages.put(('done', result))
+
+    def _poll(self):
+        """
+        drain the message queue, runs on the main loop
+        """
+        if self.cancelled:
+            return
+
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except Queue.Empty:
+                break
+
+            if kind == 'progress':
+                if self.on_progress:
+                    self.on_progress(*payload)
+                continue
+
+            self.running = False
+            if kind == 'done' and self.on_done:
+                self.on_done(payload)
+            elif kind == 'error' and self.on_error:
+                self.on_error(payload)
+            return
+
+        self.root.after(self.poll_interval, self._poll)
+
+
+class TaskRunner(object):
+    """
+    named BackgroundTasks started from buttons, one task per name
+    """
+    def __init__(self, root):
+        self.root = root
+        self.tasks = {}
+        self.buttons = {}
+
+    def run(self, name, function, args=(), on_done=None, on_error=None, on_progress=None, on_cancel=None,
+            button=None, busy_text="Cancel", cancellable=True):
+        """
+        start function(task, *args), cancelling a running task of the same name
+
+        button shows busy_text while the task runs, clicking it cancels the task if cancellable,
+        otherwise it is disabled. on_cancel() is called if the task is cancelled, not if it is replaced.
+        """
+        previous = self.tasks.pop(name, None)
+        if previous:
+            previous[0].cancel()
+        self.idle(name)
+
+        def finished(callback, payload):
+            self.tasks.pop(name, None)
+            self.idle(name)
+            if callback:
+                callback(payload)
+
+        task = BackgroundTask(self.root, function, args,
+                              on_done=lambda result: finished(on_done, result),
+                              on_error=lambda error: finished(on_error, error),
+                              on_progress=on_progress)
+        self.tasks[name] = (task, on_cancel, cancellable)
+        if button is not None:
+            self.busy(name, button, busy_text, (lambda: self.cancel(name)) if cancellable else None)
+        return task.start()
+
+    def busy(self, name, button, text, cancel=None):
+        """
+        show a button as busy until idle(name), clicking it calls cancel() or it is disabled if there is none
+        """
+        if name not in self.buttons:
+            self.buttons[name] = (button, button.cget('text'), button.cget('command'), str(button.cget('state')))
+
+        if cancel:
+            button.configure(text=text, command=cancel)
+        else:
+            button.configure(text=text, state='disabled')
+
+    def idle(self, name):
+        """
+        restore the button of a task
+        """
+        saved = self.buttons.pop(name, None)
+        if saved:
+            button, text, command, state = saved
+            button.configure(text=text, command=command, state=state)
+
+    def cancel(self, name):
+        """
+        drop a running task, its callbacks won't be called
+        """
+        task, on_cancel, cancellable = self.tasks.pop(name, (None, None, True))
+        self.idle(name)
+        if task:
+            task.cancel()
+            if on_cancel:
+                on_cancel()
+
+    def cancel_all(self):
+        """
+        cancel every task that can be cancelled
+        """
+        for name, (task, on_cancel, cancellable) in self.tasks.items():
+            if cancellable:
+                self.cancel(name)
+
+    def is_running(self, name):
+        return name in self.tasks
@@ -1,89 +1,115 @@
-def dbase(self):
+#
+# dbase() keeps the staff records it reads in self.person_cache, a MemoryCache
+# set up by Tugboat (see scl_jamf/cache.py), under self.person_key('dbase')
+# for the uNID in the username field. Walking up and back down a supervisor
+# chain doesn't query the database again for people seen in the last
+# person_cache_max_age seconds. Tugboat's forget_person() drops the cached
+# records.
+#
+
+
+def read_staff(unid):
     """
-    sample method to parse databse info into fields useable by tugboat
+    staff record of a uNID from the database, returns (record dictionary, None) or (None, error message)
     """
     #
-    # Staff database
-    #
-
+    # values are passed to execute() as parameters, MySQLdb quotes them
     try:
-        if self.valid_unid():
-            pass
-        else:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error searching database, no valid uNID.")
-            self.reset_user()
-            return
+        db = MySQLdb.connect(host="your.mysql.server",  # your host, usually localhost
+                             user="your_user",          # your username
+                             passwd="your_password",    # your password, **not secure by any definition**
+                             db="your_db")              # name of the data base
+    except:
+        return None, "Error connecting to database."
 
-        self.status_label.configure(style='Normal.TLabel')
-        self.status_string.set("Marriott Staff database selected.")
-
-        try:
-            db = MySQLdb.connect(host="your.mysql.server",  # your host, usually localhost
-                                 user="your_user",          # your username
-                                 passwd="your_password",    # your password, **not secure by any definition**
-                                 db="your_db")              # name of the data base
-        except:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error connecting to database.")
-            return
+    try:
+        person = {}
 
         staff = db.cursor()
         supervisor  = db.cursor()
         division = db.cursor()
         department  = db.cursor()
-        staff.execute("""SELECT name_last, name_first, division_id, department_id,email, phone, campusAddr FROM staff WHERE unid = '%s';""" % self.endusername_string.get())
+        staff.execute("""SELECT name_last, name_first, division_id, department_id,email, phone, campusAddr FROM staff WHERE unid = %s;""", (unid,))
         if int(staff.rowcount) == 0:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error querying specific staff.")
-            db.close()
-            return
+            return None, "Error querying specific staff."
         else:
             for row in staff.fetchall():
-                self.fullname_string.set(row[1] + " " + row[0])
+                person['fullname'] = row[1] + " " + row[0]
                 my_division = row[2]
                 my_dept     = row[3]
-                self.email_string.set(row[4])
-                self.phone_string.set(row[5])
-                self.room_string.set(row[6])
+                person['email'] = row[4]
+                person['phone'] = row[5]
+                person['room'] = row[6]
 
-        supervisor.execute("""SELECT supervisor_unid FROM staff_supervisors WHERE staff_unid = '%s';""" % self.endusername_string.get())
+        supervisor.execute("""SELECT supervisor_unid FROM staff_supervisors WHERE staff_unid = %s;""", (unid,))
         if int(supervisor.rowcount) == 0:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error querying supervisor.")
-            db.close()
-            return
+            return None, "Error querying supervisor."
         else:
             for row in supervisor.fetchall():
-                self.supervisor_endusername_string.set(row[0])
+                person['supervisor'] = row[0]
                 break
 
-        division.execute("""SELECT name FROM division WHERE id = '%s';""" % my_division)
+        division.execute("""SELECT name FROM division WHERE id = %s;""", (my_division,))
         if int(division.rowcount) == 0:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error querying division.")
-            db.close()
-            return
+            return None, "Error querying division."
         else:
             for row in division.fetchall():
-                division_name = row[0]
+                person['division'] = row[0]
 
-        department.execute("""SELECT name FROM department WHERE id = '%s';""" % my_dept)
-        if int(division.rowcount) == 0:
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error querying department.")
-            db.close()
-            return
+        department.execute("""SELECT name FROM department WHERE id = %s;""", (my_dept,))
+        if int(department.rowcount) == 0:
+            return None, "Error querying department."
         else:
             for row in department.fetchall():
-                department_name = row[0]
+                person['department'] = row[0]
 
+        return person, None
+
+    finally:
         db.close()
 
+
+def dbase(self):
+    """
+    sample method to parse databse info into fields useable by tugboat
+    """
+    #
+    # Staff database
+    #
+
+    try:
+        if self.valid_unid():
+            pass
+        else:
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set("Error searching database, no valid uNID.")
+            self.reset_user()
+            return
+
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Marriott Staff database selected.")
+
+        unid = self.username_string.get()
+        person = self.person_cache.get(self.person_key('dbase'))
+        if person is None:
+            person, error_message = read_staff(unid)
+            if person is None:
+                self.status_label.configure(style='Warning.TLabel')
+                self.status_string.set(error_message)
+                return
+            self.person_cache.set(self.person_key('dbase'), person)
+            self.person_cache.save()
+
+        self.fullname_string.set(person['fullname'])
+        self.email_string.set(person['email'])
+        self.phone_string.set(person['phone'])
+        self.room_string.set(person['room'])
+        self.supervisor_endusername_string.set(person['supervisor'])
+
         #
         # sets popup menus to correct values
-        self.division_string.set(division_name)
-        self.position_string.set(department_name)
+        self.division_string.set(person['division'])
+        self.position_string.set(person['department'])
 
         if inspect.stack()[1][3] == "__call__":
             self.previous_unid = []
@@ -96,5 +122,4 @@ def dbase(self):
     except ValueError:
         self.status_label.configure(style='Warning.TLabel')
         self.status_string.set("Error setting dbase Mode.")
-        db.close()
         return
@@ -1,43 +1,323 @@
+# ldap_object.py ###############################################################
+#
+# Two ways to read a person's directory record:
+#
+#   LDAPDirectory   a persistent connection through the python-ldap module,
+#                   asking only for the attributes LDAP_record uses. Tens of
+#                   milliseconds per lookup once connected.
+#   dscl            /usr/bin/dscl -read, a new process and directory bind per
+#                   lookup. Used when python-ldap isn't installed, LDAP_SERVER
+#                   isn't set, or the connection fails. After a failure dscl
+#                   is used for LDAP_RETRY_DELAY seconds before the server is
+#                   tried again, so lookups don't each wait out LDAP_TIMEOUT.
+#
+# Both produce the same dictionary, attribute -> value, or a list of values
+# when there are several, so the my_*() methods don't care which was used.
+#
+# read_records() looks up many uNIDs at once, for bulk updates. Over a
+# connection it sends one search per chunk_size uNIDs, (|(uid=a)(uid=b)...),
+# with dscl it runs several reads at a time. Every uNID gets an LDAP_record,
+# with error set and error_message saying why if its lookup failed.
+#
+# ldap() keeps the records it reads in self.person_cache, a MemoryCache set
+# up by Tugboat (see scl_jamf/cache.py), under self.person_key('ldap') for
+# the uNID in the username field. Entering a uNID seen in the last
+# person_cache_max_age seconds doesn't ask the directory again. Tugboat's
+# forget_person() drops the cached records.
+#
+################################################################################
+
+from __future__ import print_function
+import logging
+import multiprocessing.pool
+import string
+import subprocess
+import threading
+import time
+
+try:
+    import ldap as python_ldap
+    import ldap.filter as ldap_filter
+except ImportError:
+    python_ldap = None
+
+#
+# Tugboat's log, see loggers.file_logger(name='tugboat')
+logger = logging.getLogger('tugboat')
+
+#
+# directory settings, adjust for your institution
+#  LDAP_SERVER: ldap:// or ldaps:// URL, None to always use dscl
+#  LDAP_BASE: search base holding person records
+#  LDAP_UID_ATTRIBUTE: attribute holding the uNID
+#  LDAP_BIND_DN, LDAP_BIND_PASSWORD: None for an anonymous bind
+#  LDAP_TIMEOUT: seconds to wait for the server
+#  LDAP_RETRY_DELAY: seconds dscl is used after the server couldn't be reached
+#  DSCL_NODE: directory node read by dscl
+LDAP_SERVER = None
+LDAP_BASE = "ou=People,dc=your,dc=ldap,dc=server"
+LDAP_UID_ATTRIBUTE = "uid"
+LDAP_BIND_DN = None
+LDAP_BIND_PASSWORD = None
+LDAP_TIMEOUT = 10
+LDAP_RETRY_DELAY = 60
+DSCL_NODE = "/LDAPv3/your.ldap.server"
+
+#
+# attributes read by the LDAP_record methods, add any you use
+ATTRIBUTES = ['gecos', 'displayName', 'title', 'mail', 'ExtensionAttribute4', 'telephoneNumber',
+              'department', 'streetAddress', 'Student', 'Employee']
+
+
+class LDAPDirectory(object):
+    """
+    persistent LDAP connection, reopened if the server drops it
+    """
+    def __init__(self, server=None, base=None, bind_dn=None, bind_password=None, timeout=None, retry_delay=None):
+        self.server = server or LDAP_SERVER
+        self.base = base or LDAP_BASE
+        self.bind_dn = bind_dn or LDAP_BIND_DN
+        self.bind_password = bind_password or LDAP_BIND_PASSWORD
+        self.timeout = timeout or LDAP_TIMEOUT
+        self.retry_delay = LDAP_RETRY_DELAY if retry_delay is None else retry_delay
+        self.connection = None
+        self.failed_at = 0
+
+        #
+        # one request at a time on the shared connection
+        self.lock = threading.Lock()
+
+    def connect(self):
+        connection = python_ldap.initialize(self.server)
+        connection.set_option(python_ldap.OPT_NETWORK_TIMEOUT, self.timeout)
+        connection.set_option(python_ldap.OPT_REFERRALS, 0)
+        connection.simple_bind_s(self.bind_dn or '', self.bind_password or '')
+        self.connection = connection
+
+    def available(self):
+        """
+        False for retry_delay seconds after the server couldn't be reached, use dscl meanwhile
+        """
+        return time.time() - self.failed_at >= self.retry_delay
+
+    def search(self, filterstr, attributes=None):
+        """
+        [(dn, attributes)] matching filterstr, only ATTRIBUTES are returned unless attributes are given
+        """
+        with self.lock:
+            for attempt in range(2):
+                if self.connection is None:
+                    try:
+                        self.connect()
+                    except Exception:
+                        self.failed_at = time.time()
+                        raise
+                try:
+                    return self.connection.search_st(self.base, python_ldap.SCOPE_SUBTREE, filterstr, attributes or ATTRIBUTES,
+                                                     timeout=self.timeout)
+                except python_ldap.TIMEOUT:
+                    self.connection = None
+                    self.failed_at = time.time()
+                    raise
+                except (python_ldap.SERVER_DOWN, python_ldap.CONNECT_ERROR):
+                    self.connection = None
+                    if attempt:
+                        self.failed_at = time.time()
+                        raise
+
+    def read(self, unid):
+        """
+        record dictionary of a uNID, None if there is no such person
+        """
+        filterstr = "(%s=%s)" % (LDAP_UID_ATTRIBUTE, ldap_filter.escape_filter_chars(unid))
+        for dn, attributes in self.search(filterstr):
+            if dn:
+                return ldap_values(attributes)
+        return None
+
+    def read_many(self, unids, chunk_size=50):
+        """
+        uNID -> record dictionary, uNIDs that aren't found are left out
+
+        a chunk that fails raises, read_records() reports it for each uNID in the chunk
+        """
+        records = {}
+        for start in range(0, len(unids), chunk_size):
+            chunk = unids[start:start + chunk_size]
+            filterstr = "(|%s)" % "".join("(%s=%s)" % (LDAP_UID_ATTRIBUTE, ldap_filter.escape_filter_chars(unid)) for unid in chunk)
+            for dn, attributes in self.search(filterstr, ATTRIBUTES + [LDAP_UID_ATTRIBUTE]):
+                #
+                # attribute names are case insensitive, the server may not spell them as we asked
+                uid_values = dict((key.lower(), values) for key, values in attributes.items()).get(LDAP_UID_ATTRIBUTE.lower())
+                if dn and uid_values:
+                    records[uid_values[0].lower()] = ldap_values(attributes)
+        return records
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.unbind_s()
+                self.connection = None
+
+
+def ldap_values(attributes):
+    """
+    python-ldap attributes in the shape dscl output is parsed into, one value as a string, several as a list
+    """
+    record = {}
+    for key, values in attributes.items():
+        if len(values) == 1:
+            record[key] = values[0]
+        else:
+            record[key] = list(values)
+    return record
+
+
+def read_dscl(unid):
+    """
+    record dictionary of a uNID from dscl, raises CalledProcessError if there is none
+    """
+    ldap_dict = {}
+
+    #
+    # request complete user record from LDAP
+    cmd = "/Users/" + unid
+    raw_data = subprocess.check_output(["/usr/bin/dscl", DSCL_NODE, "-read", cmd])
+
+    #
+    # begin parsing data into dictionary
+    raw_data = string.replace(raw_data, '\n ', ' ')
+    raw_data =  raw_data.split('\n')
+
+    for line in raw_data:
+        y = line.split(":")
+        y = [x for x in y if 'dsAttrTypeNative' not in x]
+
+        if len(y) == 2:
+            key = y[0]
+            value = y[1]
+            value = value.lstrip()
+
+        else:
+            key = y[0]
+            value = y[1:]
+            value = [x for x in value if x]
+
+        if key:
+            ldap_dict[key] = value
+
+    return ldap_dict
+
+
+_shared_directory = None
+_shared_directory_lock = threading.Lock()
+
+
+def shared_directory():
+    """
+    the LDAPDirectory used by LDAP_record, None if python-ldap or LDAP_SERVER isn't available
+    """
+    global _shared_directory
+    if python_ldap is None or not LDAP_SERVER:
+        return None
+
+    with _shared_directory_lock:
+        if _shared_directory is None:
+            _shared_directory = LDAPDirectory()
+        return _shared_directory
+
+
+def read_records(unids, directory=None, chunk_size=50, workers=8):
+    """
+    uNID -> LDAP_record for many uNIDs, records whose lookup failed have error set and an error_message
+    """
+    unids = list(set(unids))
+    results = {}
+
+    if directory is None:
+        directory = shared_directory()
+
+    if directory:
+        chunks = [unids[start:start + chunk_size] for start in range(0, len(unids), chunk_size)]
+        remaining = []
+        for chunk in chunks:
+            if not directory.available():
+                remaining.extend(chunk)
+                continue
+            try:
+                found = directory.read_many(chunk, chunk_size)
+            except Exception as exception_message:
+                #
+                # dscl may still reach the directory
+                logger.error("read_records: directory error, using dscl. [%s]" % exception_message)
+                remaining.extend(chunk)
+                continue
+
+            for unid in chunk:
+                if unid.lower() in found:
+                    results[unid] = LDAP_record(unid, record=found[unid.lower()])
+                else:
+                    results[unid] = LDAP_record(unid, record={})
+                    results[unid].set_error("No record found.")
+        unids = remaining
+
+    if unids:
+        #
+        # each dscl read is a process of its own, run several at once
+        pool = multiprocessing.pool.ThreadPool(min(workers, len(unids)))
+        try:
+            for unid, record in zip(unids, pool.map(lambda unid: LDAP_record(unid, directory=False), unids)):
+                results[unid] = record
+        finally:
+            pool.close()
+
+    return results
+
+
 class LDAP_record:
     """
     consume LDAP record and provide methods for accessing interesting data
+
+    directory is an LDAPDirectory, None for the shared one, False to read with dscl.
+    record is a record dictionary already read, e.g. by read_records()
     """
-    def __init__(self, unid):
+    def __init__(self, unid, directory=None, record=None):
+        self.unid = unid
         self.error = False
-        ldap_dict = {}
+        self.error_message = None
+        self.record = {}
 
-        #
-        # request complete user record from LDAP
-        cmd = "/Users/" + unid
-        try:
-            raw_data = subprocess.check_output(["/usr/bin/dscl", "/LDAPv3/your.ldap.server", "-read", cmd])
-        except:
-            self.error = True
+        if record is not None:
+            self.record = record
             return
 
         #
-        # begin parsing data into dictionary
-        raw_data = string.replace(raw_data, '\n ', ' ')
-        raw_data =  raw_data.split('\n')
-
-        for line in raw_data:
-            y = line.split(":")
-            y = [x for x in y if 'dsAttrTypeNative' not in x]
-
-            if len(y) == 2:
-                key = y[0]
-                value = y[1]
-                value = value.lstrip()
+        # the persistent connection when there is one, dscl otherwise or if it fails
+        if directory is None:
+            directory = shared_directory()
 
+        if directory and directory.available():
+            try:
+                record = directory.read(unid)
+            except Exception as exception_message:
+                logger.error("LDAP_record: directory error, using dscl. [%s]" % exception_message)
             else:
-                key = y[0]
-                value = y[1:]
-                value = [x for x in value if x]
+                if record is None:
+                    self.set_error("No record found.")
+                else:
+                    self.record = record
+                return
 
-            if key:
-                ldap_dict[key] = value
+        try:
+            self.record = read_dscl(unid)
+        except subprocess.CalledProcessError:
+            self.set_error("No record found.")
+        except Exception as exception_message:
+            self.set_error("dscl error. [%s]" % exception_message)
 
-        self.record = ldap_dict
+    def set_error(self, message):
+        self.error = True
+        self.error_message = message
 
     def is_student(self):
         try:
@@ -124,8 +404,17 @@ def ldap(self):
         self.status_string.set("LDAP selected.")
 
         if self.valid_unid():
-            print("ldap %r" % self.endusername_string.get())
-            this_person = LDAP_record(self.endusername_string.get())
+            self.logger.info("ldap: %r" % self.username_string.get())
+            unid = self.username_string.get()
+            cached = self.person_cache.get(self.person_key('ldap'))
+            if cached is not None:
+                this_person = LDAP_record(unid, record=cached)
+            else:
+                this_person = LDAP_record(unid)
+                if not this_person.error:
+                    self.person_cache.set(self.person_key('ldap'), this_person.record)
+                    self.person_cache.save()
+
             if not this_person.error:
 
                 self.fullname_string.set(this_person.my_name())
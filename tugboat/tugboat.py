@@ -47,7 +47,9 @@ A Python Tk application to edit Jamf computer records.
 #     rm -rdf build dist ; /usr/bin/python setup.py py2app -s
 #
 #     pyinstaller (Windows):
-#     pyinstaller --onefile -i tugboat_icon.ico tugboat.py
+#     pyinstaller --onefile --paths .. -i tugboat_icon.ico tugboat.py
+#
+#     Both builds need the shared scl_jamf package from the top of the repository.
 #
 ################################################################################
 
@@ -62,17 +64,13 @@ A Python Tk application to edit Jamf computer records.
 ################################################################################
 
 from __future__ import print_function
-import base64
-import ConfigParser
 import inspect
-import json
 import os
 import platform
 import re
 import socket
-import subprocess
 import sys
-import tkFont
+import tkFileDialog
 import tkMessageBox
 import tkSimpleDialog
 import ttk
@@ -82,11 +80,27 @@ import webbrowser
 import xml.etree.cElementTree as ET
 from Tkinter import *
 
+#
+# modules shared with Cargo Ship live in scl_jamf, one level above this application
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from scl_jamf import bulk_update
+from scl_jamf import cache
+from scl_jamf import client
+from scl_jamf import computer_index
+from scl_jamf import computer_record
+from scl_jamf import computers
+from scl_jamf import local_machine
+from scl_jamf import login
+from scl_jamf import menus
+from scl_jamf import results_window
+from scl_jamf import search
+from scl_jamf import storage
+from scl_jamf import tasks
+
 #
 # Need to implement correct windows-appropriate logging.
 if platform.system() == 'Darwin':
     import pexpect
-    import pwd
     try:
         from management_tools import loggers
     except:
@@ -102,18 +116,43 @@ class Computer(object):
     """
     Store GUI and data structures describing jamf computer records
     """
-    def __init__(self, root, logger, jamf_hostname, jamf_username, jamf_password, access_level):
+    def __init__(self, root, logger, session):
         """
         initialize variables and data structures
         """
         self.root = root
         self.logger = logger
-        self.jamf_hostname = jamf_hostname
-        self.jamf_password = jamf_password
-        self.jamf_username = jamf_username
-        self.access_level = access_level
+        self.jamf_hostname = session.jamf_hostname
+        self.jamf_password = session.jamf_password
+        self.jamf_username = session.jamf_username
+        self.access_level = session.access_level
+
+        #
+        # the client that logged in, its connections are already open
+        self.jamf = session.jamf_client
+
+        #
+        # the Jamf ID of this device is saved between runs and looked up in the background
+        #  at startup, see scl_jamf/local_machine.py
+        self.local_machine = local_machine.LocalMachine(self.jamf, logger)
         self.local_jamf_id = None
 
+        #
+        # as-you-type computer search, results share a single window
+        #  use_computer_index: search a local copy of the computer list, refreshed in the background,
+        #   and only ask Jamf when it finds nothing. see scl_jamf/computer_index.py
+        self.use_computer_index = True
+
+        local_index = None
+        if self.use_computer_index:
+            try:
+                local_index = computer_index.ComputerIndex(self.jamf_hostname, logger)
+            except Exception as exception_message:
+                logger.error("__init__: Local computer index unavailable. [%s]" % exception_message)
+        self.live_search = search.LiveSearch(root, self.jamf, logger, self.search_results, self.search_failed, index=local_index,
+                                             on_partial=self.search_partial)
+        self.results_window = results_window.ResultsWindow(root, self.search_selected)
+
         self.hostname = ""
         self.divisions = []
         self.buildings = []
@@ -143,7 +182,7 @@ class Computer(object):
         self.phone_string.set("")
         self.room_string.set("")
         self.assettag_string.set("")
-        self.status_string.set("Logged in to " + self.jamf_hostname + " with " + access_level + " privileges.")
+        self.status_string.set("Logged in to " + self.jamf_hostname + " with " + self.access_level + " privileges.")
         self.computer_name_string.set("")
 
         self.status_warning = ttk.Style()
@@ -164,11 +203,51 @@ class Computer(object):
         self.status_subtle = ttk.Style()
         self.status_subtle.configure('Subtle.TLabel', foreground='maroon')
 
+        #
+        # sections of the computer record query_jamf_id reads, see scl_jamf/computers.py
+        # add 'ExtensionAttributes' if you display EA's
+        self.record_sections = ['General', 'Location']
+
+        #
+        # bulk updates, adjust for your Jamf server
+        #  bulk_workers: number of concurrent updates
+        #  bulk_requests_per_second: cap on requests to this host, 0 for no limit
+        self.bulk_workers = 4
+        self.bulk_requests_per_second = 10
+
+        #
+        # departments, buildings and EA choices are saved between runs and checked again in the
+        #  background once older than menu_max_age seconds. see scl_jamf/menus.py
+        self.menu_max_age = 3600
+        self.menus = menus.MenuCache(self.jamf, self.logger, self.menu_max_age)
+
+        #
+        # Jamf requests started by buttons run in the background, see scl_jamf/tasks.py
+        #  the button shows "Cancel" until its request returns, Escape cancels everything
+        self.runner = tasks.TaskRunner(self.root)
+
+        #
+        # people read by ldap() and dbase(), see ldap_object.py and database_function.py
+        #  person_cache_max_age: seconds a person's record is reused, so walking a supervisor chain
+        #   doesn't ask the directory or database again for people just looked at
+        #  person_cache_on_disk: also keep records in people.json between runs. off by default,
+        #   the records are personal information.
+        #  Control-R forgets the records of the person in the username field, see forget_person()
+        self.person_cache_max_age = 900
+        self.person_cache_on_disk = False
+
+        person_disk_cache = None
+        if self.person_cache_on_disk:
+            person_disk_cache = cache.DiskCache(storage.cache_path('people.json'), self.person_cache_max_age, logger)
+        self.person_cache = cache.MemoryCache(256, self.person_cache_max_age, person_disk_cache)
+
         self.hostname = (socket.gethostname()).split(".")[0]
         self.divisions = self.populate_menu('departments')
         self.buildings = self.populate_menu('buildings')
 
         self.build_ui()
+        self.refresh_menus()
+        self.prefetch_local_id()
 
     def build_ui(self):
         """
@@ -401,11 +480,14 @@ class Computer(object):
         #
         # these are the elements of the Navigation section of the UI
         ttk.Label(self.mainframe, text="Discovery Method:").grid(column=1, row=100, sticky=E)
-        ttk.Button(self.mainframe, text="This Device", style='Highlight.TButton', command=self.query_jamf_me).grid(column=2, row=100, sticky=W)
+        self.this_device_btn = ttk.Button(self.mainframe, text="This Device", style='Highlight.TButton', command=self.query_jamf_me)
+        self.this_device_btn.grid(column=2, row=100, sticky=W)
 
-        ttk.Button(self.mainframe, text="Search Jamf", command=self.search_string_jamf).grid(column=2, row=100, sticky=E)
+        self.search_btn = ttk.Button(self.mainframe, text="Search Jamf", command=self.search_string_jamf)
+        self.search_btn.grid(column=2, row=100, sticky=E)
         self.search_entry = ttk.Entry(self.mainframe, width=25, textvariable=self.search_string)
         self.search_entry.grid(column=3, row=100, columnspan=2, sticky=W)
+        self.search_entry.bind('<KeyRelease>', self.search_typed)
 
         ttk.Label(self.mainframe, text="Jamf ID:                ").grid(column=4, row=100, sticky=E)
         self.id_entry = ttk.Entry(self.mainframe, width=6, textvariable=self.id_string)
@@ -484,7 +566,8 @@ class Computer(object):
         # these are the elements of the Administration section of the UI
         ttk.Label(self.mainframe, text="Open in Jamf:").grid(column=1, row=850, sticky=E)
         ttk.Button(self.mainframe, text="Device", command=self.open_id_web).grid(column=2, row=850, sticky=W)
-        ttk.Button(self.mainframe, text="User", command=self.open_user_web).grid(column=2, row=850)
+        self.user_web_btn = ttk.Button(self.mainframe, text="User", command=self.open_user_web)
+        self.user_web_btn.grid(column=2, row=850)
         ttk.Button(self.mainframe, text="Search", command=self.open_search_web).grid(column=2, row=850, sticky=E)
 
         self.jamf_management_label = ttk.Label(self.mainframe, text="Managed by Jamf:                     ")
@@ -492,6 +575,11 @@ class Computer(object):
         self.jamf_management_btn = ttk.Button(self.mainframe, text="True", width=6, command=lambda: self.jamf_management_btn.config(text="False") if self.jamf_management_btn.config('text')[-1] == 'True' else self.jamf_management_btn.config(text="True"))
         self.jamf_management_btn.grid(column=4, row=850, sticky=E)
 
+        if self.access_level == 'full':
+            ttk.Button(self.mainframe, text="Bulk Update...", command=self.bulk_update).grid(column=3, row=850, sticky=W)
+        else:
+            ttk.Button(self.mainframe, text="Bulk Update...", state='disabled').grid(column=3, row=850, sticky=W)
+
         ttk.Separator(self.mainframe, orient=HORIZONTAL).grid(row=1000, columnspan=5, sticky=EW)
 
         self.status_label = ttk.Label(self.mainframe, textvariable=self.status_string)
@@ -500,7 +588,7 @@ class Computer(object):
         ttk.Button(self.mainframe, text="Reset", width=6, command=self.reset_data).grid(column=4, row=1100, sticky=W)
         ttk.Button(self.mainframe, text="Quit", width=6, command=self.root.destroy).grid(column=4, row=1100)
 
-        if access_level == 'full':
+        if self.access_level == 'full':
             self.submit_btn = ttk.Button(self.mainframe, text="Submit", default='active', command=self.submit)
             self.submit_btn.grid(column=4, row=1100, sticky=E)
         else:
@@ -524,6 +612,9 @@ class Computer(object):
         for child in self.mainframe.winfo_children():
             child.grid_configure(padx=3, pady=3)
 
+        self.root.bind('<Escape>', self.cancel_tasks)
+        self.root.bind('<Control-r>', self.forget_person)
+
     def open_user_web(self):
         """
         Open currently displayed user record in jamf
@@ -533,42 +624,38 @@ class Computer(object):
         #
         # in order to open the user in a browser you need the user's Jamf ID
         # in order to get the ID you need to open the user's record on Jamf
-        if self.username_string.get():
-            url = self.jamf_hostname + '/JSSResource/users/name/' + self.username_string.get()
-            url = urllib.quote(url, ':/()')
-
-            request = urllib2.Request(url)
-            request.add_header('Accept', 'application/json')
-            request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-            response = urllib2.urlopen(request)
-            response_json = json.loads(response.read())
-
-            if response.code != 200:
-                self.logger.error("%s: Invalid response code." % inspect.stack()[0][3])
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("%i returned." % response.code)
-                return
-
-            jss_user_id = response_json['user']['id']
-
-        else:
+        if not self.username_string.get():
             self.logger.error("%s: No user set." % inspect.stack()[0][3])
             self.status_label.configure(style='Warning.TLabel')
             self.status_string.set("No user set.")
             return
 
-        if jss_user_id:
-            url_formatted = self.jamf_hostname + "/users.html?id=" + str(jss_user_id) + "&o=r"
-            webbrowser.open_new_tab(url_formatted)
-            self.logger.info("%s: Opened user web. (%s)" % (inspect.stack()[0][3], self.username_string.get()))
-            self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("Opened URL for User.")
+        username = self.username_string.get()
+        api_call = urllib.quote('users/name/' + username, ':/()')
 
-        else:
-            self.logger.error("%s: No user id available." % inspect.stack()[0][3])
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("No user available.")
+        def fetch_user(task):
+            #
+            # error responses are raised as HTTPError and reported by task_failed()
+            return self.jamf.get_json(api_call)
+
+        def open_user(response_json):
+            jss_user_id = response_json['user']['id']
+            if jss_user_id:
+                url_formatted = self.jamf_hostname + "/users.html?id=" + str(jss_user_id) + "&o=r"
+                webbrowser.open_new_tab(url_formatted)
+                self.logger.info("open_user_web: Opened user web. (%s)" % username)
+                self.status_label.configure(style='Normal.TLabel')
+                self.status_string.set("Opened URL for User.")
+
+            else:
+                self.logger.error("open_user_web: No user id available.")
+                self.status_label.configure(style='Warning.TLabel')
+                self.status_string.set("No user available.")
+
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Looking up user %s..." % username)
+        self.runner.run('user_web', fetch_user, on_done=open_user, on_error=lambda error: self.task_failed('open_user_web', error),
+                        on_cancel=self.task_cancelled, button=self.user_web_btn)
 
     def open_id_web(self):
         """
@@ -619,6 +706,32 @@ class Computer(object):
         self.building_string.set("")
         self.room_string.set("")
 
+    def person_key(self, source):
+        """
+        person_cache key of the person in the username field, for records read from source ('ldap' or 'dbase')
+        """
+        return source + '|' + self.username_string.get()
+
+    def forget_person(self, *event):
+        """
+        drop cached directory and database records of the person in the username field
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+
+        unid = self.username_string.get()
+        if not unid:
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set("No user set.")
+            return
+
+        for source in ('ldap', 'dbase'):
+            self.person_cache.invalidate(self.person_key(source))
+        self.person_cache.save()
+
+        self.logger.info("%s: forgot %s" % (inspect.stack()[0][3], unid))
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Cached records for %s cleared." % unid)
+
     def reset_data(self):
         """
         reset all data structures to blank
@@ -748,126 +861,104 @@ class Computer(object):
         if not self.check_submit():
             return
 
-        try:
-            self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("Submitting...")
-
-            jamf_url = self.jamf_hostname + '/JSSResource/computers/id/' + self.id_string.get()
-
-            #
-            # These are the individual fields associated with UI elements
-            # If you add additional fields to the UI, you will need to add corresponding
-            # XML elements form them to be submitted back to the Jamf database.
-            top = ET.Element('computer')
-
-            general = ET.SubElement(top, 'general')
-
-            computer_name_xml = ET.SubElement(general, 'name')
-            computer_name_xml.text = self.computer_name_string.get()
-
-            asset_tag_xml = ET.SubElement(general, 'asset_tag')
-            asset_tag_xml.text = self.assettag_string.get()
-
-            barcode_xml = ET.SubElement(general, 'barcode_1')
-            barcode_xml.text = self.barcode_string.get()
-
-            location = ET.SubElement(top, 'location')
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Submitting...")
 
-            username_xml = ET.SubElement(location, 'username')
-            username_xml.text = self.username_string.get()
+        api_call = 'computers/id/' + self.id_string.get()
 
-            email_xml = ET.SubElement(location, 'email_address')
-            email_xml.text = self.email_string.get()
+        #
+        # These are the individual fields associated with UI elements
+        # If you add additional fields to the UI, you will need to add corresponding
+        # entries here and in scl_jamf/computer_record.py to be submitted back to the Jamf database.
+        top = computer_record.build_xml({
+            'name': self.computer_name_string.get(),
+            'asset_tag': self.assettag_string.get(),
+            'barcode_1': self.barcode_string.get(),
+            'username': self.username_string.get(),
+            'email_address': self.email_string.get(),
+            'real_name': self.fullname_string.get(),
+            'phone': self.phone_string.get(),
+            'building': self.building_string.get(),
+            'room': self.room_string.get(),
+            'position': self.position_string.get(),
+            'department': self.department_string.get(),
+        })
 
-            realname_xml = ET.SubElement(location, 'real_name')
-            realname_xml.text = self.fullname_string.get()
+        #
+        # these are the fields that enable removing machines
+        # from management quotas.
+#         general = top.find('general')
+#         if self.jamf_management_btn.config('text')[-1] == 'True'
+#             remote_management = ET.SubElement(general, 'remote_management')
+#             managed_xml       = ET.SubElement(remote_management, 'managed')
+#             managed_xml.text  = 'true'
+#         else
+#             remote_management = ET.SubElement(general, 'remote_management')
+#             managed_xml       = ET.SubElement(remote_management, 'managed')
+#             managed_xml.text  = 'false'
+
+        self.log_current_state()
+        self.logger.info("%s: submitting \n%s" % (inspect.stack()[0][3], ET.tostring(top)))
+
+        def submitted(response):
+            self.logger.info("submit: submitted.")
+            self.status_label.configure(style='Normal.TLabel')
+            self.status_string.set(str(response.code) + " Submitted.")
 
-            phone_xml = ET.SubElement(location, 'phone')
-            phone_xml.text = self.phone_string.get()
+        #
+        # comminicating with the Jamf database and putting the XML structure
+        #  a PUT can't be taken back once sent, the Submit button is disabled rather than cancellable
+        self.runner.run('submit', lambda task: self.jamf.put_xml(api_call, top), on_done=submitted,
+                        on_error=lambda error: self.task_failed('submit', error),
+                        button=self.submit_btn, busy_text="Submitting", cancellable=False)
 
-            building_xml = ET.SubElement(location, 'building')
-            building_xml.text = self.building_string.get()
+    def bulk_update(self):
+        """
+        submit changes to many computers from a CSV or JSON file
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
 
-            room_xml = ET.SubElement(location, 'room')
-            room_xml.text = self.room_string.get()
+        #
+        # the file needs an id column and one column per field to change, see scl_jamf/bulk_update.py
+        source_path = tkFileDialog.askopenfilename(title="Bulk update file", filetypes=[("CSV or JSON", "*.csv *.json"), ("All files", "*")])
+        if not source_path:
+            return
 
-            position_xml = ET.SubElement(location, 'position')
-            position_xml.text = self.position_string.get()
+        try:
+            rows = bulk_update.read_rows(source_path)
+        except Exception as exception_message:
+            self.logger.error("%s: Error reading %s. [%s]" % (inspect.stack()[0][3], source_path, exception_message))
+            tkMessageBox.showerror("Bulk Update", "Error reading %s.\n\n%s" % (os.path.basename(source_path), exception_message))
+            return
 
-            department_xml = ET.SubElement(location, 'department')
-            department_xml.text = self.department_string.get()
+        if not rows:
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set("No rows in %s." % os.path.basename(source_path))
+            return
 
-            #
-            # these are the fields that enable removing machines
-            # from management quotas.
-#             if self.jamf_management_btn.config('text')[-1] == 'True'
-#                 remote_management = ET.SubElement(general, 'remote_management')
-#                 managed_xml       = ET.SubElement(remote_management, 'managed')
-#                 managed_xml.text  = 'true'
-#             else
-#                 remote_management = ET.SubElement(general, 'remote_management')
-#                 managed_xml       = ET.SubElement(remote_management, 'managed')
-#                 managed_xml.text  = 'false'
+        if not tkMessageBox.askyesno("Bulk Update", "Update %i computers from %s?" % (len(rows), os.path.basename(source_path))):
+            return
 
-            self.log_current_state()
-            self.logger.info("%s: submitting \n%s" % (inspect.stack()[0][3], ET.tostring(top)))
+        log_path = os.path.splitext(source_path)[0] + "_results.csv"
+        updater = bulk_update.BulkUpdater(self.jamf, self.logger, self.bulk_workers, self.bulk_requests_per_second)
 
-#             print(ET.tostring(top))
+        def show_progress(done, total):
+            self.status_string.set("Bulk update: %i of %i..." % (done, total))
 
-            #
-            # comminicating with the Jamf database and putting the XML structure
-            opener = urllib2.build_opener(urllib2.HTTPHandler)
-            request = urllib2.Request(jamf_url, data=ET.tostring(top))
-            base64string = base64.b64encode('%s:%s' % (self.jamf_username, self.jamf_password))
-            request.add_header("Authorization", "Basic %s" % base64string)
-            request.add_header('Content-Type', 'text/xml')
-            request.get_method = lambda: 'PUT'
-            response = opener.open(request)
-
-            self.logger.info("%s: submitted." % inspect.stack()[0][3])
-            self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set(str(response.code) + " Submitted.")
-            return
+        def finished(results):
+            succeeded, failed = results
+            self.status_label.configure(style='Warning.TLabel' if failed else 'Normal.TLabel')
+            self.status_string.set("Bulk update: %i updated, %i failed. Results in %s" % (succeeded, failed, os.path.basename(log_path)))
 
-        except urllib2.HTTPError, error:
-            if error.code == 400:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-            elif error.code == 401:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-            elif error.code == 403:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-            elif error.code == 404:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-            elif error.code == 409:
-                contents = error.read()
-                error_message = re.findall(r"Error: (.*)<", contents)
-                print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-            else:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-            return
-        except urllib2.URLError, error:
-            self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
+        def update_failed(error):
+            self.logger.error("bulk_update: %s" % error)
             self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error contacting JSS.")
-            return
-        except Exception as exception_message:
-            self.logger.error("%s: Error submitting to Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error submitting to Jamf. [%s]" % exception_message)
-            return
+            self.status_string.set("Bulk update failed. [%s]" % error)
+
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Bulk update: submitting %i computers..." % len(rows))
+        tasks.BackgroundTask(self.root, lambda task: updater.run(rows, log_path, task.progress),
+                             on_done=finished, on_error=update_failed, on_progress=show_progress).start()
 
     def usage(self):
         """
@@ -1051,33 +1142,42 @@ class Computer(object):
         else:
             self.jamf_management_btn.configure(state="disabled")
 
-    def query_jamf_id(self):
+    def query_jamf_id(self, button=None, this_device=False):
         """
-        query jamf for specific computer record
+        query jamf for specific computer record, this_device if the ID came from the local machine lookup
         """
         self.logger.info("%s: activated" % inspect.stack()[0][3])
         self.reset_data()
 
-        try:
-
-            self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("ID Mode selected.")
+        jamf_id = self.id_string.get()
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Querying Jamf for ID %s..." % jamf_id)
 
+        def fetch_record(task):
             #
-            # request specific jamf computer record
-            url = self.jamf_hostname + '/JSSResource/computers/id/' + self.id_string.get()
-            request = urllib2.Request(url)
-            request.add_header('Accept', 'application/json')
-            request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-            response = urllib2.urlopen(request)
-            response_json = json.loads(response.read())
-
-            if response.code != 200:
-                self.logger.error("%s: Error from jss" % inspect.stack()[0][3])
-                self.status_string.set("%i returned." % response.code)
-                return
+            # request specific jamf computer record, parsed off the main loop
+            #  error responses are raised as HTTPError and reported by task_failed()
+            return computers.get_computer(self.jamf, 'id/' + jamf_id, self.record_sections).json()
+
+        self.runner.run('query', fetch_record, on_done=lambda response_json: self.display_record(response_json, this_device),
+                        on_error=lambda error: self.task_failed('query_jamf_id', error),
+                        on_cancel=self.task_cancelled, button=button)
 
+    def display_record(self, response_json, this_device=False):
+        """
+        fill in the fields from a computer record returned by query_jamf_id
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+
+        #
+        # a saved ID of this device can belong to another computer after a re-enrollment,
+        #  look it up again by UUID
+        if this_device and not self.local_machine.check(response_json):
+            self.local_jamf_id = None
+            self.query_jamf_me()
+            return
+
+        try:
             #
             # begin populating display strings
             self.computer_name_string.set(response_json['computer']['general']['name'])
@@ -1121,46 +1221,10 @@ class Computer(object):
 
             self.log_current_state()
 
-        #
-        # handle communication errors
-        except urllib2.HTTPError, error:
-            if error.code == 400:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-            elif error.code == 401:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-            elif error.code == 403:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-            elif error.code == 404:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-            elif error.code == 409:
-                contents = error.read()
-                error_message = re.findall(r"Error: (.*)<", contents)
-                print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-            else:
-                self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-            return
-        except urllib2.URLError, error:
-            self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-            self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error contacting JSS.")
-            return
         except Exception as exception_message:
-            self.logger.error("%s: Error submitting to Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
+            self.logger.error("%s: Error reading computer record. [%s]" % (inspect.stack()[0][3], exception_message))
             self.status_label.configure(style='Warning.TLabel')
-            self.status_string.set("Error submitting to Jamf. [%s]" % exception_message)
+            self.status_string.set("Error reading computer record. [%s]" % exception_message)
             return
 
         self.status_label.configure(style='Normal.TLabel')
@@ -1174,120 +1238,114 @@ class Computer(object):
         self.logger.info("%s: activated" % inspect.stack()[0][3])
 
         #
-        # this method finds the UUID for the local machine
-        # query's jamf and parses the ID from the record
-        # and then calls the main query method
-        # it's wasteful the first time it's called.
-        if not self.local_jamf_id:
-
-            if platform.system() == 'Darwin':
-                local_uuid_raw = subprocess.check_output(["system_profiler", "SPHardwareDataType"])
-                local_uuid = re.findall(r'Hardware UUID: (.*)', local_uuid_raw)[0]
-            elif platform.system() == 'Windows':
-                local_uuid_raw = subprocess.check_output("wmic CsProduct Get UUID")
-                local_uuid_raw = local_uuid_raw.split("\r\r\n")[1]
-                local_uuid = local_uuid_raw.split(" ")[0]
-            else:
+        # the local Jamf ID is usually known by now, prefetch_local_id() looks it up at startup.
+        # otherwise find the UUID for the local machine and query Jamf for its ID,
+        # then call the main query method
+        if self.local_jamf_id:
+            self.logger.info("%s: local jamf id %r" % (inspect.stack()[0][3], self.local_jamf_id))
+            self.id_string.set(self.local_jamf_id)
+            self.query_jamf_id(self.this_device_btn, this_device=True)
+            return
+
+        def found_local_id(jamf_id):
+            if jamf_id is None:
                 self.status_label.configure(style='Warning.TLabel')
                 self.status_string.set("Missing native UUID discovery.")
                 return
 
-            #
-            # communicate with Jamf server
-            try:
-                url = self.jamf_hostname + '/JSSResource/computers/udid/' + local_uuid
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
+            self.local_jamf_id = jamf_id
+            self.id_string.set(self.local_jamf_id)
+            self.query_jamf_id(self.this_device_btn, this_device=True)
 
-                response = urllib2.urlopen(request)
-                response_json = json.loads(response.read())
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Looking up this device...")
+        self.runner.run('query', lambda task: self.local_machine.lookup(), on_done=found_local_id,
+                        on_error=lambda error: self.task_failed('query_jamf_me', error),
+                        on_cancel=self.task_cancelled, button=self.this_device_btn)
 
-                #
-                # a non-200 response is bad, report and return
-                if response.code != 200:
-                    self.logger.error("%s: Error from jss" % inspect.stack()[0][3])
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("%i returned." % response.code)
-                    return
+    def prefetch_local_id(self):
+        """
+        look up the Jamf ID of this device in the background, so This Device doesn't wait for it
+        """
+        def prefetched(jamf_id):
+            self.local_jamf_id = jamf_id
 
-                self.local_jamf_id = response_json['computer']['general']['id']
-                self.id_string.set(self.local_jamf_id)
+        def prefetch_failed(error):
+            self.logger.warn("prefetch_local_id: %s" % client.describe_error(error))
 
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 400:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-                elif error.code == 401:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-                elif error.code == 403:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-                elif error.code == 404:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-                elif error.code == 409:
-                    contents = error.read()
-                    error_message = re.findall(r"Error: (.*)<", contents)
-                    print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-                else:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-                return
-            except urllib2.URLError, error:
-                self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error contacting JSS.")
-                return
-            except Exception as exception_message:
-                self.logger.error("%s: Error submitting to Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error submitting to Jamf. [%s]" % exception_message)
-                return
+        tasks.BackgroundTask(self.root, lambda task: self.local_machine.lookup(), on_done=prefetched, on_error=prefetch_failed).start()
 
-        else:
-            self.logger.info("%s: local jamf id %r" % (inspect.stack()[0][3], self.local_jamf_id))
-            self.id_string.set(self.local_jamf_id)
+    def task_failed(self, action, error):
+        """
+        report an error raised by a background Jamf request
+        """
+        message = client.describe_error(error)
+        self.logger.error("%s: %s" % (action, message))
+        self.status_label.configure(style='Warning.TLabel')
+        self.status_string.set(message)
 
-        self.query_jamf_id()
+    def task_cancelled(self):
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("Cancelled.")
+
+    def cancel_tasks(self, *event):
+        """
+        Escape cancels running requests
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+        self.runner.cancel_all()
+        if self.runner.buttons.get('search'):
+            self.cancel_search()
 
     def populate_menu(self, menu_choice):
         """
-        builds list from static data source in jamf
+        builds list from static data source in jamf, as saved by the last run
         """
         self.logger.info("%s: activated" % inspect.stack()[0][3])
 
         #
         # this method builds lists that can then be used to build combobox or popup menus from
         # departments, buildings, sites
-        url = self.jamf_hostname + '/JSSResource/' + menu_choice
-        request = urllib2.Request(url)
-        request.add_header('Accept', 'application/json')
-        request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
+        # the window doesn't wait for Jamf, refresh_menus() fills in new or changed lists
+        menu_items = ['None'] + (self.menus.get(menu_choice) or [])
+        self.logger.info("%s: built menu: %r" % (inspect.stack()[0][3], menu_items))
+        return menu_items
+
+    def refresh_menus(self):
+        """
+        check department and building lists with Jamf in the background
+        """
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
 
-        response = urllib2.urlopen(request)
-        response_json = json.loads(response.read())
+        def fetch_menus(task):
+            changed = {}
+            for menu_choice in ['departments', 'buildings']:
+                if self.menus.stale(menu_choice):
+                    items, is_changed = self.menus.fetch(menu_choice, lambda response_json: menus.names(response_json, menu_choice))
+                    if is_changed:
+                        changed[menu_choice] = items
+            self.menus.save()
+            return changed
 
-        if response.code != 200:
-            self.logger.error("%s: Error from jss" % inspect.stack()[0][3])
-            return
+        tasks.BackgroundTask(self.root, fetch_menus, on_done=self.menus_refreshed, on_error=self.menus_failed).start()
 
-        menu_items = ['None']
-        for item in response_json[menu_choice]:
-            menu_items.append(item.get('name'))
-        self.logger.info("%s: built menu: %r" % (inspect.stack()[0][3], menu_items))
-        return menu_items
+    def menus_refreshed(self, changed):
+        """
+        update comboboxes with lists that changed, runs on the main loop
+        """
+        if 'departments' in changed:
+            self.divisions = ['None'] + changed['departments']
+            self.division_combobox['values'] = self.divisions
+        if 'buildings' in changed:
+            self.buildings = ['None'] + changed['buildings']
+            self.building_combobox['values'] = self.buildings
+        self.logger.info("%s: updated %r" % (inspect.stack()[0][3], sorted(changed)))
+
+    def menus_failed(self, error):
+        self.logger.error("%s: Error refreshing menus. [%s]" % (inspect.stack()[0][3], error))
+        if not self.menus.get('departments') or not self.menus.get('buildings'):
+            self.status_label.configure(style='Warning.TLabel')
+            self.status_string.set("Unable to load departments and buildings. " + client.describe_error(error))
 
     def populate_ea_menu(self, ea_id):
         """
@@ -1297,19 +1355,18 @@ class Computer(object):
 
         #
         # this method builds lists that can then be used to build combobox or popup menus from EA's
-        url = self.jamf_hostname + '/JSSResource/computerextensionattributes/id/' + str(ea_id)
-        request = urllib2.Request(url)
-        request.add_header('Accept', 'application/json')
-        request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-        response = urllib2.urlopen(request)
-        response_json = json.loads(response.read())
-
-        if response.code != 200:
-            self.logger.error("%s: Error from jss" % inspect.stack()[0][3])
-            return
+        # the saved choices are used until they're older than menu_max_age
+        api_call = 'computerextensionattributes/id/' + str(ea_id)
+        choices = self.menus.get(api_call)
+        if choices is None or self.menus.stale(api_call):
+            try:
+                choices, is_changed = self.menus.fetch(api_call, menus.popup_choices)
+                self.menus.save()
+            except urllib2.URLError as error:
+                self.logger.error("%s: Error from jss. [%s]" % (inspect.stack()[0][3], error))
+                if choices is None:
+                    return
 
-        choices = response_json['computer_extension_attribute']['input_type']['popup_choices']
         choices = ['None'] + choices
         self.logger.info("%s: built ea: %r" % (inspect.stack()[0][3], choices))
         return choices
@@ -1320,29 +1377,12 @@ class Computer(object):
         """
         self.logger.info("%s: activated" % inspect.stack()[0][3])
 
-        def double_click(*event):
-            """
-            handle clicks
-            """
-
-            #
-            # when a click occurs, parse out ID from string and call query method
-            selected = listbox.get(listbox.curselection())
-            trim_select = re.search(r'\((.*)\)', selected).group(1)
-
-            self.id_string.set(trim_select)
-            self.query_jamf_id()
-
-            self.root.lift()
-
         self.reset_data()
 
         if self.search_string.get() == "" or self.search_string.get().replace(" ", "") == "":
             if self.id_string.get():
-                self.query_jamf_id()
-                self.status_label.configure(style='Normal.TLabel')
-                self.status_string.set("Searched for ID.")
                 self.logger.info("%s: searched for ID: %r" % (inspect.stack()[0][3], self.id_string.get()))
+                self.query_jamf_id(self.search_btn)
             else:
                 self.logger.error("%s: No search string" % inspect.stack()[0][3])
                 self.status_label.configure(style='Warning.TLabel')
@@ -1353,583 +1393,109 @@ class Computer(object):
             self.logger.info("%s: searched for string: %r" % (inspect.stack()[0][3], self.search_string.get()))
 
             #
-            # erase previous displayed values
-#             self.reset_data()
-
-            #
-            # encode special characters included in search string
-            url = self.jamf_hostname + '/JSSResource/computers/match/' + urllib.quote('*' + self.search_string.get() + '*')
-            self.logger.info("%s: searched with url: %r" % (inspect.stack()[0][3], url))
-
-            #
-            # communicate with Jamf server
-            try:
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(self.jamf_username + ':' + self.jamf_password))
-
-                response = urllib2.urlopen(request)
-                try:
-                    response_json = json.loads(response.read())
-                except Exception as exception_message:
-                    self.logger.error("issue parsing JSON: %r" % exception_message)
-                    return
-                #
-                # a non-200 response is bad, report and return
-                if response.code != 200:
-                    self.logger.error("%s: error from jss" % inspect.stack()[0][3])
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("%i returned." % response.code)
-                    return
-
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 400:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Request error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Request error."))
-                elif error.code == 401:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Authorization error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Authorization error."))
-                elif error.code == 403:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Permissions error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Permissions error."))
-                elif error.code == 404:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource not found."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource not found."))
-                elif error.code == 409:
-                    contents = error.read()
-                    error_message = re.findall(r"Error: (.*)<", contents)
-                    print("HTTP code %i: %s %s %s" % (error.code, "Resource conflict.", error_message[0], self.id_string.get()))
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Resource conflict. " + error_message[0]))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Resource conflict. " + error_message[0]))
-                else:
-                    self.logger.error("%s: HTTP code %i: %s" % (inspect.stack()[0][3], error.code, "Generic error."))
-                    self.status_label.configure(style='Warning.TLabel')
-                    self.status_string.set("HTTP code %i: %s" % (error.code, "Generic error."))
-                return
-            except urllib2.URLError, error:
-                self.logger.error("%s: Error contacting JSS." % (inspect.stack()[0][3]))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error contacting JSS.")
-                return
-            except Exception as exception_message:
-                self.logger.error("%s: Error submitting to Jamf. [%s]" % (inspect.stack()[0][3], exception_message))
-                self.status_label.configure(style='Warning.TLabel')
-                self.status_string.set("Error submitting to Jamf. [%s]" % exception_message)
-                return
-
-            #
-            # begin parsing data returned from Jamf
+            # the search runs in the background, search_results() displays the matches.
+            # see scl_jamf/search.py
             self.status_label.configure(style='Normal.TLabel')
-            self.status_string.set("%i matches returned." % len(response_json['computers']))
-            self.logger.info("%s: %r" % (inspect.stack()[0][3], self.status_string.get()))
+            self.status_string.set("Searching...")
+            self.live_search.search(self.search_string.get())
 
-            search_font = tkFont.Font(font='TkDefaultFont')
-            match_results = []
-            max_length = 0
             #
-            # parse each returned computer element, retaining Jamf ID and Computer name
-            # properly format value to display
-            # build a version of the computer name used to sort by
-            #  these rules are for our environment and may have no effect in yours.
-            #  if the name is in the format "labmac-1" the integer is expanded to -0001
-            #  if the name is in the format "[lost] labmac-1" the sorting name is stored as
-            #    "labmac-1a" to differentiate it from "labmac-1"
-            # the values are added to a list containing the previously processed values as
-            #   [sorting name, computer name, jamf id]
-            for node in response_json['computers']:
-                match_id = node['id']
-                match_name = node['name']
-                if not match_name:
-                    match_name = "Not named."
-
-                name_trim = match_name
-
-                try:
-                    number_part = re.search(r'(\d+)', name_trim).group(1)
-                    number_free = "".join([i for i in name_trim if not i.isdigit()])
-                    expanded_number = '{:04d}'.format(int(number_part))
-                    expanded_x = number_free + expanded_number
-                    name_trim = expanded_x
-                except:
-                    pass
-
-                if "[" in name_trim:
-                    name_trim = re.search(r']([ -]*)(.*)', name_trim).group(2)
-                    name_trim = str(name_trim) + "a"
-
-                match_results.append([name_trim, match_name, match_id])
-                (string_width, string_height) = (search_font.measure(match_name + " (" + str(match_id) + ")"), search_font.metrics("linespace"))
-                if max_length < string_width:
-                    max_length = string_width
-
-            #
-            # if there were returned results, build and display search results window
-            #
-            #
-            # position results window next to the main window, even if it has moved
-            #  from the original location
-            # while sorting the list based on the synthetic string,
-            #  display the computer name and ID
-            # bind clicks to function
-            if match_results:
-
-                search_window = Toplevel()
+            # searches answered locally have already been displayed,
+            #  while Jamf is asked the Search button cancels the search
+            if self.live_search.task:
+                self.runner.busy('search', self.search_btn, "Cancel", self.cancel_search)
 
-                split_geom = self.root.winfo_geometry().split("+")
-                r_h = int(split_geom[0].split("x")[0])
-                r_pos_x = int(split_geom[1])
-                r_pos_y = int(split_geom[2])
-                string_width = int(max_length + 22)
-
-                search_window_geo = "%ix%i+%i+%i" % (string_width, 400, (r_h + r_pos_x + 10), (r_pos_y))
-                search_window.geometry(search_window_geo)
-
-                search_window.title("Search results")
-
-                list_frame = ttk.Frame(search_window, width=string_width, height=400, padding=(4, 0, 0, 0))
-
-                scrollbar = Scrollbar(list_frame)
-                scrollbar.pack(side=RIGHT, fill=Y)
-
-                listbox = Listbox(list_frame, bd=0, yscrollcommand=scrollbar.set, selectmode=SINGLE, width=190, height=400)
-                listbox.pack()
-
-                scrollbar.config(command=listbox.yview)
-
-                list_frame.pack()
-
-                for item in sorted(match_results):
-                    insert_string = item[1] + " (" + str(item[2]) + ")"
-                    listbox.insert(END, insert_string)
-
-#                 self.saved_results.append((self.search_string.get(), match_results))
-
-                listbox.bind("<<ListboxSelect>>", double_click)
-
-                search_window.mainloop()
-
-
-def login(logger):
-    """
-    if the user has proper privleges, consider them an authorized user and proceed
-    """
-    def read_create_prefs(logger):
+    def cancel_search(self):
         """
-        Read specified config file or create default data structure
+        drop the search in flight
         """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-        config_path = ''
-
-        executable_name = os.path.basename(sys.argv[0])
-
-        if executable_name.count('.') > 1:
-            filename = executable_name.split('.')[:-1]
-            filename = '.'.join(filename)
-        else:
-            filename = executable_name.split('.')[0]
-
-        try:
-            if '_' in filename:
-                split_filename = filename.split('_')
-                try:
-                    int(split_filename[-1][0])
-                    del split_filename[-1]
-                except Exception as exception_message:
-                    print(exception_message)
-                config_name = 'edu.scl.utah.' + '_'.join(split_filename) + '.ini'
-            else:
-                config_name = 'edu.scl.utah.' + filename + '.ini'
-
-        except Exception as exception_message:
-            logger.error("Error creating config_name [%s]. %s" % (executable_name, exception_message))
-            return '', ''
-
-        if platform.system() == 'Darwin':
-            if os.path.exists(pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)):
-                config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
-            elif os.path.exists(os.path.join('/', 'Library', 'Preferences', config_name)):
-                config_path = os.path.join('/', 'Library', 'Preferences', config_name)
-            else:
-                config_path = pwd.getpwuid(os.getuid())[5] + os.path.join('/', 'Library', 'Preferences', config_name)
-
-        elif platform.system() == 'Windows':
-            config_path = os.path.join(os.environ['APPDATA'], config_name)
-
-        if not os.path.exists(config_path):
-            logger.warn("Configuration file not found, creating structure in memory.")
-            config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-            config_file.add_section('login')
-            config_file.set('login', 'hosts', 'https://new_server:8443')
-            config_file.set('login', 'username', '')
-
-        else:
-            config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-            try:
-                config_file.read(config_path)
-            except Exception as exception_message:
-                logger.error("Error reading pre-exiting configuration file [%s]. %s" % (config_path, exception_message))
-                config_file = ConfigParser.SafeConfigParser(allow_no_value=True)
-                config_file.add_section('login')
-                config_file.set('login', 'hosts', 'https://new_server:8443')
-                config_file.set('login', 'username', '')
-
-        logger.info("Configuration path: %s" % config_path)
-        return config_file, config_path
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
+        self.live_search.cancel()
+        self.runner.idle('search')
+        self.task_cancelled()
 
-    def injest_prefs(logger, configfile):
+    def search_typed(self, *args):
         """
-        Create data structures from config file
+        search as the user types, LiveSearch waits for a pause
         """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-        config_options = {}
-        config_options["login"] = {}
-
-        for section in ["login"]:
-            for item in configfile.options(section):
-                if "use_" in item:
-                    try:
-                        config_options[section][item] = configfile.getboolean(section, item)
-                    except:
-                        config_options[section][item] = False
-                elif "path" in item:
-                    config_options[section][item] = configfile.get(section, item)
-                else:
-                    config_options[section][item] = configfile.get(section, item)
-
-        logger.info("Configuration file variables:")
-        for key, value in config_options.items():
-            logger.info(key)
-            for sub_key, sub_value in value.items():
-                logger.info("\t%s %r" % (sub_key, sub_value))
-
-        return config_options["login"]["hosts"]
+        self.runner.idle('search')
+        self.live_search.changed(self.search_string.get())
 
-    def modify_prefs(logger, config_file, config_path, hostnames, valid_host):
+    def search_failed(self, term, error):
         """
-        Convert data structures back into config file and write out changes.
+        report a failed search
         """
-        logger.info("%s: activated" % inspect.stack()[0][3])
-
-        hostnames.remove("https://new_server:8443")
-
-        if valid_host not in hostnames:
-            logger.info("%s not in configuration file, adding." % valid_host)
-            hostnames.append(valid_host)
-            config_file.set('login', 'hosts', ",".join(hostnames))
-
-            try:
-                with open(config_path, "wb") as config_write:
-                    config_file.write(config_write)
-                    logger.info("Wrote configuration file at %s." % config_path)
-            except Exception as exception_message:
-                logger.error("Error writing configuration file [%s]. %s" % (config_path, exception_message))
+        self.runner.idle('search')
+        self.status_label.configure(style='Warning.TLabel')
+        self.status_string.set(client.describe_error(error))
 
-    def try_login():
+    def search_results(self, term, matches):
         """
-        jamf api call for login test
+        display search results
         """
-
-        def call_jss(logger, api_call):
-            """
-            consolidate API calls to single function
-            pass in logger and api call.
-            """
-            logger.info("%s: activated" % inspect.stack()[0][3])
-
-            try:
-                url = jamf_hostname.get() + '/JSSResource/' + api_call
-
-                logger.info("%s called with %s" % (inspect.stack()[0][3], api_call))
-
-                request = urllib2.Request(url)
-                request.add_header('Accept', 'application/json')
-                request.add_header('Authorization', 'Basic ' + base64.b64encode(jamf_username.get() + ':' + jamf_password.get()))
-
-                response = urllib2.urlopen(request)
-
-                logger.info("Code returned: %s %s" % (response.code, api_call))
-
-                if response.code != 200:
-                    logger.error("login: Invalid response from Jamf (" + api_call + ")")
-                    tkMessageBox.showerror("Jamf login", "Invalid response from Jamf")
-                    root.destroy() # clean up after yourself!
-                    sys.exit()
-
-                response_json = json.loads(response.read())
-
-                return response_json
-
-            #
-            # handle various communication errors
-            except urllib2.HTTPError, error:
-                if error.code == 401:
-                    logger.error("%s: Invalid username or password. (%r) (%s)" % (inspect.stack()[0][3], jamf_username.get(), api_call))
-                    tkMessageBox.showerror("Jamf login", "Invalid username or password.")
-                elif error.code == 404:
-                    logger.warn("%s: JSS account not found. [%s]" % (inspect.stack()[0][3], jamf_username.get()))
-                    return None
-                else:
-                    logger.error("%s: Error communicating with JSS. %s %s" % (inspect.stack()[0][3], jamf_hostname.get(), api_call))
-                    tkMessageBox.showerror("Jamf login", "HTTP error from:\n%s" % jamf_hostname.get())
-            except urllib2.URLError:
-                logger.error("%s: Error contacting JSS: %s %s" % (inspect.stack()[0][3], jamf_hostname.get(), api_call))
-                tkMessageBox.showerror("Jamf login", "Unable to contact:\n%s" % jamf_hostname.get())
-            except Exception as exception_message:
-                # this could be so many different things... :(
-                logger.error("%s: Generic error. (%r) %s" % (inspect.stack()[0][3], exception_message, api_call))
-                tkMessageBox.showerror("Jamf login", "Generic error from %s." % jamf_hostname.get())
-
-            #
-            # handle bad condition exits here...
-            logger.error("%s: Exiting, Error calling %s" % (inspect.stack()[0][3], api_call))
-            sys.exit()
-
-        logger.info("%s: activated" % inspect.stack()[0][3])
-
-        valid_user_read = False
-        valid_user_full = False
-        global access_level
-
-        try:
-
-            jss_accounts = call_jss(logger, 'accounts')
-
-            raw_ldap = call_jss(logger, 'ldapservers')
-            ldap_servers = raw_ldap['ldap_servers']
-            logger.info("JSS LDAP servers: %r" % ldap_servers)
-
-            #
-            # store list of user and group privileges
-            user_list = jss_accounts['accounts']['users']
-            group_list = jss_accounts['accounts']['groups']
-
-            #
-            # find groups on jss that have required_privileges
-            valid_full_groups = []
-            valid_read_groups = []
-
-            for item in group_list:
-                missing_ldap_read_privileges = []
-                missing_ldap_update_privileges = []
-                valid_ldap_read = False
-                valid_ldap_update = False
-
-                raw_privs = call_jss(logger, 'accounts/groupid/' + str(item['id']))
-                this_group_privs = raw_privs['group']['privileges']['jss_objects']
-
-                for read_item in read_privileges:
-                    if read_item not in this_group_privs:
-                        missing_ldap_read_privileges.append(read_item)
-                if not missing_ldap_read_privileges:
-                    valid_ldap_read = True
-
-                for update_item in update_privileges:
-                    if update_item not in this_group_privs:
-                        missing_ldap_update_privileges.append(update_item)
-                if not missing_ldap_update_privileges:
-                    valid_ldap_update = True
-
-                if valid_ldap_read and valid_ldap_update:
-                    logger.info("%s is read and update valid." % item['name'])
-                    valid_full_groups.append([item['id'], item['name']])
-
-                elif valid_ldap_read:
-                    logger.info("%s is read valid." % item['name'])
-                    valid_read_groups.append([item['id'], item['name']])
-                    logger.warn("login: Group %r lacks appropriate update privileges: %r" % (item['name'], (missing_ldap_read_privileges + missing_ldap_update_privileges)))
-
-                else:
-                    logger.error("login: Group %r lacks appropriate privileges: %r" % (item['name'], missing_ldap_read_privileges + missing_ldap_update_privileges))
-
-            #
-            # find servers with valid groups the user is a member of
-            valid_full_servers = []
-            valid_read_servers = []
-
-            for server in ldap_servers:
-                for group in valid_full_groups:
-                    raw_group_membership = call_jss(logger, 'ldapservers/id/' + str(server['id']) + '/group/' + urllib.quote(str(group[1])) + '/user/' + jamf_username.get())
-
-                    if raw_group_membership['ldap_users']:
-                        logger.info("login: %s is a member of full group %s on server %s" % (jamf_username.get(), group[1], server['name']))
-                        valid_full_servers.append(server['name'])
-
-                for group in valid_read_groups:
-                    raw_group_membership = call_jss(logger, 'ldapservers/id/' + str(server['id']) + '/group/' + urllib.quote(str(group[1])) + '/user/' + jamf_username.get())
-
-                    if raw_group_membership['ldap_users']:
-                        logger.info("login: %s is a member of read group %s on server %s" % (jamf_username.get(), group[1], server['name']))
-                        valid_read_servers.append(server['name'])
-
-            #
-            # Check user's privileges
-            user_update = False
-            user_read = False
-            missing_read_privileges = []
-            missing_update_privileges = []
-            try:
-                raw_privileges = call_jss(logger, 'accounts/username/' + jamf_username.get())
-
-                if raw_privileges:
-                    user_privileges = raw_privileges['account']['privileges']['jss_objects']
-
-                    for item in read_privileges:
-                        if item not in user_privileges:
-                            missing_read_privileges.append(item)
-
-                    if not missing_read_privileges:
-                        user_read = True
-
-                    for item in update_privileges:
-                        if item not in user_privileges:
-                            missing_update_privileges.append(item)
-
-                    if not missing_update_privileges:
-                        user_update = True
-
-                    if missing_read_privileges or missing_update_privileges:
-                        logger.warn("login: %s is missing privileges for full access: %r" % (jamf_username.get(), missing_read_privileges + missing_update_privileges))
-
-            except Exception as exception_message:
-                logger.warn("%s: Error checking user account info. (%r)" % (inspect.stack()[0][3], exception_message))
-
-            #
-            # if all require privileges accounted for, proceed
-            # else alert and fail
-            if user_read and user_update:
-                logger.info("login: valid full user login. (%r)" % jamf_username.get())
-                root.destroy()  # clean up after yourself!
-                access_level = 'full'
-                return
-            elif valid_full_servers:
-                logger.info("login: valid full LDAP login. (%r)" % jamf_username.get())
-                root.destroy()  # clean up after yourself!
-                access_level = 'full'
-                return
-            elif user_read:
-                logger.info("login: valid read user login. (%r)" % jamf_username.get())
-                root.destroy()  # clean up after yourself!
-                access_level = 'read-only'
-                return
-            elif valid_read_servers:
-                logger.info("login: valid read LDAP login. (%r)" % jamf_username.get())
-                root.destroy()  # clean up after yourself!
-                access_level = 'read-only'
-                return
-            else:
-                logger.error("login: User %r lacks appropriate privileges: %r" % (jamf_username.get(), missing_privileges))
-                tkMessageBox.showerror("Jamf login", "User lacks appropriate privileges.\n%r" % missing_privileges)
+        self.logger.info("%s: activated" % inspect.stack()[0][3])
 
         #
-        # handle various communication errors
-        except urllib2.HTTPError, error:
-
-            logger.info("Code returned: %s" % error.code)
-
-            if error.code == 401:
-                logger.error("%s: Invalid username or password. (%r)" % (inspect.stack()[0][3], jamf_username.get()))
-                tkMessageBox.showerror("Jamf login", "Invalid username or password.")
-            else:
-                logger.error("%s: Error communicating with JSS. %s" % (inspect.stack()[0][3], jamf_hostname.get()))
-                tkMessageBox.showerror("Jamf login", "HTTP error from:\n%s" % jamf_hostname.get())
-        except urllib2.URLError:
-            logger.error("%s: Error contacting JSS: %s" % (inspect.stack()[0][3], jamf_hostname.get()))
-            tkMessageBox.showerror("Jamf login", "Unable to contact:\n%s" % jamf_hostname.get())
-        except Exception as exception_message:
-            logger.error("%s: Generic error. (%r)" % (inspect.stack()[0][3], exception_message))
-            tkMessageBox.showerror("Jamf login", "Generic error from %s." % jamf_hostname.get())
-
-        sys.exit()
-
-    #
-    # This is really important. This list contains the required rights for the fields we need to access.
-    read_privileges = ['Read Accounts', 'Read Buildings', 'Read Computers', 'Read Departments', 'Read User', 'Read LDAP Servers']
-    update_privileges = ['Update Computers', 'Update User']
-
-    # read or create prefs
-    preference_file, preference_path = read_create_prefs(logger)
-    hostnames = injest_prefs(logger, preference_file).split(',')
-
-    if 'new_server' not in hostnames[0]:
-        hostnames.append("https://new_server:8443")
-
-    root = Tk()
-    jamf_username = StringVar()
-    jamf_password = StringVar()
-    jamf_hostname = StringVar()
-
-    #
-    # build and display login screen
-    root.title("Jamf Login")
-    mainframe = ttk.Frame(root)
-    mainframe.grid(column=0, row=0, sticky=NSEW)
-    root.columnconfigure(0, weight=1)
-    root.rowconfigure(0, weight=1)
-    root.geometry('+0+0')
-
-    ttk.Label(mainframe, text="Jamf Server:").grid(column=1, row=10, sticky=E)
-
-    hostname_combobox = ttk.Combobox(mainframe, width=30, textvariable=jamf_hostname)
-    hostname_combobox['values'] = hostnames
-    hostname_combobox.current(0)
-    hostname_combobox.grid(column=2, row=10, sticky=EW)
-
-    ttk.Label(mainframe, text="Username:").grid(column=1, row=20, sticky=E)
-    uname_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_username)
-    uname_entry.grid(column=2, row=20, sticky=EW)
-
-    ttk.Label(mainframe, text="Password:").grid(column=1, row=30, sticky=E)
-    pword_entry = ttk.Entry(mainframe, width=30, textvariable=jamf_password, show="*")
-    pword_entry.grid(column=2, row=30, sticky=EW)
-
-    if platform.system() == 'Darwin':
-        ttk.Button(mainframe, text="Quit", command=sys.exit).grid(column=2, row=70, padx=3)
-    else:
-        ttk.Button(mainframe, text="Quit", command=sys.exit).grid(column=2, row=70, padx=3, sticky=W)
+        # sort by a natural version of the computer name, "labmac-2" before "labmac-10",
+        #  "[lost] labmac-1" after "labmac-1". see scl_jamf/search.py
+        # rows hold (label, jamf id), labels are displayed as "computer name (jamf id)"
+        match_results = search.result_rows(matches)
 
-    ttk.Button(mainframe, text="Login", default='active', command=try_login).grid(column=2, row=70, padx=3, sticky=E)
+        self.runner.idle('search')
+        self.status_label.configure(style='Normal.TLabel')
+        self.status_string.set("%i matches returned for \"%s\"." % (len(match_results), term))
+        self.logger.info("%s: %r" % (inspect.stack()[0][3], self.status_string.get()))
 
-    if platform.system() == 'Darwin':
-        tmpl = 'tell application "System Events" to set frontmost of every process whose unix id is {} to true'
-        script = tmpl.format(os.getpid())
-        output = subprocess.check_call(['/usr/bin/osascript', '-e', script])
+        #
+        # if there were returned results, build and display search results window.
+        #  a single window is reused by every search until the user closes it,
+        #  see scl_jamf/results_window.py
+        if match_results or self.results_window.is_open():
+            self.results_window.show(match_results)
 
-    root.bind('<Return>', lambda event: try_login())
+    def search_partial(self, term, matches, first):
+        """
+        display matches while a wide search is still arriving, search_results() sorts them when it's done
+        """
+        self.status_string.set("Searching...")
+        if first:
+            self.results_window.show(search.result_rows(matches))
+        else:
+            self.results_window.append(search.result_rows(matches))
 
-    uname_entry.focus()
-    root.mainloop()
+    def search_selected(self, label, jamf_id):
+        """
+        handle clicks
+        """
 
-    if preference_path:
-        modify_prefs(logger, preference_file, preference_path, hostnames, jamf_hostname.get())
-    else:
-        logger.error("No path to preferences, no save attempt.")
+        #
+        # when a click occurs, call query method with the ID of the row
+        self.id_string.set(jamf_id)
+        self.query_jamf_id()
 
-    return (jamf_hostname.get(), jamf_username.get(), jamf_password.get(), access_level)
+        self.root.lift()
 
 
 def main():
     """
     Cooridnates login and app launching
     """
-    access_level = ''
-
     logger = loggers.file_logger(name='tugboat')
     logger.info("Running Tugboat")
     logger.info("Level: Method/function: Message")
 
-    jamf_hostname, jamf_username, jamf_password, access_level = login(logger)
-    if not jamf_username:
+    #
+    # This is really important. These lists contain the required rights for the fields we need to access.
+    # read_privileges alone allow auditing, update_privileges are needed to make changes.
+    read_privileges = ['Read Accounts', 'Read Buildings', 'Read Computers', 'Read Departments', 'Read User', 'Read LDAP Servers']
+    update_privileges = ['Update Computers', 'Update User']
+
+    session = login.login(logger, read_privileges, update_privileges)
+    if not session:
         sys.exit(0)
 
     root = Tk()
-    my_app = Computer(root, logger, jamf_hostname, jamf_username, jamf_password, access_level)
+    my_app = Computer(root, logger, session)
 
     root.mainloop()
 